@@ -0,0 +1,3 @@
+# DO NOT DELETE THIS FILE.
+# IT IS NEEDED TO ENABLE THE SUBDIRECTORY LAYOUT
+# DUE TO PYTHON'S WEIRD HANDLING OF IMPORTS
\ No newline at end of file
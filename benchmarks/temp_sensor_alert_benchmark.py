@@ -0,0 +1,61 @@
+import os
+import sys
+import random
+import argparse
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.temp_sensor_gpio import GPIO
+from helpers.temp_sensor_led import RgbLed
+from models.temp_sensor_alert import TempAlertStateMachine
+
+# feeds a probe sitting right on the top of its allowed range (with sensor noise and
+# the odd failed read) through the alert state machine, with and without hysteresis
+# and a minimum dwell, and counts the GPIO writes to its led and the alerts raised.
+# before the led was edge triggered, every reading wrote all three of its pins
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_alert_benchmark --days 14
+
+CASES = (
+    # (hysteresis, minimum dwell in minutes)
+    (0.0, 0),
+    (0.5, 0),
+    (0.5, 4),
+    (1.0, 10)
+)
+
+def get_simulated_readings(number_of_readings, polling_rate, highest_allowed_temp):
+    randomizer = random.Random(0)
+
+    for reading in range(number_of_readings):
+        is_error = randomizer.random() < 0.002
+        # drifts slowly around the top of the range, with +/- 0.1 F of probe noise
+        temp = round(highest_allowed_temp + 0.3 * randomizer.uniform(-1, 1) + randomizer.gauss(0, 0.1), 2)
+        yield reading * polling_rate, temp, is_error
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark GPIO writes and alerts for a probe on the edge of its range.")
+    parser.add_argument("--days", type=float, default=14, help="length of the simulated run")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    arguments = parser.parse_args()
+
+    number_of_readings = int(arguments.days * 24 * 60 / arguments.polling_rate)
+    print("{} readings, target 65 F +/- 2 F, probe hovering around 67 F".format(number_of_readings))
+    print("{:>12}{:>16}{:>16}{:>12}".format("hysteresis", "dwell (min)", "gpio writes", "alerts"))
+    print("{:>12}{:>16}{:>16}{:>12}".format("(before)", "-", 3 * number_of_readings, "-"))
+
+    for hysteresis, minimum_dwell in CASES:
+        led = RgbLed({"red": 11, "green": 13, "blue": 15})
+        state_machine = TempAlertStateMachine(65, 2, 2, hysteresis, minimum_dwell * 60)
+        alerts = 0
+        output_calls = GPIO.output_calls
+
+        for timestamp, temp, is_error in get_simulated_readings(number_of_readings, arguments.polling_rate * 60, 67):
+            if state_machine.update(temp, timestamp, is_error) != None:
+                led.update_color(state_machine.state)
+                alerts += 1
+
+        print("{:>12}{:>16}{:>16}{:>12}".format(hysteresis, minimum_dwell, GPIO.output_calls - output_calls, alerts))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import random
+import argparse
+import collections
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controllers.temp_sensor_analytics_controller import AnalyticsController
+from models.temp_sensor_stats import RunningTempStats
+
+# compares AnalyticsController with computing the same statistics (status fractions,
+# time-weighted dwell, rolling means and excursions) one reading at a time in
+# python, over a simulated month of readings from 12 sensors, and checks both agree
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_analytics_benchmark --days 30 --sensors 12
+
+WINDOW = 3600
+
+def get_simulated_readings(number_of_sensors, readings_per_sensor, polling_rate):
+    randomizer = random.Random(0)
+    sensors = []
+
+    for index in range(number_of_sensors):
+        target = 65 + randomizer.uniform(-2, 2)
+        temp = target
+        timestamps = []
+        temps = []
+        for reading in range(readings_per_sensor):
+            # a random walk pulled back towards the target, as the chiller would
+            temp += 0.02 * (target - temp) + randomizer.gauss(0, 0.2)
+            timestamps.append(1545083582.0 + reading * polling_rate)
+            temps.append(None if randomizer.random() < 0.001 else round(temp, 2))
+        metadata = {"id": "28-{:012x}".format(index), "name": "FV{}".format(index + 1), "allowed_temp_range": "63-67"}
+        sensors.append((metadata, timestamps, temps))
+
+    return sensors
+
+# the statistics, worked out one reading at a time
+def analyze_per_reading(metadata, timestamps, temps):
+    low, high = (float(value) for value in metadata["allowed_temp_range"].split("-"))
+    counts = dict.fromkeys(RunningTempStats.STATUSES, 0)
+    seconds = dict.fromkeys(RunningTempStats.STATUSES, 0.0)
+    window = collections.deque()
+    window_sum = 0.0
+    rolling_means = []
+    excursions = []
+    previous_status = None
+
+    for index, (timestamp, temp) in enumerate(zip(timestamps, temps)):
+        if temp == None:
+            status = RunningTempStats.ERROR
+        elif temp > high:
+            status = RunningTempStats.ABOVE
+        elif temp < low:
+            status = RunningTempStats.BELOW
+        else:
+            status = RunningTempStats.WITHIN
+        counts[status] += 1
+        if index > 0:
+            seconds[previous_status] += timestamp - timestamps[index - 1]
+
+        if status != previous_status and status in (RunningTempStats.ABOVE, RunningTempStats.BELOW):
+            excursions.append(timestamp)
+        previous_status = status
+
+        if temp != None:
+            window.append((timestamp, temp))
+            window_sum += temp
+        while len(window) > 0 and window[0][0] < timestamp - WINDOW:
+            window_sum -= window.popleft()[1]
+        rolling_means.append(window_sum / len(window) if len(window) > 0 else None)
+
+    return counts, seconds, rolling_means, excursions
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized analytics against a per-reading loop.")
+    parser.add_argument("--days", type=float, default=30, help="length of the simulated logs")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--sensors", type=int, default=12, help="number of simulated sensors")
+    arguments = parser.parse_args()
+
+    readings_per_sensor = int(arguments.days * 24 * 60 / arguments.polling_rate)
+    sensors = get_simulated_readings(arguments.sensors, readings_per_sensor, arguments.polling_rate * 60)
+    print("{} sensors x {} readings".format(arguments.sensors, readings_per_sensor))
+
+    start = time.perf_counter()
+    per_reading_results = [analyze_per_reading(*sensor) for sensor in sensors]
+    per_reading_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analytics = AnalyticsController()
+    for sensor in sensors:
+        analytics.add_readings(*sensor)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized_results = []
+    for sensor_id in analytics.get_sensor_ids():
+        vectorized_results.append((
+            analytics.get_status_fractions(sensor_id),
+            analytics.get_dwell_seconds(sensor_id),
+            analytics.get_rolling_means(sensor_id, WINDOW)[1],
+            analytics.get_excursions(sensor_id),
+            analytics.get_ramp_rates(sensor_id, WINDOW)[1]
+        ))
+    vectorized_seconds = time.perf_counter() - start
+
+    for (counts, seconds, rolling_means, excursions), (fractions, dwell, means, vectorized_excursions, _) in zip(per_reading_results, vectorized_results):
+        assert all(abs(counts[status] / readings_per_sensor - fractions[status]) < 1e-9 for status in counts)
+        assert all(abs(seconds[status] - dwell[status]) < 1e-6 for status in seconds)
+        assert all((mean == None and means[index] != means[index]) or abs(mean - means[index]) < 1e-6 for index, mean in enumerate(rolling_means))
+        assert excursions == [excursion["start"] for excursion in vectorized_excursions]
+
+    print("{:>28}{:>12.3f} s".format("per reading python loop", per_reading_seconds))
+    print("{:>28}{:>12.3f} s".format("loading into numpy", load_seconds))
+    print("{:>28}{:>12.3f} s (also with ramp rates)".format("vectorized", vectorized_seconds))
+    print("results agree")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import controllers.temp_sensor_controller
+from controllers.temp_sensor_controller import TempSensorController
+from controllers.temp_sensor_archive_controller import ArchiveController, ArchiveReader
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from models.temp_sensor import TempSensor
+
+# logs a simulated run (csv, json lines and the compacted json) against a
+# SimulatedW1Bus (with readings timestamped one polling rate apart, as in a real
+# run, rather than as fast as they are made), archives each log, and reports the size of every log next to
+# its archive, then times random range lookups through ArchiveReader
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_archive_benchmark --days 14 --sensors 4
+
+# stands in for the time module in the controller, so each poll is timestamped
+# one polling rate after the last one
+class SimulatedClock:
+    def __init__(self, polling_rate):
+        self.POLLING_RATE = polling_rate * 60
+        self.current = 1545083582.0
+        self.monotonic = time.monotonic
+
+    def time(self):
+        self.current += self.POLLING_RATE
+        return self.current
+
+def log_simulated_run(number_of_sensors, polls, polling_rate):
+    bus = SimulatedW1Bus("devices", number_of_sensors, conversion_latency=0.0, seed=number_of_sensors)
+    sensor_configs = [
+        {
+            "id": sensor_id,
+            "name": "FV{}".format(index + 1),
+            "target_temp": 65,
+            "positive_allowance": 2,
+            "negative_allowance": 2,
+            "led_pins": None,
+            "polling_rate": None
+        }
+        for index, sensor_id in enumerate(bus.SENSOR_IDS)
+    ]
+
+    controllers.temp_sensor_controller.time = SimulatedClock(polling_rate)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        controller = TempSensorController([], sensor_configs=sensor_configs, w1_devices_directory=bus.DIRECTORY, w1_parser_class=bus.get_parser_class())
+        for _ in range(polls):
+            bus.update()
+            controller.get_temps()
+        controller.close()
+        controller.JSON_CONTROLLER.compact()
+
+    return controller
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark archiving a simulated run's logs.")
+    parser.add_argument("--days", type=float, default=14, help="length of the simulated run")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--sensors", type=int, default=4, help="number of simulated sensors")
+    parser.add_argument("--lookups", type=int, default=1000, help="number of random one hour range lookups")
+    arguments = parser.parse_args()
+
+    TempSensor.RETRY_DELAY = 0
+    polls = int(arguments.days * 24 * 60 / arguments.polling_rate)
+    working_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+
+        try:
+            print("logging {} polls of {} sensors...".format(polls, arguments.sensors))
+            controller = log_simulated_run(arguments.sensors, polls, arguments.polling_rate)
+            archive_controller = ArchiveController()
+
+            print("{:>8}{:>16}{:>16}{:>12}{:>16}".format("log", "log bytes", "archive bytes", "ratio", "archive (s)"))
+            for filepath in (controller.CSV_CONTROLLER.filepath, controller.JSON_CONTROLLER.filepath, controller.JSON_CONTROLLER.COMPACTED_FILEPATH):
+                start = time.perf_counter()
+                archive_filepath = archive_controller.archive_log(filepath)
+                elapsed = time.perf_counter() - start
+                log_size = os.path.getsize(filepath)
+                archive_size = os.path.getsize(archive_filepath)
+                print("{:>8}{:>16}{:>16}{:>11.1f}x{:>16.3f}".format(
+                    os.path.splitext(filepath)[1], log_size, archive_size, log_size / archive_size, elapsed
+                ))
+
+            reader = ArchiveReader(archive_filepath)
+            sensor_ids = list(reader.SENSORS)
+            first_timestamp = reader.get_reading(sensor_ids[0], 0)[0]
+            last_timestamp = reader.get_reading(sensor_ids[0], -1)[0]
+            randomizer = random.Random(0)
+
+            start = time.perf_counter()
+            for _ in range(arguments.lookups):
+                lookup_start = randomizer.uniform(first_timestamp, last_timestamp)
+                reader.get_readings(randomizer.choice(sensor_ids), lookup_start, lookup_start + 3600)
+            elapsed = time.perf_counter() - start
+            reader.close()
+
+            print("{} random one hour lookups: {:.3f} ms each".format(arguments.lookups, elapsed / arguments.lookups * 1000))
+        finally:
+            os.chdir(working_directory)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controllers.temp_sensor_controller import TempSensorController
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+
+# times whole polls of a SimulatedW1Bus whose probes take a real probe's conversion
+# time, one at a time like on a real bus master: reading each probe in turn
+# (sequential and threaded polling) against converting them all at once first
+# (bulk_conversion, see W1Therm), at 12 bit and at lower resolutions
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_bulk_conversion_benchmark --sensors 10
+
+CASES = (
+    ("sequential, one conversion per probe", "sequential", False, None),
+    ("threaded, one conversion per probe", "threaded", False, None),
+    ("threaded, bulk conversion", "threaded", True, None),
+    ("threaded, bulk conversion at 11 bit", "threaded", True, 11),
+    ("threaded, bulk conversion at 9 bit", "threaded", True, 9)
+)
+
+def run_case(polling_mode, bulk_conversion, resolution, arguments):
+    with tempfile.TemporaryDirectory() as directory:
+        bus = SimulatedW1Bus(os.path.join(directory, "devices"), arguments.sensors, conversion_latency=arguments.conversion_latency, seed=0)
+        sensor_configs = [
+            {
+                "id": sensor_id,
+                "name": "FV{}".format(index + 1),
+                "target_temp": 65,
+                "positive_allowance": 2,
+                "negative_allowance": 2,
+                "led_pins": None,
+                "polling_rate": None,
+                "resolution": resolution
+            }
+            for index, sensor_id in enumerate(bus.SENSOR_IDS)
+        ]
+        logs_directory = os.path.join(directory, "run")
+        os.makedirs(logs_directory)
+        working_directory = os.getcwd()
+        os.chdir(logs_directory)
+        poll_seconds = []
+
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                controller = TempSensorController(
+                    [],
+                    polling_mode=polling_mode,
+                    sensor_configs=sensor_configs,
+                    w1_devices_directory=bus.DIRECTORY,
+                    w1_parser_class=bus.get_parser_class(),
+                    device_rescan_interval=None,
+                    bulk_conversion=bulk_conversion,
+                    w1_therm_class=bus.get_therm_class()
+                )
+
+                for _ in range(arguments.polls):
+                    bus.update()
+                    start = time.perf_counter()
+                    controller.get_temps()
+                    poll_seconds.append(time.perf_counter() - start)
+
+                errors = sum(sensor.ERROR != None for sensor in controller.selected_temp_sensors)
+                controller.close()
+        finally:
+            os.chdir(working_directory)
+
+    assert errors == 0
+    return sum(poll_seconds) / len(poll_seconds)
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark polling a bus with and without bulk conversion.")
+    parser.add_argument("--sensors", type=int, default=10, help="number of simulated probes on the bus")
+    parser.add_argument("--polls", type=int, default=3, help="polls per case")
+    parser.add_argument("--conversion-latency", type=float, default=0.75, help="seconds a probe takes to convert at 12 bit")
+    arguments = parser.parse_args()
+
+    print("{} probes on one bus, {} ms per 12 bit conversion, {} polls per case".format(arguments.sensors, arguments.conversion_latency * 1000, arguments.polls))
+    print("{:<40}{:>16}".format("acquisition", "poll (ms)"))
+    for name, polling_mode, bulk_conversion, resolution in CASES:
+        print("{:<40}{:>16.1f}".format(name, run_case(polling_mode, bulk_conversion, resolution, arguments) * 1000))
+
+if __name__ == "__main__":
+    run()
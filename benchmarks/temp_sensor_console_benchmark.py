@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controllers.temp_sensor_controller import TempSensorController
+from helpers.temp_sensor_scheduler import PollScheduler
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from helpers.temp_sensor_logging import OUTPUT_MODES, configure_logging
+from models.temp_sensor import TempSensor
+from temp_sensor_main import poll_sensors
+
+# runs the logger against a SimulatedW1Bus with a flaky probe or two, with its console
+# output going to a file (as it would to journald under systemd), in each console
+# output mode, and reports what the console costs: bytes and lines written per poll,
+# and poll time. each poll runs the main loop's body (poll_sensors), so everything a
+# poll writes to the console is counted
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_console_benchmark --sensors 8 --polls 500
+
+def run_case(console_output, arguments):
+    with tempfile.TemporaryDirectory() as directory:
+        bus = SimulatedW1Bus(os.path.join(directory, "devices"), arguments.sensors, conversion_latency=0, crc_failure_rate=arguments.crc_failure_rate, seed=0)
+        sensor_configs = [
+            {
+                "id": sensor_id,
+                "name": "FV{}".format(index + 1),
+                "target_temp": 65,
+                "positive_allowance": 2,
+                "negative_allowance": 2,
+                "led_pins": None,
+                "polling_rate": None
+            }
+            for index, sensor_id in enumerate(bus.SENSOR_IDS)
+        ]
+        logs_directory = os.path.join(directory, "run")
+        os.makedirs(logs_directory)
+        console_filepath = os.path.join(directory, "console.log")
+        working_directory = os.getcwd()
+        os.chdir(logs_directory)
+
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                controller = TempSensorController(
+                    [],
+                    sensor_configs=sensor_configs,
+                    w1_devices_directory=bus.DIRECTORY,
+                    w1_parser_class=bus.get_parser_class(),
+                    device_rescan_interval=None,
+                    console_output=console_output
+                )
+
+            scheduler = PollScheduler(120, controller.get_sensor_polling_rates())
+
+            # only the polls' own output is counted, not the start up messages
+            with open(console_filepath, "w") as console_file, contextlib.redirect_stdout(console_file):
+                start = time.perf_counter()
+                for _ in range(arguments.polls):
+                    bus.update()
+                    poll_sensors(controller, scheduler, bus.SENSOR_IDS)
+                poll_seconds = (time.perf_counter() - start) / arguments.polls
+
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                controller.close()
+
+            with open(console_filepath, "rb") as console_file:
+                console_output_bytes = console_file.read()
+        finally:
+            os.chdir(working_directory)
+
+    return len(console_output_bytes) / arguments.polls, console_output_bytes.count(b"\n") / arguments.polls, poll_seconds
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the console output modes.")
+    parser.add_argument("--sensors", type=int, default=8, help="number of simulated probes")
+    parser.add_argument("--polls", type=int, default=500, help="polls per mode")
+    parser.add_argument("--crc-failure-rate", type=float, default=0.02, help="chance of a read failing its crc")
+    arguments = parser.parse_args()
+
+    TempSensor.RETRY_DELAY = 0
+    print("{} probes, {} polls per mode, {:.0%} of reads failing their crc".format(arguments.sensors, arguments.polls, arguments.crc_failure_rate))
+    print("{:<10}{:>16}{:>16}{:>16}{:>16}".format("mode", "bytes/poll", "lines/poll", "vs verbose", "poll (ms)"))
+    verbose_bytes = None
+    for console_output in OUTPUT_MODES:
+        bytes_per_poll, lines_per_poll, poll_seconds = run_case(console_output, arguments)
+        verbose_bytes = verbose_bytes or bytes_per_poll
+        print("{:<10}{:>16.0f}{:>16.1f}{:>15.1%}{:>16.2f}".format(console_output, bytes_per_poll, lines_per_poll, bytes_per_poll / verbose_bytes, poll_seconds * 1000))
+
+    configure_logging()
+
+if __name__ == "__main__":
+    run()
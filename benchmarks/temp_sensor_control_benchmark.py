@@ -0,0 +1,124 @@
+import os
+import sys
+import math
+import time
+import shutil
+import argparse
+import tempfile
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.temp_sensor_relay import Relay
+from helpers.temp_sensor_thermal_plant import SimulatedFermenter
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from models.temp_sensor import TempSensor
+from models.temp_sensor_control import TempPidControl, TempDeadbandControl
+from controllers.temp_sensor_control_controller import ControlChannel
+
+# runs a simulated fermentation (see SimulatedFermenter) under each control law, with
+# every control tick reading the probe through a SimulatedW1Bus and switching relays
+# on the GPIO stub, in simulated time. reports how well the beer held its target, how
+# often the relays switched and how long each control tick took (the latency from a
+# reading to the relays reacting, bounded by the control period)
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_control_benchmark --days 7 --period 5
+
+TARGET_TEMP = 66
+ALLOWANCE = 1
+MINIMUM_ON_TIME = 60
+MINIMUM_OFF_TIME = 60
+
+def get_controls():
+    return (
+        ("none", None),
+        ("deadband", TempDeadbandControl(0.5)),
+        ("pid", TempPidControl(1.0, 1.0 / 7200, 0.0))
+    )
+
+def simulate(control, days, period, directory):
+    bus = SimulatedW1Bus(directory, 1, conversion_latency=0, seed=0)
+    sensor_id = bus.SENSOR_IDS[0]
+    fermenter = SimulatedFermenter(start_temp=70.0)
+    bus.set_temp(sensor_id, fermenter.get_probe_temp_in_celsius())
+    sensor = TempSensor("FV1", 1, sensor_id, TARGET_TEMP, ALLOWANCE, ALLOWANCE, None, w1_devices_directory=bus.DIRECTORY, w1_parser_class=bus.get_parser_class())
+    heater = Relay(16, MINIMUM_ON_TIME, MINIMUM_OFF_TIME)
+    cooler = Relay(18, MINIMUM_ON_TIME, MINIMUM_OFF_TIME)
+    channel = ControlChannel(sensor, control, heater, cooler, bus.get_parser_class()(sensor.FILE)) if control != None else None
+
+    ticks = int(days * 86400 / period)
+    squared_error = 0.0
+    ticks_within = 0
+    worst_error = 0.0
+    latencies = []
+    both_on = 0
+
+    for tick in range(ticks):
+        now = tick * period
+        if channel != None:
+            channel.step(now)
+            latencies.append(channel.latest_latency)
+        both_on += heater.is_on and cooler.is_on
+
+        fermenter.step(period, heater.is_on, cooler.is_on)
+        bus.set_temp(sensor_id, fermenter.get_probe_temp_in_celsius())
+
+        error = fermenter.beer_temp - TARGET_TEMP
+        squared_error += error ** 2
+        ticks_within += abs(error) <= ALLOWANCE
+        # ignore the pull down from the start temp
+        if now > 6 * 3600:
+            worst_error = max(worst_error, abs(error))
+
+    heater.set(False, ticks * period)
+    cooler.set(False, ticks * period)
+    latencies.sort()
+
+    return {
+        "rms_error": math.sqrt(squared_error / ticks),
+        "worst_error": worst_error,
+        "within": ticks_within / ticks,
+        "switches": heater.switches + cooler.switches,
+        "heater_duty": heater.seconds_on / (ticks * period),
+        "cooler_duty": cooler.seconds_on / (ticks * period),
+        "both_on": both_on,
+        "median_latency": latencies[len(latencies) // 2] if latencies else None,
+        "maximum_latency": latencies[-1] if latencies else None
+    }
+
+def format_latency(latency):
+    return "{:.3f}".format(latency * 1000) if latency != None else "-"
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the temp control laws against a simulated fermenter.")
+    parser.add_argument("--days", type=float, default=7, help="length of the simulated fermentation")
+    parser.add_argument("--period", type=float, default=5, help="control period, in seconds")
+    arguments = parser.parse_args()
+
+    print("{} days, target {} F +/- {} F, control every {} s".format(arguments.days, TARGET_TEMP, ALLOWANCE, arguments.period))
+    print("{:>10}{:>12}{:>12}{:>10}{:>10}{:>10}{:>10}{:>14}{:>14}".format("control", "rms (F)", "worst (F)", "within", "switches", "heating", "cooling", "median (ms)", "slowest (ms)"))
+
+    for name, control in get_controls():
+        directory = tempfile.mkdtemp(prefix="ferm_control_")
+        try:
+            start = time.perf_counter()
+            results = simulate(control, arguments.days, arguments.period, directory)
+            seconds = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        assert results["both_on"] == 0
+        print("{:>10}{:>12.2f}{:>12.2f}{:>9.1f}%{:>10}{:>9.1f}%{:>9.1f}%{:>14}{:>14}   ({:.1f} s)".format(
+            name,
+            results["rms_error"],
+            results["worst_error"],
+            results["within"] * 100,
+            results["switches"],
+            results["heater_duty"] * 100,
+            results["cooler_duty"] * 100,
+            format_latency(results["median_latency"]),
+            format_latency(results["maximum_latency"]),
+            seconds
+        ))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import gzip
+import json
+import shutil
+import argparse
+import tempfile
+import http.client
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from models.temp_sensor import TempSensor
+from controllers.temp_sensor_http_controller import HttpController
+
+# fills an HttpController with two weeks of polls from simulated sensors, then
+# measures what a dashboard costs: requests per second for /latest (plain, gzipped
+# and revalidated with If-None-Match) and for a day of /history, and how long
+# handing each poll's snapshot to the server takes on the polling thread
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_http_benchmark --sensors 4 --requests 2000
+
+def request(connection, path, headers):
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.getheader("ETag"), response.read()
+
+def measure(connection, path, headers, number_of_requests):
+    start = time.perf_counter()
+    for _ in range(number_of_requests):
+        status, etag, body = request(connection, path, headers)
+    return number_of_requests / (time.perf_counter() - start), status, len(body)
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the http api against a simulated logger.")
+    parser.add_argument("--sensors", type=int, default=4, help="number of simulated sensors")
+    parser.add_argument("--days", type=float, default=14, help="days of polls to fill the history with")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per case")
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ferm_http_")
+    http_controller = HttpController("127.0.0.1", 0)
+
+    try:
+        bus = SimulatedW1Bus(directory, arguments.sensors, conversion_latency=0, seed=0)
+        sensors = [
+            TempSensor("FV{}".format(position), position, sensor_id, 65, 2, 2, None, w1_devices_directory=bus.DIRECTORY, w1_parser_class=bus.get_parser_class())
+            for position, sensor_id in enumerate(bus.SENSOR_IDS, 1)
+        ]
+        polls = int(arguments.days * 24 * 60 / arguments.polling_rate)
+        start_timestamp = round(time.time() - polls * arguments.polling_rate * 60)
+        timestamps = [start_timestamp + poll * arguments.polling_rate * 60 for poll in range(polls)]
+        update_seconds = 0.0
+
+        for timestamp in timestamps:
+            bus.update()
+            for sensor in sensors:
+                sensor.get_temp_at(timestamp)
+            start = time.perf_counter()
+            http_controller.update_poll(sensors, sensors)
+            update_seconds += time.perf_counter() - start
+
+        connection = http.client.HTTPConnection("127.0.0.1", http_controller.port)
+        # wait for the server thread to take the last snapshot
+        while json.loads(request(connection, "/stats", {})[2])["sensors"][0]["readings"] < polls:
+            time.sleep(0.01)
+
+        _, etag, _ = request(connection, "/latest", {})
+        day_start = timestamps[-1] - 86400
+        last_day = "/sensors/{}/history?from={}".format(bus.SENSOR_IDS[0], day_start)
+        _, history_etag, history_body = request(connection, last_day, {"Accept-Encoding": "gzip"})
+        assert len(json.loads(gzip.decompress(history_body))["readings"]) == sum(timestamp >= day_start for timestamp in timestamps)
+
+        print("{} sensors, {} polls each in history".format(arguments.sensors, polls))
+        print("handing a poll to the server: {:.1f} us on the polling thread".format(update_seconds / polls * 1e6))
+        print("{:<36}{:>12}{:>10}{:>12}".format("request", "per second", "status", "bytes"))
+        for name, path, headers in (
+            ("/latest", "/latest", {}),
+            ("/latest (gzip)", "/latest", {"Accept-Encoding": "gzip"}),
+            ("/latest (If-None-Match)", "/latest", {"If-None-Match": etag}),
+            ("/stats (gzip)", "/stats", {"Accept-Encoding": "gzip"}),
+            ("/history, last day", last_day, {}),
+            ("/history, last day (gzip)", last_day, {"Accept-Encoding": "gzip"}),
+            ("/history, last day (If-None-Match)", last_day, {"If-None-Match": history_etag})
+        ):
+            requests_per_second, status, length = measure(connection, path, headers, arguments.requests)
+            print("{:<36}{:>12.0f}{:>10}{:>12}".format(name, requests_per_second, status, length))
+
+        connection.close()
+    finally:
+        http_controller.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    run()
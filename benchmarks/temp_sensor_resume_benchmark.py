@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controllers.temp_sensor_checkpoint_controller import CheckpointController
+from controllers.temp_sensor_json_controller import JsonController
+from models.temp_sensor_stats import RunningTempStats
+
+# compares the two ways a restarted run could get its sensors' aggregates back:
+# replaying the whole json lines log of the interrupted run through RunningTempStats,
+# or loading the checkpoint (see CheckpointController) and restoring them from it
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_resume_benchmark --days 30 --sensors 12
+
+# a stand-in for the sensors a checkpoint is saved from
+class CheckpointedSensor:
+    def __init__(self, id, stats):
+        self.ID = id
+        self.STATS = stats
+
+    def get_checkpoint(self):
+        return {"stats": self.STATS.to_dict()}
+
+def get_status(temp):
+    if temp == 0.0:
+        return RunningTempStats.ERROR
+    if temp > 67:
+        return RunningTempStats.ABOVE
+    if temp < 63:
+        return RunningTempStats.BELOW
+    return RunningTempStats.WITHIN
+
+def write_log(filepath, number_of_sensors, readings_per_sensor, polling_rate):
+    randomizer = random.Random(0)
+    temps = [65.0] * number_of_sensors
+    sensor_ids = ["28-{:012x}".format(index) for index in range(number_of_sensors)]
+
+    with open(filepath, 'w') as json_lines_file:
+        for sensor_id in sensor_ids:
+            json_lines_file.write(json.dumps({"Record": JsonController.SENSOR_RECORD, "Sensor ID": sensor_id, "Sensor Data": {"Recorded Temp Data": []}}) + "\n")
+        for reading in range(readings_per_sensor):
+            for index, sensor_id in enumerate(sensor_ids):
+                temps[index] += 0.02 * (65 - temps[index]) + randomizer.gauss(0, 0.2)
+                json_lines_file.write(json.dumps({
+                    "Record": JsonController.READING_RECORD,
+                    "Sensor ID": sensor_id,
+                    "Timestamp": 1545083582.0 + reading * polling_rate,
+                    "Temp (in Fahrenheit)": round(temps[index], 2)
+                }, separators=(",", ":")) + "\n")
+
+def replay_log(filepath):
+    stats = {}
+
+    for sensor in JsonController.read_json_lines_log(filepath):
+        sensor_stats = stats[sensor["Sensor ID"]] = RunningTempStats()
+        for temp_data in sensor["Sensor Data"]["Recorded Temp Data"]:
+            temp = temp_data["Temp (in Fahrenheit)"]
+            sensor_stats.add(temp, get_status(temp), temp_data["Timestamp"])
+
+    return stats
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark resuming from a checkpoint against replaying the log.")
+    parser.add_argument("--days", type=float, default=30, help="length of the interrupted run")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--sensors", type=int, default=12, help="number of simulated sensors")
+    arguments = parser.parse_args()
+
+    readings_per_sensor = int(arguments.days * 24 * 60 / arguments.polling_rate)
+    directory = tempfile.mkdtemp(prefix="ferm_resume_")
+
+    try:
+        log_filepath = os.path.join(directory, "ferm_temp_data_log.jsonl")
+        write_log(log_filepath, arguments.sensors, readings_per_sensor, arguments.polling_rate * 60)
+
+        start = time.perf_counter()
+        replayed_stats = replay_log(log_filepath)
+        replay_seconds = time.perf_counter() - start
+
+        checkpoint_controller = CheckpointController(os.path.join(directory, "ferm_temp_checkpoint"))
+        start = time.perf_counter()
+        checkpoint_controller.save([CheckpointedSensor(id, stats) for id, stats in replayed_stats.items()], {})
+        save_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        checkpoint = checkpoint_controller.load()
+        restored_stats = {id: RunningTempStats.from_dict(sensor["stats"]) for id, sensor in checkpoint["sensors"].items()}
+        restore_seconds = time.perf_counter() - start
+
+        assert all(restored_stats[id].to_dict() == stats.to_dict() for id, stats in replayed_stats.items())
+
+        print("{} sensors x {} readings ({:.1f} MB of log, {:.1f} KB of checkpoint)".format(
+            arguments.sensors,
+            readings_per_sensor,
+            os.path.getsize(log_filepath) / 1024 / 1024,
+            os.path.getsize(checkpoint_controller.FILEPATH) / 1024
+        ))
+        print("{:>24}{:>12.1f} ms".format("replaying the log", replay_seconds * 1000))
+        print("{:>24}{:>12.1f} ms".format("restoring a checkpoint", restore_seconds * 1000))
+        print("{:>24}{:>12.1f} ms (atomic, once per poll)".format("saving a checkpoint", save_seconds * 1000))
+        print("aggregates agree")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.temp_sensor_schedule import TempSchedule
+
+# times looking a schedule's target up at each poll of a whole fermentation, the way
+# TempSchedule does it (a check of the segment the last poll landed in, else a binary
+# search), against a binary search every time and against working the target out
+# from the steps every time, and checks all three agree
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_schedule_benchmark --steps 12 --days 30
+
+SECONDS_PER_DAY = 86400
+
+def get_steps(count, days):
+    return [
+        {
+            "target_temp": 50 + (index % 4) * 4,
+            "positive_allowance": 2,
+            "negative_allowance": 2,
+            "days": days / count / 2,
+            "ramp_days": days / count / 2
+        }
+        for index in range(count)
+    ]
+
+# the target worked out from the steps, as it would be without precomputed segments
+def get_naive_target_at(steps, start, timestamp):
+    offset = timestamp - start
+    previous_target_temp = None
+
+    for step in steps:
+        ramp_seconds = step["ramp_days"] * SECONDS_PER_DAY if previous_target_temp != None else 0
+        if offset < ramp_seconds:
+            return round(previous_target_temp + (step["target_temp"] - previous_target_temp) * max(0.0, offset) / ramp_seconds, 2)
+        offset -= ramp_seconds
+
+        if offset < step["days"] * SECONDS_PER_DAY:
+            return step["target_temp"]
+        offset -= step["days"] * SECONDS_PER_DAY
+        previous_target_temp = step["target_temp"]
+
+    return steps[-1]["target_temp"]
+
+def time_lookups(get_target_at, timestamps):
+    start = time.perf_counter()
+    targets = [get_target_at(timestamp) for timestamp in timestamps]
+
+    return (time.perf_counter() - start) / len(timestamps), targets
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark schedule target lookups.")
+    parser.add_argument("--steps", type=int, default=12, help="schedule steps, each a ramp then a hold")
+    parser.add_argument("--days", type=float, default=30, help="length of the schedule in days")
+    parser.add_argument("--polling-rate", type=float, default=10, help="seconds between lookups")
+    arguments = parser.parse_args()
+
+    steps = get_steps(arguments.steps, arguments.days)
+    start = 1545000000.0
+    timestamps = [start + index * arguments.polling_rate for index in range(int(arguments.days * SECONDS_PER_DAY / arguments.polling_rate))]
+    cached_schedule = TempSchedule(steps, start)
+    searched_schedule = TempSchedule(steps, start)
+
+    def get_searched_target_at(timestamp):
+        # points the cache at the last segment, so every lookup before it searches
+        searched_schedule._TempSchedule__latest_index = -1
+        return searched_schedule.get_range_at(timestamp)[0]
+
+    cases = (
+        ("segment cache", lambda timestamp: cached_schedule.get_range_at(timestamp)[0]),
+        ("binary search", get_searched_target_at),
+        ("from the steps", lambda timestamp: get_naive_target_at(steps, start, timestamp))
+    )
+
+    print("{} steps over {} days, {} lookups ({} s apart)".format(arguments.steps, arguments.days, len(timestamps), arguments.polling_rate))
+    print("{:<20}{:>16}".format("lookup", "per lookup (us)"))
+    expected_targets = None
+    for name, get_target_at in cases:
+        lookup_seconds, targets = time_lookups(get_target_at, timestamps)
+        expected_targets = expected_targets or targets
+        assert targets == expected_targets
+        print("{:<20}{:>16.2f}".format(name, lookup_seconds * 1000000))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import controllers.temp_sensor_controller
+from controllers.temp_sensor_controller import TempSensorController
+from controllers.temp_sensor_archive_controller import ArchiveController
+from helpers.temp_sensor_segments import find_segments
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from models.temp_sensor import TempSensor
+
+# logs a simulated run (with readings timestamped one polling rate apart, as in a real
+# run) as one csv and json log, as segments, and as gzipped segments, and reports the
+# poll time spent logging (mean and worst, which is when a log rolls over), the size of
+# the logs on disk, and how long it takes to find the csv segments holding one day of
+# readings through the manifest against opening every segment to look
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_segments_benchmark --days 14 --sensors 8
+
+CASES = (
+    ("one file", None, False),
+    ("segments", 1, False),
+    ("gzipped segments", 1, True)
+)
+
+# stands in for the time module in the controller, so each poll is timestamped
+# one polling rate after the last one
+class SimulatedClock:
+    def __init__(self, polling_rate):
+        self.POLLING_RATE = polling_rate * 60
+        self.current = 1545083582.0
+        self.monotonic = time.monotonic
+        self.perf_counter = time.perf_counter
+
+    def time(self):
+        self.current += self.POLLING_RATE
+        return self.current
+
+def log_simulated_run(arguments, polls, segment_megabytes, compress_segments):
+    bus = SimulatedW1Bus("devices", arguments.sensors, conversion_latency=0.0, seed=arguments.sensors)
+    sensor_configs = [
+        {
+            "id": sensor_id,
+            "name": "FV{}".format(index + 1),
+            "target_temp": 65,
+            "positive_allowance": 2,
+            "negative_allowance": 2,
+            "led_pins": None,
+            "polling_rate": None
+        }
+        for index, sensor_id in enumerate(bus.SENSOR_IDS)
+    ]
+    clock = SimulatedClock(arguments.polling_rate)
+    controllers.temp_sensor_controller.time = clock
+    poll_seconds = []
+
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            controller = TempSensorController(
+                [],
+                sensor_configs=sensor_configs,
+                w1_devices_directory=bus.DIRECTORY,
+                w1_parser_class=bus.get_parser_class(),
+                device_rescan_interval=None,
+                console_output="quiet",
+                segment_size=int(segment_megabytes * 1024 * 1024) if segment_megabytes != None else None,
+                compress_segments=compress_segments
+            )
+            for _ in range(polls):
+                bus.update()
+                controller.get_temps()
+                stage_seconds = controller.METRICS_CONTROLLER.latest_stage_seconds
+                poll_seconds.append(stage_seconds["csv"] + stage_seconds["json"])
+            controller.close()
+    finally:
+        controllers.temp_sensor_controller.time = time
+
+    return poll_seconds, clock.current
+
+def get_directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, filename)) for filename in os.listdir(directory))
+
+# finds the csv segments with readings between start and end by reading each one
+def scan_segments(directory, start, end):
+    filepaths = []
+
+    for filename in sorted(os.listdir(directory)):
+        filepath = os.path.join(directory, filename)
+        if os.path.splitext(filename)[1] not in (".csv", ".gz") or ".csv" not in filename:
+            continue
+
+        for metadata, timestamps, temps in ArchiveController.read_log(filepath):
+            if any(start <= timestamp <= end for timestamp in timestamps):
+                filepaths.append(filepath)
+                break
+
+    return filepaths
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark segmented and gzipped logs.")
+    parser.add_argument("--days", type=float, default=14, help="length of the simulated run")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--sensors", type=int, default=8, help="number of simulated sensors")
+    arguments = parser.parse_args()
+
+    TempSensor.RETRY_DELAY = 0
+    polls = int(arguments.days * 24 * 60 / arguments.polling_rate)
+    working_directory = os.getcwd()
+    print("{} polls of {} sensors ({} days), 1 MB segments".format(polls, arguments.sensors, arguments.days))
+    print("{:<20}{:>14}{:>14}{:>12}{:>12}{:>16}{:>16}".format("logs", "mean (ms)", "worst (ms)", "files", "disk (kB)", "manifest (ms)", "scan (ms)"))
+
+    for name, segment_megabytes, compress_segments in CASES:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+
+            try:
+                poll_seconds, end = log_simulated_run(arguments, polls, segment_megabytes, compress_segments)
+                csv_directory = os.path.join("logs", "csv")
+                json_directory = os.path.join("logs", "json")
+                files = sum(len([filename for filename in os.listdir(log_directory) if "manifest" not in filename]) for log_directory in (csv_directory, json_directory))
+                disk_size = get_directory_size(csv_directory) + get_directory_size(json_directory)
+
+                # the middle day of the run
+                start = end - arguments.days * 86400 / 2
+                manifest_time = scan_time = None
+                if segment_megabytes != None:
+                    timer = time.perf_counter()
+                    found = find_segments(csv_directory, start=start, end=start + 86400)
+                    manifest_time = time.perf_counter() - timer
+
+                    timer = time.perf_counter()
+                    scanned = scan_segments(csv_directory, start, start + 86400)
+                    scan_time = time.perf_counter() - timer
+                    assert sorted(scanned) == sorted(found)
+            finally:
+                os.chdir(working_directory)
+
+        print("{:<20}{:>14.2f}{:>14.2f}{:>12}{:>12.0f}{:>16}{:>16}".format(
+            name,
+            sum(poll_seconds) / len(poll_seconds) * 1000,
+            max(poll_seconds) * 1000,
+            files,
+            disk_size / 1024,
+            "{:.2f}".format(manifest_time * 1000) if manifest_time != None else "-",
+            "{:.1f}".format(scan_time * 1000) if scan_time != None else "-"
+        ))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# measures how long the headless logger takes to import, and how much memory it
+# holds afterwards, with and without the optional plotting component loaded.
+# each measurement runs in a fresh interpreter, so nothing is cached between runs
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_startup_benchmark
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# code run in each fresh interpreter; prints the import time (in seconds)
+# and the peak resident memory (in KB) as json
+CHILD_CODE = """
+import json
+import resource
+import time
+start = time.perf_counter()
+import controllers.temp_sensor_controller
+if {load_plotter}:
+    from controllers.temp_sensor_matplotlib import Plotter
+    Plotter("benchmark.jsonl", headless=True)
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+def measure(load_plotter, runs):
+    results = []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE.format(load_plotter=load_plotter)],
+            cwd=PROJECT_DIRECTORY,
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "median_seconds": statistics.median(result["seconds"] for result in results),
+        "median_max_rss_kb": statistics.median(result["max_rss_kb"] for result in results)
+    }
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the logger's startup cost with and without plotting.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start per case")
+    arguments = parser.parse_args()
+
+    print("{:<28}{:>14}{:>16}".format("case", "import (ms)", "max RSS (MB)"))
+    for name, load_plotter in (("logger only", False), ("logger + plotter", True)):
+        result = measure(load_plotter, arguments.runs)
+        print("{:<28}{:>14.1f}{:>16.1f}".format(
+            name,
+            result["median_seconds"] * 1000,
+            result["median_max_rss_kb"] / 1024
+        ))
+
+if __name__ == "__main__":
+    run()
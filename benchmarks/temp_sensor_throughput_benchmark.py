@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+os.environ.setdefault("FERM_GPIO_STUB", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from controllers.temp_sensor_controller import TempSensorController
+from helpers.temp_sensor_w1_simulator import SimulatedW1Bus
+from models.temp_sensor import TempSensor
+
+# runs the whole logger (reads, classification, csv/json/sqlite logging and
+# printing) against a SimulatedW1Bus for 1 to 64 probes, over as many polls as a
+# run of the given length makes, back to back, and reports polls per second,
+# per-poll latency percentiles and bytes written to the logs
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_throughput_benchmark --days 14
+
+SENSOR_COUNTS = (1, 2, 4, 8, 16, 32, 64)
+
+def get_percentile(sorted_values, percentile):
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def get_directory_size(directory):
+    total = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+def run_case(number_of_sensors, polls, arguments):
+    with tempfile.TemporaryDirectory() as directory:
+        bus = SimulatedW1Bus(
+            os.path.join(directory, "devices"),
+            number_of_sensors,
+            conversion_latency=arguments.conversion_latency,
+            crc_failure_rate=arguments.crc_failure_rate,
+            disappearance_rate=arguments.disappearance_rate,
+            seed=number_of_sensors
+        )
+        sensor_configs = [
+            {
+                "id": sensor_id,
+                "name": "FV{}".format(index + 1),
+                "target_temp": 65,
+                "positive_allowance": 2,
+                "negative_allowance": 2,
+                "led_pins": None,
+                "polling_rate": None
+            }
+            for index, sensor_id in enumerate(bus.SENSOR_IDS)
+        ]
+        logs_directory = os.path.join(directory, "run")
+        os.makedirs(logs_directory)
+        working_directory = os.getcwd()
+        os.chdir(logs_directory)
+        latencies = []
+
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                controller = TempSensorController(
+                    [],
+                    polling_mode=arguments.polling_mode,
+                    sensor_configs=sensor_configs,
+                    sqlite=arguments.sqlite,
+                    w1_devices_directory=bus.DIRECTORY,
+                    w1_parser_class=bus.get_parser_class()
+                )
+
+                for _ in range(polls):
+                    bus.update()
+                    start = time.perf_counter()
+                    controller.get_temps()
+                    latencies.append(time.perf_counter() - start)
+
+                controller.close()
+
+            bytes_written = get_directory_size(logs_directory)
+        finally:
+            os.chdir(working_directory)
+
+    latencies.sort()
+    return {
+        "polls_per_second": len(latencies) / sum(latencies),
+        "p50": get_percentile(latencies, 50),
+        "p95": get_percentile(latencies, 95),
+        "p99": get_percentile(latencies, 99),
+        "bytes_written": bytes_written
+    }
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the logger end to end against a simulated 1-Wire bus.")
+    parser.add_argument("--days", type=float, default=1, help="length of the simulated run")
+    parser.add_argument("--polling-rate", type=float, default=2, help="simulated polling rate, in minutes")
+    parser.add_argument("--sensors", type=int, nargs="+", default=SENSOR_COUNTS, help="sensor counts to benchmark")
+    parser.add_argument("--conversion-latency", type=float, default=0.0, help="seconds each probe read takes")
+    parser.add_argument("--crc-failure-rate", type=float, default=0.0, help="chance of a read failing its crc")
+    parser.add_argument("--disappearance-rate", type=float, default=0.0, help="chance per poll of a probe dropping off the bus")
+    parser.add_argument("--retry-delay", type=float, default=0.0, help="seconds between read retries")
+    parser.add_argument("--polling-mode", choices=("threaded", "sequential"), default="threaded")
+    parser.add_argument("--sqlite", action="store_true", help="also log to sqlite")
+    arguments = parser.parse_args()
+
+    TempSensor.RETRY_DELAY = arguments.retry_delay
+    polls = int(arguments.days * 24 * 60 / arguments.polling_rate)
+
+    print("{} polls per case ({} days at {} minute polling)".format(polls, arguments.days, arguments.polling_rate))
+    print("{:>8}{:>12}{:>12}{:>12}{:>12}{:>16}{:>16}".format(
+        "sensors", "polls/s", "p50 (ms)", "p95 (ms)", "p99 (ms)", "bytes written", "bytes/reading"
+    ))
+    for number_of_sensors in arguments.sensors:
+        result = run_case(number_of_sensors, polls, arguments)
+        print("{:>8}{:>12.1f}{:>12.2f}{:>12.2f}{:>12.2f}{:>16}{:>16.1f}".format(
+            number_of_sensors,
+            result["polls_per_second"],
+            result["p50"] * 1000,
+            result["p95"] * 1000,
+            result["p99"] * 1000,
+            result["bytes_written"],
+            result["bytes_written"] / (polls * number_of_sensors)
+        ))
+
+if __name__ == "__main__":
+    run()
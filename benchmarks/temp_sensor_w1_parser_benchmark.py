@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.temp_sensor_w1_parser import W1SlaveParser
+
+# compares reading a w1_slave file with the old readlines()/find("t=") path
+# against W1SlaveParser, on a regular file holding a real ds18b20 reading
+#
+# run from the project root with:
+# > python3 -m benchmarks.temp_sensor_w1_parser_benchmark
+
+W1_SLAVE_CONTENTS = b"72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n72 01 4b 46 7f ff 0e 10 57 t=23125\n"
+
+# the read path TempSensor used before W1SlaveParser
+def read_with_readlines(filepath):
+    with open(filepath, "r") as data_file:
+        lines = data_file.readlines()
+
+    if len(lines) > 0 and lines[0].strip()[-3:] == "YES":
+        raw_temp = lines[1]
+        if raw_temp.find("t=") != -1:
+            temp_fahrenheit = round(float(raw_temp[raw_temp.find("t=") + 2:]) / 1000.0 * 9.0 / 5.0 + 32.0, 2)
+            if temp_fahrenheit < 110 and temp_fahrenheit != 0.0:
+                return temp_fahrenheit
+
+    return 0.0
+
+def read_with_parser(parser):
+    reading = parser.read()
+    return round(reading.TEMP_IN_CELSIUS * 9.0 / 5.0 + 32.0, 2)
+
+# returns the mean time per call (in microseconds) and the peak memory
+# allocated while making the calls (in bytes)
+def measure(function, argument, reads):
+    start = time.perf_counter()
+    for _ in range(reads):
+        function(argument)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in range(min(reads, 1000)):
+        function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return seconds / reads * 1000000, peak
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark w1_slave reading and parsing.")
+    parser.add_argument("--reads", type=int, default=100000, help="reads to time per case")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, "w1_slave")
+        with open(filepath, "wb") as w1_slave_file:
+            w1_slave_file.write(W1_SLAVE_CONTENTS)
+
+        w1_parser = W1SlaveParser(filepath)
+        if read_with_readlines(filepath) != read_with_parser(w1_parser):
+            raise RuntimeError("the two read paths disagree")
+
+        print("{:<24}{:>16}{:>20}".format("case", "per read (us)", "peak alloc (bytes)"))
+        for name, function, argument in (
+            ("readlines + find", read_with_readlines, filepath),
+            ("W1SlaveParser", read_with_parser, w1_parser)
+        ):
+            microseconds, peak = measure(function, argument, arguments.reads)
+            print("{:<24}{:>16.2f}{:>20}".format(name, microseconds, peak))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,161 @@
+import asyncio
+import sqlite3
+import collections
+from helpers.temp_sensor_frames import FrameCodec
+
+# receives the frames streamed by every logger's ExportController and stores
+# their readings in one sqlite database. a frame is only acknowledged once its
+# readings are committed, as the logger forgets a frame once it is acknowledged.
+# the frames that arrive together (from every connection) are committed together
+# memory stays bounded however many nodes and sensors report in: frames have a
+# maximum size, and each sensor keeps only its latest HISTORY_LENGTH readings in memory
+class AggregatorController:
+    HISTORY_LENGTH = 720
+    # runs remembered per node for dropping replayed frames
+    RUNS_PER_NODE = 8
+
+    def __init__(self, host, port, database_filepath):
+        self.HOST = host
+        self.PORT = port
+        self.CONNECTION = sqlite3.connect(database_filepath, check_same_thread=False)
+        self.__create_tables()
+        # (node_name, sensor_id) -> deque of (timestamp, temp, status)
+        self.history = {}
+        # node_name -> {run_start: last sequence stored}, kept in the database along
+        # with the readings so replayed frames are still dropped after a restart
+        self.__last_sequences = self.__read_last_sequences()
+        self.__pending_rows = []
+        # (node_name, run_start) -> last sequence, written with the pending rows
+        self.__pending_sequences = {}
+        self.__commit_task = None
+        self.frames_received = 0
+        self.duplicate_frames = 0
+        self.__server = None
+
+    def __create_tables(self):
+        with self.CONNECTION:
+            self.CONNECTION.execute("PRAGMA journal_mode=WAL")
+            self.CONNECTION.executescript("""
+                CREATE TABLE IF NOT EXISTS readings (
+                    node_name TEXT NOT NULL,
+                    sensor_id TEXT NOT NULL,
+                    epoch_ts REAL NOT NULL,
+                    temp REAL,
+                    status INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS readings_by_node_sensor_and_time ON readings (node_name, sensor_id, epoch_ts);
+                CREATE TABLE IF NOT EXISTS frames (
+                    node_name TEXT NOT NULL,
+                    run_start REAL NOT NULL,
+                    last_sequence INTEGER NOT NULL,
+                    PRIMARY KEY (node_name, run_start)
+                );
+            """)
+
+    # the latest RUNS_PER_NODE runs of each node, with the last sequence stored of each
+    def __read_last_sequences(self):
+        last_sequences = {}
+
+        for node_name, run_start, last_sequence in self.CONNECTION.execute("SELECT node_name, run_start, last_sequence FROM frames ORDER BY run_start"):
+            runs = last_sequences.setdefault(node_name, {})
+            runs[run_start] = last_sequence
+            if len(runs) > self.RUNS_PER_NODE:
+                del runs[min(runs)]
+
+        return last_sequences
+
+    async def start(self):
+        self.__server = await asyncio.start_server(self.__handle_connection, self.HOST, self.PORT)
+        return self.__server
+
+    async def serve_forever(self):
+        server = await self.start()
+        print("-> Aggregator listening on {}.".format(", ".join(str(listener.getsockname()) for listener in server.sockets)))
+        async with server:
+            await server.serve_forever()
+
+    async def __handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        print("-> Logger connected from {}.".format(peer))
+
+        try:
+            while True:
+                length = FrameCodec.LENGTH.unpack(await reader.readexactly(FrameCodec.LENGTH.size))[0]
+                if length > FrameCodec.MAXIMUM_FRAME_LENGTH:
+                    print("!!! -> Frame of {} bytes from {} is too large. Disconnecting it.".format(length, peer))
+                    break
+
+                self.__store_frame(await reader.readexactly(length))
+                await self.__commit()
+                writer.write(FrameCodec.ACK)
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            print("!!! -> Bad frame from {}: {}. Disconnecting it.".format(peer, e))
+        except sqlite3.Error as e:
+            # the logger keeps the frame spooled, and sends it again once it reconnects
+            print("!!! -> SQLite Write Error: {}. Disconnecting {} without acknowledging its frame.".format(e, peer))
+        finally:
+            print("-> Logger at {} disconnected.".format(peer))
+            writer.close()
+
+    def __store_frame(self, body):
+        node_name, run_start, sequence, readings = FrameCodec.decode(body)
+        self.frames_received += 1
+
+        # a frame replayed from a logger's spool may already have been stored
+        runs = self.__last_sequences.setdefault(node_name, {})
+        if sequence <= runs.get(run_start, 0):
+            self.duplicate_frames += 1
+            return
+        runs[run_start] = sequence
+        self.__pending_sequences[(node_name, run_start)] = sequence
+        if len(runs) > self.RUNS_PER_NODE:
+            del runs[min(runs)]
+
+        for sensor_id, timestamp, temp, status in readings:
+            key = (node_name, sensor_id)
+            if key not in self.history:
+                self.history[key] = collections.deque(maxlen=self.HISTORY_LENGTH)
+            self.history[key].append((timestamp, temp, status))
+            self.__pending_rows.append((node_name, sensor_id, timestamp, temp, status))
+
+    # waits for the frames stored so far to be committed. the commit runs once the
+    # connections with a frame ready have all stored theirs, so they share one transaction
+    async def __commit(self):
+        if self.__commit_task == None:
+            self.__commit_task = asyncio.ensure_future(self.__commit_stored_frames())
+
+        await asyncio.shield(self.__commit_task)
+
+    async def __commit_stored_frames(self):
+        await asyncio.sleep(0)
+        self.__commit_task = None
+        self.flush()
+
+    # writes the readings (and the last sequence of each run) received since the last
+    # flush in one transaction. on an error they are kept, and written with the next flush
+    def flush(self):
+        if len(self.__pending_rows) == 0 and len(self.__pending_sequences) == 0:
+            return
+
+        with self.CONNECTION:
+            self.CONNECTION.executemany("INSERT INTO readings VALUES (?, ?, ?, ?, ?)", self.__pending_rows)
+            self.CONNECTION.executemany(
+                "INSERT OR REPLACE INTO frames VALUES (?, ?, ?)",
+                [(node_name, run_start, sequence) for (node_name, run_start), sequence in self.__pending_sequences.items()]
+            )
+        self.__pending_rows = []
+        self.__pending_sequences = {}
+
+    # returns the latest (timestamp, temp, status) of every sensor, keyed by (node_name, sensor_id)
+    def get_latest(self):
+        return {key: readings[-1] for key, readings in self.history.items()}
+
+    def close(self):
+        if self.__server != None:
+            self.__server.close()
+        self.flush()
+        self.CONNECTION.close()
@@ -0,0 +1,124 @@
+import os
+import json
+import queue
+import threading
+import collections
+import urllib.request
+import os.path
+from helpers.temp_sensor_timestamps import format_timestamp
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("alert_controller")
+
+# publishes the alert events raised by the sensors (see TempAlertStateMachine) to
+# every sink it is given. events are only raised when a sensor's alert state changes,
+# so a sink hears about each excursion once when it starts and once when it ends
+class AlertController:
+    def __init__(self, sinks):
+        self.SINKS = sinks
+
+    # prints and publishes the alert event raised by each of the given sensors' latest reading
+    def publish_poll(self, sensors):
+        for sensor in sensors:
+            if sensor.latest_alert_event != None:
+                self.publish(sensor.latest_alert_event)
+
+    def publish(self, event):
+        # every alert event is a change, so none are left out as repeats
+        LOGGER.error(
+            "ALERT: %s (%s) went from %s to %s at %s.",
+            event["sensor_name"], event["sensor_id"], event["from_state"], event["to_state"], format_timestamp(event["timestamp"]),
+            extra={"sensor": event["sensor_name"], "rate_limited": False}
+        )
+
+        for sink in self.SINKS:
+            try:
+                sink.publish(event)
+            except Exception as e:
+                LOGGER.error("Alert Sink Error (%s): %s", sink.__class__.__name__, e, extra={"sensor": event["sensor_name"]})
+
+    def close(self):
+        for sink in self.SINKS:
+            sink.close()
+
+
+# appends every alert event to a json lines file
+class FileAlertSink:
+    LOGS_DIRECTORY = "logs"
+    ALERTS_DIRECTORY = "alerts"
+    FILENAME = "ferm_temp_alerts.jsonl"
+
+    def __init__(self, filepath=None):
+        self.FILEPATH = filepath if filepath != None else self.__set_filepath()
+
+    def __set_filepath(self):
+        # try to make the subdirectories, if not found
+        os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.ALERTS_DIRECTORY), exist_ok=True)
+
+        return os.path.join(self.LOGS_DIRECTORY, self.ALERTS_DIRECTORY, self.FILENAME)
+
+    def publish(self, event):
+        with open(self.FILEPATH, 'a') as alerts_file:
+            alerts_file.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+    def close(self):
+        pass
+
+
+# posts every alert event as json to a webhook url, from a background thread so a
+# slow or unreachable endpoint never holds up polling. events that cannot be
+# delivered are logged (rate limited, like every repeated error) and dropped
+class WebhookAlertSink:
+    QUEUE_SIZE = 100
+    TIMEOUT = 5
+
+    def __init__(self, url):
+        self.URL = url
+        self.QUEUE = queue.Queue(self.QUEUE_SIZE)
+        self.__thread = threading.Thread(target=self.__send_loop, name="alert_webhook", daemon=True)
+        self.__thread.start()
+
+    def publish(self, event):
+        try:
+            self.QUEUE.put_nowait(event)
+        except queue.Full:
+            LOGGER.error("Alert webhook is not keeping up. Dropping alert for %s.", event["sensor_name"], extra={"sensor": event["sensor_name"]})
+
+    def __send_loop(self):
+        while True:
+            event = self.QUEUE.get()
+            if event == None:
+                return
+
+            request = urllib.request.Request(
+                self.URL,
+                data=json.dumps(event).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.TIMEOUT) as response:
+                    response.read()
+            except OSError as e:
+                LOGGER.error("Alert webhook %s could not be reached: %s", self.URL, e, extra={"sensor": event["sensor_name"]})
+
+    # waits (up to TIMEOUT seconds) for the queued events to be sent
+    def close(self):
+        try:
+            self.QUEUE.put(None, timeout=self.TIMEOUT)
+        except queue.Full:
+            return
+        self.__thread.join(timeout=self.TIMEOUT)
+
+
+# keeps the latest alert events in memory: a local stand-in for a webhook, e.g. for
+# running against a SimulatedW1Bus or for a status page to read from
+class MemoryAlertSink:
+    def __init__(self, capacity=1000):
+        self.events = collections.deque(maxlen=capacity)
+
+    def publish(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
@@ -0,0 +1,241 @@
+import re
+import os.path
+import numpy
+from models.temp_sensor_stats import RunningTempStats
+from controllers.temp_sensor_archive_controller import ArchiveController, ArchiveReader
+
+# offline analytics over the readings of one or many finished logs (csv, json or
+# archives). each sensor's readings are loaded into numpy arrays once, and every
+# statistic is computed over whole arrays (cumulative sums, run lengths, bincounts)
+# instead of one reading at a time, e.g.
+# analytics = AnalyticsController(["logs/csv/batch_1.csv", "logs/archive/batch_2.csv.fta"])
+# analytics.get_ramp_rates("28-0316a2790000", window=3600)
+class AnalyticsController:
+    # time between two readings that is longer than this many times the usual time
+    # between readings (e.g. between two runs) is not credited to any status
+    MAXIMUM_GAP_MULTIPLE = 10
+    # temp status codes, indexes into RunningTempStats.STATUSES
+    ABOVE = RunningTempStats.STATUSES.index(RunningTempStats.ABOVE)
+    WITHIN = RunningTempStats.STATUSES.index(RunningTempStats.WITHIN)
+    BELOW = RunningTempStats.STATUSES.index(RunningTempStats.BELOW)
+    ERROR = RunningTempStats.STATUSES.index(RunningTempStats.ERROR)
+    ALLOWED_TEMP_RANGE = re.compile(r"^\s*(-?[\d.]+)\s*-\s*(-?[\d.]+)\s*$")
+
+    def __init__(self, filepaths=()):
+        # sensor_id -> list of (name, timestamps, temps, lows, highs) chunks, one per log
+        self.__chunks = {}
+        self.__series = {}
+
+        for filepath in filepaths:
+            self.load_log(filepath)
+
+    # adds the readings of every sensor in the given csv, json or archive log
+    def load_log(self, filepath):
+        if os.path.splitext(filepath)[1] == ArchiveController.EXTENSION:
+            reader = ArchiveReader(filepath)
+            try:
+                for metadata in reader.get_sensors():
+                    readings = reader.get_readings(metadata["id"])
+                    self.add_readings(metadata, [reading[0] for reading in readings], [reading[1] for reading in readings])
+            finally:
+                reader.close()
+        else:
+            for metadata, timestamps, temps in ArchiveController.read_log(filepath):
+                self.add_readings(metadata, timestamps, temps)
+
+    # adds readings of the sensor described by the given metadata (see ArchiveController).
+    # temps of None or 0.0 (what the logger records on an error) are error readings
+    def add_readings(self, metadata, timestamps, temps):
+        low, high = -numpy.inf, numpy.inf
+        match = self.ALLOWED_TEMP_RANGE.match(metadata.get("allowed_temp_range") or "")
+        if match != None:
+            low, high = float(match.group(1)), float(match.group(2))
+
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+        temps = numpy.array([numpy.nan if temp == None else temp for temp in temps], dtype=numpy.float64)
+        temps[temps == 0.0] = numpy.nan
+
+        self.__chunks.setdefault(metadata["id"], []).append((
+            metadata.get("name"),
+            timestamps,
+            temps,
+            numpy.full(len(temps), low),
+            numpy.full(len(temps), high)
+        ))
+        self.__series.pop(metadata["id"], None)
+
+    def get_sensor_ids(self):
+        return list(self.__chunks)
+
+    # returns the given sensor's readings from every log, oldest first
+    def get_series(self, sensor_id):
+        if sensor_id not in self.__series:
+            self.__series[sensor_id] = TempSeries(sensor_id, self.__chunks[sensor_id])
+
+        return self.__series[sensor_id]
+
+    # fraction (0-1) of the readings in each status
+    def get_status_fractions(self, sensor_id):
+        series = self.get_series(sensor_id)
+        counts = numpy.bincount(series.STATUSES, minlength=len(RunningTempStats.STATUSES))
+        total = max(len(series.STATUSES), 1)
+
+        return {status: float(counts[code] / total) for code, status in enumerate(RunningTempStats.STATUSES)}
+
+    # seconds spent in each status, each reading's status lasting until the next reading
+    # (as RunningTempStats counts it), leaving out gaps between runs
+    def get_dwell_seconds(self, sensor_id):
+        series = self.get_series(sensor_id)
+        gaps = numpy.diff(series.TIMESTAMPS)
+        if len(gaps) > 0:
+            gaps[gaps > self.MAXIMUM_GAP_MULTIPLE * numpy.median(gaps)] = 0
+        seconds = numpy.bincount(series.STATUSES[:-1], weights=gaps, minlength=len(RunningTempStats.STATUSES))
+
+        return {status: float(seconds[code]) for code, status in enumerate(RunningTempStats.STATUSES)}
+
+    # fraction (0-1) of the time spent in each status
+    def get_time_weighted_fractions(self, sensor_id):
+        seconds = self.get_dwell_seconds(sensor_id)
+        total = sum(seconds.values())
+
+        return {status: (value / total if total > 0 else None) for status, value in seconds.items()}
+
+    # returns the timestamps and the mean temp of the readings within the window
+    # (in seconds) leading up to each of them, leaving out error readings
+    def get_rolling_means(self, sensor_id, window=3600):
+        series = self.get_series(sensor_id)
+        starts = series.get_window_starts(window)
+        counts = series.cumulative_sum(series.VALID, starts)
+        sums = series.cumulative_sum(numpy.where(series.VALID, series.TEMPS, 0.0), starts)
+
+        return series.TIMESTAMPS, self.__divide(sums, counts)
+
+    # returns the timestamps and the rate the temp was changing at, in degrees F per
+    # hour, as the least squares slope through the readings within the window (in
+    # seconds) leading up to each of them, leaving out error readings
+    def get_ramp_rates(self, sensor_id, window=3600):
+        series = self.get_series(sensor_id)
+        starts = series.get_window_starts(window)
+        valid = series.VALID
+        # hours since the first reading, to keep the sums of squares small
+        hours = numpy.where(valid, (series.TIMESTAMPS - series.TIMESTAMPS[:1]) / 3600, 0.0)
+        temps = numpy.where(valid, series.TEMPS, 0.0)
+
+        count = series.cumulative_sum(valid, starts)
+        sum_of_hours = series.cumulative_sum(hours, starts)
+        sum_of_temps = series.cumulative_sum(temps, starts)
+        sum_of_squared_hours = series.cumulative_sum(hours * hours, starts)
+        sum_of_products = series.cumulative_sum(hours * temps, starts)
+
+        denominator = count * sum_of_squared_hours - sum_of_hours * sum_of_hours
+        denominator[count < 2] = 0
+
+        return series.TIMESTAMPS, self.__divide(count * sum_of_products - sum_of_hours * sum_of_temps, denominator)
+
+    # returns each run of consecutive readings above or below the allowed temp range
+    # lasting at least minimum_duration seconds, oldest first, as dicts with the
+    # status, start and end timestamps, duration, number of readings, the peak temp
+    # and how far (in degrees F) the peak was outside the range
+    def get_excursions(self, sensor_id, minimum_duration=0):
+        series = self.get_series(sensor_id)
+        if len(series.STATUSES) == 0:
+            return []
+
+        starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(series.STATUSES)) + 1))
+        ends = numpy.concatenate((starts[1:], [len(series.STATUSES)]))
+        statuses = series.STATUSES[starts]
+        # an excursion lasts until the first reading after it (or its own last reading, at the end of the log)
+        end_timestamps = series.TIMESTAMPS[numpy.minimum(ends, len(series.STATUSES) - 1)]
+        durations = end_timestamps - series.TIMESTAMPS[starts]
+        above = statuses == self.ABOVE
+        peaks = numpy.where(above, numpy.maximum.reduceat(series.TEMPS, starts), numpy.minimum.reduceat(series.TEMPS, starts))
+        deviations = numpy.where(above, peaks - series.HIGHS[starts], series.LOWS[starts] - peaks)
+
+        selected = ((statuses == self.ABOVE) | (statuses == self.BELOW)) & (durations >= minimum_duration)
+        # the selected columns are turned into lists once, as building the dicts is the slow part
+        columns = zip(
+            statuses[selected].tolist(),
+            series.TIMESTAMPS[starts[selected]].tolist(),
+            end_timestamps[selected].tolist(),
+            durations[selected].tolist(),
+            (ends - starts)[selected].tolist(),
+            peaks[selected].tolist(),
+            deviations[selected].round(2).tolist()
+        )
+        return [
+            {
+                "status": RunningTempStats.STATUSES[status],
+                "start": start,
+                "end": end,
+                "duration": duration,
+                "readings": readings,
+                "peak_temp": peak_temp,
+                "peak_deviation": peak_deviation
+            }
+            for status, start, end, duration, readings, peak_temp, peak_deviation in columns
+        ]
+
+    # returns the headline statistics of the given sensor over every loaded log
+    def get_summary(self, sensor_id, window=3600):
+        series = self.get_series(sensor_id)
+        temps = series.TEMPS[series.VALID]
+        ramp_rates = self.get_ramp_rates(sensor_id, window)[1]
+        ramp_rates = ramp_rates[numpy.isfinite(ramp_rates)]
+
+        return {
+            "name": series.NAME,
+            "readings": len(series.TEMPS),
+            "first": float(series.TIMESTAMPS[0]) if len(series.TIMESTAMPS) > 0 else None,
+            "last": float(series.TIMESTAMPS[-1]) if len(series.TIMESTAMPS) > 0 else None,
+            "highest_temp": float(temps.max()) if len(temps) > 0 else None,
+            "lowest_temp": float(temps.min()) if len(temps) > 0 else None,
+            "mean_temp": float(temps.mean()) if len(temps) > 0 else None,
+            "standard_deviation": float(temps.std(ddof=1)) if len(temps) > 1 else None,
+            "status_fractions": self.get_status_fractions(sensor_id),
+            "time_weighted_fractions": self.get_time_weighted_fractions(sensor_id),
+            "fastest_rise": float(ramp_rates.max()) if len(ramp_rates) > 0 else None,
+            "fastest_fall": float(ramp_rates.min()) if len(ramp_rates) > 0 else None,
+            "excursions": len(self.get_excursions(sensor_id))
+        }
+
+    # divides element-wise, giving nan where the denominator is 0
+    def __divide(self, numerators, denominators):
+        results = numpy.full(len(numerators), numpy.nan)
+        numpy.divide(numerators, denominators, out=results, where=denominators != 0)
+        return results
+
+
+# one sensor's readings from one or more logs, merged into numpy arrays sorted by
+# time. a reading found in more than one log (e.g. in both the csv and the json log
+# of a run) is only kept once
+class TempSeries:
+    def __init__(self, sensor_id, chunks):
+        self.SENSOR_ID = sensor_id
+        self.NAME = chunks[-1][0]
+        timestamps, temps, lows, highs = (numpy.concatenate(columns) for columns in list(zip(*chunks))[1:])
+        order = numpy.argsort(timestamps, kind="stable")
+        order = order[numpy.concatenate(([True], numpy.diff(timestamps[order]) != 0))]
+
+        self.TIMESTAMPS = timestamps[order]
+        self.TEMPS = temps[order]
+        self.LOWS = lows[order]
+        self.HIGHS = highs[order]
+        self.VALID = ~numpy.isnan(self.TEMPS)
+
+        self.STATUSES = numpy.full(len(self.TEMPS), AnalyticsController.WITHIN, dtype=numpy.int64)
+        self.STATUSES[self.TEMPS > self.HIGHS] = AnalyticsController.ABOVE
+        self.STATUSES[self.TEMPS < self.LOWS] = AnalyticsController.BELOW
+        self.STATUSES[~self.VALID] = AnalyticsController.ERROR
+        self.__window_starts = {}
+
+    # index of the first reading within the window (in seconds) leading up to each reading
+    def get_window_starts(self, window):
+        if window not in self.__window_starts:
+            self.__window_starts[window] = numpy.searchsorted(self.TIMESTAMPS, self.TIMESTAMPS - window, side="left")
+
+        return self.__window_starts[window]
+
+    # sum of the given values from each window start up to and including each reading
+    def cumulative_sum(self, values, starts):
+        sums = numpy.concatenate(([0.0], numpy.cumsum(values, dtype=numpy.float64)))
+        return sums[1:] - sums[starts]
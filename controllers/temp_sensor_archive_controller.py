@@ -0,0 +1,323 @@
+import os
+import csv
+import sys
+import json
+import mmap
+import zlib
+import bisect
+import struct
+import itertools
+import os.path
+from array import array
+from controllers.temp_sensor_json_controller import JsonController
+from helpers.temp_sensor_timestamps import get_epoch_timestamps
+from helpers.temp_sensor_segments import open_log, get_log_extension
+
+# converts finished csv and json logs into compact, columnar archives:
+#
+# file:   magic (b"FTAR") | version (uint8) | header length (uint32) | header | blocks
+# header: zlib compressed json holding each sensor's metadata and summary once,
+#         and an index of its blocks: [first timestamp, count, offset, timestamps length, temps length]
+# block:  up to BLOCK_SIZE readings of one sensor, as two zlib compressed columns:
+#         timestamps (int32 milliseconds since the previous reading, the first one 0)
+#         and temps (int16 hundredths of a degree F, ERROR_TEMP for errors), little-endian
+#
+# a reading that repeats the sensor's name, id, target and allowances (~150 bytes in
+# the csv log) takes well under 2 bytes in an archive. archives are read with ArchiveReader
+class ArchiveController:
+    LOGS_DIRECTORY = "logs"
+    ARCHIVE_DIRECTORY = "archive"
+    SOURCE_DIRECTORIES = ("json", "csv")
+    EXTENSION = ".fta"
+    MAGIC = b"FTAR"
+    VERSION = 1
+    PREAMBLE = struct.Struct("<4sBI")
+    BLOCK_SIZE = 4096
+    TIMESTAMP_RESOLUTION = 1000
+    ERROR_TEMP = -32768
+    MAXIMUM_DELTA = 2 ** 31 - 1
+
+    def __init__(self):
+        # try to make the subdirectories, if not found
+        os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.ARCHIVE_DIRECTORY), exist_ok=True)
+
+    # returns the csv and json logs (and gzipped log segments) found in the logs
+    # directory, skipping a compacted json log when the json lines log it was built
+    # from is there as well
+    def get_logs(self):
+        filepaths = []
+
+        for directory in self.SOURCE_DIRECTORIES:
+            directory = os.path.join(self.LOGS_DIRECTORY, directory)
+            if not os.path.isdir(directory):
+                continue
+
+            filenames = sorted(os.listdir(directory))
+            for filename in filenames:
+                stem, extension = os.path.splitext(filename)
+                if extension == ".json" and (stem + ".jsonl" in filenames or stem + ".jsonl.gz" in filenames):
+                    continue
+                extension = get_log_extension(filename)
+                if extension in (".csv", ".json", ".jsonl"):
+                    filepaths.append(os.path.join(directory, filename))
+
+        return filepaths
+
+    # returns the filepath the given log is archived to
+    def get_archive_filepath(self, filepath):
+        return os.path.join(self.LOGS_DIRECTORY, self.ARCHIVE_DIRECTORY, os.path.basename(filepath) + self.EXTENSION)
+
+    # archives the given csv or json log and returns the archive's filepath
+    def archive_log(self, filepath):
+        sensors = self.read_log(filepath)
+        archive_filepath = self.get_archive_filepath(filepath)
+        self.write_archive(archive_filepath, sensors, os.path.basename(filepath))
+        return archive_filepath
+
+    # reads the given csv or json log into a list of (metadata, timestamps, temps)
+    # tuples, one per sensor
+    @classmethod
+    def read_log(cls, filepath):
+        extension = get_log_extension(filepath)
+        if extension == ".csv":
+            return cls.read_csv_log(filepath)
+        elif extension == ".jsonl":
+            return cls.read_json_log(JsonController.read_json_lines_log(filepath))
+        elif extension == ".json":
+            with open_log(filepath) as json_file:
+                return cls.read_json_log(json.load(json_file))
+        else:
+            raise ValueError("Cannot read {}: not a csv or json log".format(filepath))
+
+    # reads a json log (the nested "Sensor Data" document, see JsonController) into
+    # a list of (metadata, timestamps, temps) tuples, one per sensor
+    @classmethod
+    def read_json_log(cls, data):
+        sensors = []
+
+        for sensor_dict in data:
+            sensor_data = dict(sensor_dict["Sensor Data"])
+            recorded_temp_data = sensor_data.pop("Recorded Temp Data")
+            metadata = {
+                "id": sensor_dict["Sensor ID"],
+                "name": sensor_dict["Sensor Name"],
+                "position": sensor_dict.get("Sensor Position"),
+                "target_temp": sensor_data.pop("Target Temp", None),
+                "allowed_temp_range": sensor_data.pop("Allowed Temp Range", None),
+                # the aggregates as of the last reading
+                "summary": sensor_data
+            }
+            sensors.append((
+                metadata,
+                get_epoch_timestamps([temp_data["Timestamp"] for temp_data in recorded_temp_data]),
+                [temp_data["Temp (in Fahrenheit)"] for temp_data in recorded_temp_data]
+            ))
+
+        return sensors
+
+    # reads a csv log into a list of (metadata, timestamps, temps) tuples, one per
+    # sensor, in the order the sensors first appear. readings with an error are kept
+    # with a temp of None
+    @classmethod
+    def read_csv_log(cls, filepath):
+        sensors = {}
+
+        with open_log(filepath, newline='') as csv_file:
+            for row in csv.DictReader(csv_file):
+                sensor_id = row["Sensor ID"]
+                if sensor_id not in sensors:
+                    sensors[sensor_id] = (
+                        {
+                            "id": sensor_id,
+                            "name": row["Sensor Name"],
+                            "position": int(row["Sensor Position"]) if row["Sensor Position"] else None,
+                            "target_temp": float(row["Target Temp"]) if row["Target Temp"] else None,
+                            "allowed_temp_range": row["Allowed Temp Range"],
+                            "summary": {}
+                        },
+                        [],
+                        []
+                    )
+
+                metadata, timestamps, temps = sensors[sensor_id]
+                timestamps.append(row["Timestamp"])
+                temps.append(float(row["Recorded Temp"]) if not row.get("Error") else None)
+                # the aggregates as of the last reading
+                metadata["summary"] = {
+                    key: float(row[key]) if row[key] else None for key in (
+                        "Highest Recorded Temp",
+                        "Lowest Recorded Temp",
+                        "% Spent Above Temp Range",
+                        "% Spent Within Temp Range",
+                        "% Spent Below Temp Range",
+                        "% Spent in Error State"
+                    )
+                }
+
+        return [
+            (metadata, get_epoch_timestamps(timestamps), temps)
+            for metadata, timestamps, temps in sensors.values()
+        ]
+
+    # encodes one block of readings into its two compressed columns
+    @classmethod
+    def __encode_block(cls, timestamps, temps):
+        deltas = array('i', [0])
+        for previous, current in zip(timestamps, timestamps[1:]):
+            delta = current - previous
+            if abs(delta) > cls.MAXIMUM_DELTA:
+                raise ValueError("Readings are too far apart to archive ({} seconds)".format(delta / cls.TIMESTAMP_RESOLUTION))
+            deltas.append(delta)
+
+        centi_temps = array('h', [
+            cls.ERROR_TEMP if temp == None else max(-32767, min(32767, int(round(temp * 100))))
+            for temp in temps
+        ])
+
+        if sys.byteorder == "big":
+            deltas.byteswap()
+            centi_temps.byteswap()
+
+        return zlib.compress(deltas.tobytes(), 9), zlib.compress(centi_temps.tobytes(), 9)
+
+    # writes the given (metadata, timestamps, temps) tuples to an archive, through a
+    # temporary file so a half written archive never replaces a good one
+    @classmethod
+    def write_archive(cls, filepath, sensors, source=None):
+        header = {"source": source, "sensors": []}
+        blocks = []
+        offset = 0
+
+        for metadata, timestamps, temps in sensors:
+            timestamps = [int(round(timestamp * cls.TIMESTAMP_RESOLUTION)) for timestamp in timestamps]
+            block_index = []
+
+            for start in range(0, len(timestamps), cls.BLOCK_SIZE):
+                block_timestamps = timestamps[start:start + cls.BLOCK_SIZE]
+                encoded_timestamps, encoded_temps = cls.__encode_block(block_timestamps, temps[start:start + cls.BLOCK_SIZE])
+                block_index.append([block_timestamps[0], len(block_timestamps), offset, len(encoded_timestamps), len(encoded_temps)])
+                blocks.append(encoded_timestamps)
+                blocks.append(encoded_temps)
+                offset += len(encoded_timestamps) + len(encoded_temps)
+
+            sensor_header = dict(metadata)
+            sensor_header["reading_count"] = len(timestamps)
+            sensor_header["blocks"] = block_index
+            header["sensors"].append(sensor_header)
+
+        encoded_header = zlib.compress(json.dumps(header, separators=(",", ":")).encode("utf-8"), 9)
+        temp_filepath = filepath + ".tmp"
+
+        with open(temp_filepath, 'wb') as archive_file:
+            archive_file.write(cls.PREAMBLE.pack(cls.MAGIC, cls.VERSION, len(encoded_header)))
+            archive_file.write(encoded_header)
+            for block in blocks:
+                archive_file.write(block)
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+        os.replace(temp_filepath, filepath)
+
+
+# reads an archive written by ArchiveController through a memory map, decompressing
+# only the blocks a lookup touches, e.g.
+# ArchiveReader("logs/archive/ferm_temp_data_log_Dec-17-2018_04-32-56.csv.fta").get_readings("28-0316a2790000", start, end)
+class ArchiveReader:
+    # number of decompressed blocks kept for repeated lookups
+    CACHED_BLOCKS = 16
+
+    def __init__(self, filepath):
+        self.FILEPATH = filepath
+        self.__file = open(filepath, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = ArchiveController.PREAMBLE.unpack_from(self.__map, 0)
+        if magic != ArchiveController.MAGIC:
+            raise ValueError("{} is not a ferm temp archive".format(filepath))
+        if version != ArchiveController.VERSION:
+            raise ValueError("{} has unsupported archive version {}".format(filepath, version))
+
+        blocks_offset = ArchiveController.PREAMBLE.size + header_length
+        header = json.loads(zlib.decompress(self.__map[ArchiveController.PREAMBLE.size:blocks_offset]).decode("utf-8"))
+        self.SOURCE = header["source"]
+        self.SENSORS = {sensor["id"]: sensor for sensor in header["sensors"]}
+        self.__blocks_offset = blocks_offset
+        self.__block_starts = {
+            sensor_id: [block[0] for block in sensor["blocks"]] for sensor_id, sensor in self.SENSORS.items()
+        }
+        self.__cache = {}
+
+    # returns the metadata of every sensor in the archive (without the block index)
+    def get_sensors(self):
+        return [
+            {key: value for key, value in sensor.items() if key != "blocks"}
+            for sensor in self.SENSORS.values()
+        ]
+
+    # returns the (timestamps, temps) columns of the given block of the given sensor,
+    # as epoch seconds and degrees F (None for errors)
+    def __get_block(self, sensor_id, block_number):
+        key = (sensor_id, block_number)
+        if key in self.__cache:
+            return self.__cache[key]
+
+        first_timestamp, _, offset, timestamps_length, temps_length = self.SENSORS[sensor_id]["blocks"][block_number]
+        start = self.__blocks_offset + offset
+        deltas = array('i', zlib.decompress(self.__map[start:start + timestamps_length]))
+        centi_temps = array('h', zlib.decompress(self.__map[start + timestamps_length:start + timestamps_length + temps_length]))
+
+        if sys.byteorder == "big":
+            deltas.byteswap()
+            centi_temps.byteswap()
+
+        timestamps = [
+            timestamp / ArchiveController.TIMESTAMP_RESOLUTION
+            for timestamp in itertools.accumulate(deltas, initial=first_timestamp)
+        ][1:]
+        temps = [None if temp == ArchiveController.ERROR_TEMP else temp / 100 for temp in centi_temps]
+
+        if len(self.__cache) >= self.CACHED_BLOCKS:
+            self.__cache.pop(next(iter(self.__cache)))
+        self.__cache[key] = (timestamps, temps)
+        return timestamps, temps
+
+    # returns the number of readings of the given sensor
+    def get_reading_count(self, sensor_id):
+        return self.SENSORS[sensor_id]["reading_count"]
+
+    # returns the (epoch_ts, temp) reading of the given sensor at the given index
+    def get_reading(self, sensor_id, index):
+        if index < 0:
+            index += self.get_reading_count(sensor_id)
+        if not 0 <= index < self.get_reading_count(sensor_id):
+            raise IndexError("reading index out of range")
+
+        timestamps, temps = self.__get_block(sensor_id, index // ArchiveController.BLOCK_SIZE)
+        index %= ArchiveController.BLOCK_SIZE
+        return timestamps[index], temps[index]
+
+    # returns the (epoch_ts, temp) readings of the given sensor between the given
+    # epoch timestamps (inclusive), oldest first. without a start or end every
+    # reading from the beginning or up to the end is returned
+    def get_readings(self, sensor_id, start=None, end=None):
+        block_starts = self.__block_starts[sensor_id]
+        first_block = 0
+        last_block = len(block_starts)
+        if start != None:
+            first_block = max(0, bisect.bisect_right(block_starts, start * ArchiveController.TIMESTAMP_RESOLUTION) - 1)
+        if end != None:
+            last_block = bisect.bisect_right(block_starts, end * ArchiveController.TIMESTAMP_RESOLUTION)
+
+        readings = []
+        for block_number in range(first_block, last_block):
+            timestamps, temps = self.__get_block(sensor_id, block_number)
+            low = bisect.bisect_left(timestamps, start) if start != None else 0
+            high = bisect.bisect_right(timestamps, end) if end != None else len(timestamps)
+            readings.extend(zip(timestamps[low:high], temps[low:high]))
+
+        return readings
+
+    def close(self):
+        self.__cache = {}
+        self.__map.close()
+        self.__file.close()
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import zlib
+import os.path
+from helpers.temp_sensor_files import write_file_atomically
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("checkpoint_controller")
+
+# keeps a compact checkpoint of the run after every poll: the logs being written and
+# each sensor's running aggregates and alert state (see TempSensor.get_checkpoint).
+# a restarted run can resume from it (TempSensorController(..., resume=True)) in
+# milliseconds, carrying on with the same logs and aggregates without replaying them
+# the checkpoint is one line, "<crc32 of the json> <json>", rewritten atomically
+# (see write_file_atomically), so a power cut leaves the previous checkpoint in
+# place and any other damage is caught by the checksum
+class CheckpointController:
+    LOGS_DIRECTORY = "logs"
+    CHECKPOINT_DIRECTORY = "checkpoint"
+    FILENAME = "ferm_temp_checkpoint"
+    VERSION = 1
+
+    def __init__(self, filepath=None):
+        self.FILEPATH = filepath if filepath != None else self.__set_filepath()
+
+    def __set_filepath(self):
+        # try to make the subdirectories, if not found
+        os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.CHECKPOINT_DIRECTORY), exist_ok=True)
+
+        return os.path.join(self.LOGS_DIRECTORY, self.CHECKPOINT_DIRECTORY, self.FILENAME)
+
+    # checkpoints the given sensors along with the logs (a dict of e.g. csv_filepath,
+    # json_filepath and sqlite_run_id) their readings are being written to
+    def save(self, sensors, logs):
+        checkpoint = {
+            "version": self.VERSION,
+            "saved_at": round(time.time(), 3),
+            "logs": logs,
+            "sensors": {sensor.ID: sensor.get_checkpoint() for sensor in sensors}
+        }
+        encoded_checkpoint = json.dumps(checkpoint, separators=(",", ":")).encode("utf-8")
+
+        try:
+            write_file_atomically(self.FILEPATH, b"%08x %s\n" % (zlib.crc32(encoded_checkpoint), encoded_checkpoint))
+        except OSError as e:
+            LOGGER.error("Checkpoint Write File Error: %s", e)
+
+    # returns the saved checkpoint, or None (with the reason printed) if there is no
+    # usable checkpoint to resume from
+    def load(self):
+        try:
+            with open(self.FILEPATH, 'rb') as checkpoint_file:
+                line = checkpoint_file.read().rstrip(b"\n")
+        except FileNotFoundError:
+            print("-> No checkpoint found at {}. Starting a new run.".format(self.FILEPATH))
+            return None
+
+        crc, _, encoded_checkpoint = line.partition(b" ")
+        try:
+            is_intact = int(crc, 16) == zlib.crc32(encoded_checkpoint)
+        except ValueError:
+            is_intact = False
+
+        if not is_intact:
+            print("!!! -> Checkpoint {} is damaged (checksum mismatch). Starting a new run.".format(self.FILEPATH))
+            return None
+
+        checkpoint = json.loads(encoded_checkpoint.decode("utf-8"))
+        if checkpoint.get("version") != self.VERSION:
+            print("!!! -> Checkpoint {} is from an unknown version. Starting a new run.".format(self.FILEPATH))
+            return None
+
+        return checkpoint
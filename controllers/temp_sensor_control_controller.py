@@ -0,0 +1,202 @@
+import time
+import threading
+from helpers.temp_sensor_w1_parser import W1Reading
+from models.temp_sensor import TempData
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("control_controller")
+
+# holds vessels at their sensors' target temps by switching heater and glycol valve
+# relays (see ControlChannel). every channel runs on its own thread, on fixed ticks
+# of period seconds, apart from the logging poll: a tick reads the probe, works out
+# the demand and switches the relays, so the time from a reading to the relays
+# reacting is bounded by the period (plus one probe conversion), not by the polling
+# rate or by how long the csv/json/sqlite writes of a poll take
+class ControlController:
+    def __init__(self, channels, period=5):
+        self.CHANNELS = channels
+        self.PERIOD = period
+        self.__stopped = threading.Event()
+        self.__threads = []
+        self.__started = False
+
+    def start(self):
+        self.__started = True
+        for channel in self.CHANNELS:
+            self.__start_channel(channel)
+
+        print("-> Controlling temps of {} sensors every {} seconds.".format(len(self.CHANNELS), self.PERIOD))
+
+    # starts controlling another vessel, e.g. once its probe is plugged in
+    def add_channel(self, channel):
+        self.CHANNELS.append(channel)
+        if self.__started and not self.__stopped.is_set():
+            self.__start_channel(channel)
+
+    def __start_channel(self, channel):
+        thread = threading.Thread(target=self.__run_channel, args=(channel,), name="temp_control_{}".format(channel.SENSOR.ID), daemon=True)
+        thread.start()
+        self.__threads.append(thread)
+
+    def __run_channel(self, channel):
+        next_tick = time.monotonic()
+
+        while not self.__stopped.wait(max(0.0, next_tick - time.monotonic())):
+            now = time.monotonic()
+            try:
+                channel.step(now)
+            except Exception as e:
+                LOGGER.error("Temp control error for sensor named %s: %s. Turning its relays off.", channel.SENSOR.NAME, e, extra={"sensor": channel.SENSOR.NAME})
+                channel.turn_off(now)
+
+            next_tick += self.PERIOD
+            # a tick that ran over starts the next one a full period later instead of catching up
+            if next_tick <= time.monotonic():
+                channel.overruns += 1
+                next_tick = time.monotonic() + self.PERIOD
+
+    # prints what each channel is doing
+    def print_status(self):
+        for channel in self.CHANNELS:
+            status = channel.get_status()
+            LOGGER.debug("CONTROL: {} -> demand {}, heater {}, cooler {}, {} switches, slowest tick {} ms{}".format(
+                status["sensor_name"],
+                status["demand"],
+                "ON" if status["heater_on"] else "OFF",
+                "ON" if status["cooler_on"] else "OFF",
+                status["switches"],
+                status["maximum_latency_ms"],
+                " (FAILSAFE)" if status["failsafe"] else ""
+            ), extra={"raw": True})
+
+    # stops the control threads and turns every relay off
+    def close(self):
+        self.__stopped.set()
+        for thread in self.__threads:
+            thread.join(timeout=self.PERIOD + 1)
+
+        now = time.monotonic()
+        for channel in self.CHANNELS:
+            channel.turn_off(now)
+
+
+# controls one vessel: its sensor's target temp, a control law (TempPidControl or
+# TempDeadbandControl) and a heater and/or cooler Relay (either can be None)
+# the probe is read through the channel's own w1_parser, so it never shares a read
+# buffer with the logging poll. if a read fails the sensor's latest logged TempData
+# is used while it is under MAXIMUM_FALLBACK_AGE seconds old, and otherwise both
+# relays are turned off until the probe reads again. they are also turned off while
+# the logging poll has the sensor in error or quarantined, until a poll reads it again
+# a demand between 0 and 1 is time proportioned over cycle_time seconds, e.g. 0.25
+# runs the heater for the first quarter of every cycle. the heater and the cooler
+# are never on at the same time
+class ControlChannel:
+    MAXIMUM_FALLBACK_AGE = 300
+
+    def __init__(self, sensor, control, heater_relay, cooler_relay, w1_parser, cycle_time=600):
+        self.SENSOR = sensor
+        self.CONTROL = control
+        self.HEATER_RELAY = heater_relay
+        self.COOLER_RELAY = cooler_relay
+        self.W1_PARSER = w1_parser
+        self.CYCLE_TIME = cycle_time
+        self.latest_temp_data = None
+        self.demand = 0.0
+        self.failsafe = False
+        self.ticks = 0
+        self.overruns = 0
+        self.latest_latency = None
+        self.maximum_latency = 0.0
+
+    # one control tick at the given time (in time.monotonic() seconds)
+    def step(self, now):
+        start = time.perf_counter()
+        temp_data = self.__get_temp_data()
+
+        if temp_data == None:
+            self.__set_failsafe(True)
+            self.turn_off(now)
+        else:
+            self.__set_failsafe(False)
+            self.latest_temp_data = temp_data
+            # the target is looked up every tick, so the control follows a ramp smoothly
+            # between polls
+            self.demand = self.CONTROL.update(temp_data.TEMP_IN_FAHRENHEIT, self.SENSOR.get_target_temp_at(time.time()), now)
+            self.__apply_demand(self.demand, now)
+
+        self.ticks += 1
+        self.latest_latency = time.perf_counter() - start
+        self.maximum_latency = max(self.maximum_latency, self.latest_latency)
+
+    # forces both relays off
+    def turn_off(self, now):
+        self.demand = 0.0
+        for relay in (self.HEATER_RELAY, self.COOLER_RELAY):
+            if relay != None:
+                relay.set(False, now, force=True)
+
+    def get_status(self):
+        return {
+            "sensor_id": self.SENSOR.ID,
+            "sensor_name": self.SENSOR.NAME,
+            "temp": self.latest_temp_data.TEMP_IN_FAHRENHEIT if self.latest_temp_data != None else None,
+            "target_temp": self.SENSOR.get_target_temp_at(time.time()),
+            "demand": round(self.demand, 3),
+            "heater_on": self.HEATER_RELAY != None and self.HEATER_RELAY.is_on,
+            "cooler_on": self.COOLER_RELAY != None and self.COOLER_RELAY.is_on,
+            "switches": sum(relay.switches for relay in (self.HEATER_RELAY, self.COOLER_RELAY) if relay != None),
+            "failsafe": self.failsafe,
+            "overruns": self.overruns,
+            "latest_latency_ms": round(self.latest_latency * 1000, 3) if self.latest_latency != None else None,
+            "maximum_latency_ms": round(self.maximum_latency * 1000, 3)
+        }
+
+    # reads the probe once (a failed read is not retried: the next tick is only a period away)
+    def __get_temp_data(self):
+        # a faulty probe is not read (nor its latest reading trusted) until the logging
+        # poll reads it again
+        if self.SENSOR.ERROR != None or self.SENSOR.is_quarantined():
+            return None
+
+        reading = self.W1_PARSER.read()
+
+        if reading.STATUS == W1Reading.OK:
+            return TempData(round(time.time(), 3), round(reading.TEMP_IN_CELSIUS * 9.0 / 5.0 + 32.0, 2))
+
+        temp_data = self.SENSOR.latest_temp_data
+        if temp_data != None and time.time() - temp_data.TIMESTAMP <= self.MAXIMUM_FALLBACK_AGE:
+            return temp_data
+
+        return None
+
+    def __apply_demand(self, demand, now):
+        # how far into the current time proportioning cycle we are, from 0 to 1
+        phase = (now % self.CYCLE_TIME) / self.CYCLE_TIME
+        heater_on = demand > 0 and phase < demand
+        cooler_on = demand < 0 and phase < -demand
+
+        # switch the other relay off first, so the two are never on together
+        # (a relay held on by its minimum on time keeps the other one off)
+        if demand >= 0:
+            cooler_is_on = self.__set_relay(self.COOLER_RELAY, False, now)
+            self.__set_relay(self.HEATER_RELAY, heater_on and not cooler_is_on, now)
+        else:
+            heater_is_on = self.__set_relay(self.HEATER_RELAY, False, now)
+            self.__set_relay(self.COOLER_RELAY, cooler_on and not heater_is_on, now)
+
+    def __set_relay(self, relay, on, now):
+        if relay == None:
+            return False
+
+        return relay.set(on, now)
+
+    def __set_failsafe(self, failsafe):
+        if failsafe == self.failsafe:
+            return
+
+        self.failsafe = failsafe
+        if failsafe:
+            LOGGER.error("Lost the temp of sensor named %s at position %s. Turning its relays off until it reads again.", self.SENSOR.NAME, self.SENSOR.POSITION, extra={"sensor": self.SENSOR.NAME})
+            self.CONTROL.reset()
+        else:
+            LOGGER.info("Temp control resumed for sensor named %s at position %s.", self.SENSOR.NAME, self.SENSOR.POSITION, extra={"sensor": self.SENSOR.NAME})
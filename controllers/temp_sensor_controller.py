@@ -1,40 +1,273 @@
 import os
 import glob
+import time
+import logging
 import traceback
-import datetime
-import RPi.GPIO as GPIO
+from helpers.temp_sensor_gpio import GPIO
 import sys
 sys.path.append("..")
 from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from models.temp_sensor import TempSensor as TempSensor
+from models.temp_sensor_stats import RunningTempStats
+from models.temp_sensor_schedule import TempSchedule
 from helpers.temp_sensor_exceptions import NoSensorsDetectedException
 from controllers.temp_sensor_csv_controller import CsvController
 from controllers.temp_sensor_json_controller import JsonController
+from controllers.temp_sensor_sqlite_controller import SqliteController
+from controllers.temp_sensor_export_controller import ExportController
+from controllers.temp_sensor_alert_controller import AlertController, FileAlertSink
+from controllers.temp_sensor_control_controller import ControlController, ControlChannel
+from controllers.temp_sensor_checkpoint_controller import CheckpointController
+from controllers.temp_sensor_http_controller import HttpController
+from controllers.temp_sensor_metrics_controller import MetricsController
+from models.temp_sensor_control import TempPidControl, TempDeadbandControl
+from helpers.temp_sensor_relay import Relay
+from helpers.temp_sensor_w1_parser import W1SlaveParser, W1_DEVICES_DIRECTORY
+from helpers.temp_sensor_w1_watcher import W1DeviceWatcher
+from helpers.temp_sensor_w1_therm import W1Therm
+from helpers.temp_sensor_timestamps import format_timestamp
+from helpers.temp_sensor_logging import get_logger, configure_logging, VERBOSE
+
+LOGGER = get_logger("temp_sensor_controller")
 
 class TempSensorController:
+    SEQUENTIAL_POLLING = "sequential"
+    THREADED_POLLING = "threaded"
+
     # when init'd, detect all temp sensor directories
-    def __init__(self, available_led_pin_sets):
+    # in threaded polling mode every sensor is read on its own worker thread, and
+    # each sensor's retries are cut off at sensor_deadline seconds into the poll
+    # history_capacity is the number of recent readings each sensor keeps in memory
+    # png_render_interval (in seconds) renders the graph headless instead of in a window
+    # csv_flush_policy/csv_flush_interval set when the csv log is flushed (see CsvController)
+    # if sensor_configs (see TempSensorConfig) are given, the sensors are set up from them
+    # without prompting, and available_led_pin_sets is not used
+    # with sqlite, readings are also stored in the sqlite database (see SqliteController)
+    # w1_devices_directory and w1_parser_class can be swapped out to read a simulated bus
+    # with an export_address (host, port), every poll is also streamed to an aggregator
+    # (see ExportController), as the node named node_name
+    # alert events (see TempAlertStateMachine) are published to alert_sinks, or only
+    # written to logs/alerts when no sinks are given
+    # configured sensors with a "control" section have their vessel's relays driven
+    # (see ControlController) on a separate loop, every control_period seconds
+    # every poll is checkpointed (see CheckpointController). with resume, the run
+    # carries on from the last checkpoint: the same logs, and each sensor's aggregates
+    # the bus is watched for probes being plugged in and out (see W1DeviceWatcher) and
+    # rescanned every device_rescan_interval seconds, or never if it is None: unplugged
+    # probes are quarantined, and configured probes are attached once they show up
+    # with an http_address (host, port), the latest readings are served over http (see HttpController)
+    # with bulk_conversion, every probe on the bus converts at once at the start of each
+    # poll (see W1Therm) instead of one after another as each is read. w1_therm_class can
+    # be swapped out along with w1_parser_class to drive a simulated bus
+    # every poll is timed stage by stage (see MetricsController), and written out as
+    # metrics_format ("prometheus" or "json") when given. polls over slow_poll_threshold
+    # seconds are logged, and the first profile_polls polls are profiled
+    # console_output sets how much is written to the console each poll (see
+    # configure_logging), and repeated warnings are only written once every
+    # repeated_message_interval seconds
+    # the csv and json logs roll over to a new file once one is segment_size bytes or
+    # holds segment_interval seconds of readings, with the closed files gzipped in the
+    # background with compress_segments (see LogSegmenter)
+    def __init__(self, available_led_pin_sets, polling_mode=THREADED_POLLING, sensor_deadline=15, history_capacity=None, png_render_interval=None, csv_flush_policy=CsvController.FLUSH_EVERY_POLL, csv_flush_interval=60, sensor_configs=None, sqlite=False, w1_devices_directory=W1_DEVICES_DIRECTORY, w1_parser_class=W1SlaveParser, export_address=None, node_name=None, alert_hysteresis=0.5, alert_minimum_dwell=0, alert_sinks=None, control_period=5, resume=False, device_rescan_interval=10, http_address=None, bulk_conversion=False, w1_therm_class=W1Therm, metrics_format=None, slow_poll_threshold=None, profile_polls=0, console_output=VERBOSE, repeated_message_interval=300, segment_size=None, segment_interval=None, compress_segments=False):
+        configure_logging(console_output, repeated_message_interval)
         GPIO.setmode(GPIO.BOARD)
+        self.W1_DEVICES_DIRECTORY = w1_devices_directory
+        self.W1_PARSER_CLASS = w1_parser_class
+        self.W1_THERM = w1_therm_class(w1_devices_directory)
+        self.BULK_CONVERSION = bulk_conversion and self.__check_bulk_conversion()
         self.LED_PIN_SETS = available_led_pin_sets
+        self.SENSOR_CONFIGS = sensor_configs
+        self.POLLING_MODE = polling_mode
+        self.SENSOR_DEADLINE = sensor_deadline
+        self.HISTORY_CAPACITY = history_capacity
+        self.ALERT_HYSTERESIS = alert_hysteresis
+        self.ALERT_MINIMUM_DWELL = alert_minimum_dwell
+        self.control_channels = []
+        # configured sensors that are not plugged in (yet)
+        self.unattached_sensor_configs = []
         self.__select_temp_sensors()
-        self.CSV_CONTROLLER = CsvController()
-        self.JSON_CONTROLLER = JsonController(self.__get_selected_temp_sensors())
+        self.CHECKPOINT_CONTROLLER = CheckpointController()
+        checkpoint = self.__resume_from_checkpoint() if resume else None
+        logs = checkpoint["logs"] if checkpoint != None else {}
+        self.CSV_CONTROLLER = CsvController(csv_flush_policy, csv_flush_interval, logs.get("csv_filepath"), segment_size, segment_interval, compress_segments)
+        self.JSON_CONTROLLER = JsonController(self.__get_selected_temp_sensors(), png_render_interval, logs.get("json_filepath"), checkpoint["sensors"] if checkpoint != None else (), segment_size, segment_interval, compress_segments)
+        self.SQLITE_CONTROLLER = SqliteController(self.__get_selected_temp_sensors(), run_id=logs.get("sqlite_run_id")) if sqlite else None
+        self.EXPORT_CONTROLLER = ExportController(export_address[0], export_address[1], node_name) if export_address != None else None
+        self.ALERT_CONTROLLER = AlertController(alert_sinks if alert_sinks != None else [FileAlertSink()])
+        self.CONTROL_CONTROLLER = ControlController(self.control_channels, control_period) if self.__has_control() else None
+        self.DEVICE_WATCHER = W1DeviceWatcher(self.W1_DEVICES_DIRECTORY, device_rescan_interval) if device_rescan_interval != None else None
+        self.HTTP_CONTROLLER = HttpController(http_address[0], http_address[1], history_capacity) if http_address != None else None
+        self.METRICS_CONTROLLER = MetricsController(metrics_format, slow_poll_threshold, profile_polls)
+        self.EXECUTOR = None
+
+        if self.POLLING_MODE == self.THREADED_POLLING:
+            self.EXECUTOR = ThreadPoolExecutor(
+                # enough workers for every configured sensor, as more can be plugged in
+                max_workers=len(self.__get_selected_temp_sensors()) + len(self.unattached_sensor_configs),
+                thread_name_prefix="temp_sensor_poll"
+            )
+
+        if self.CONTROL_CONTROLLER != None:
+            self.CONTROL_CONTROLLER.start()
+        if self.DEVICE_WATCHER != None:
+            self.DEVICE_WATCHER.start()
 
     # main method - gets and prints the temp data from each selected sensor
-    def get_temps(self):
-        timestamp = self.__get_datetime()
+    # (or only from the sensors with the given ids, when their polling rates differ)
+    # each stage of the poll is timed by the metrics controller
+    def get_temps(self, sensor_ids=None):
+        metrics = self.METRICS_CONTROLLER
+        metrics.start_poll()
+        self.__apply_device_changes()
+        timestamp = self.__get_timestamp()
+        deadline = time.monotonic() + self.SENSOR_DEADLINE
+        sensors = self.__get_selected_temp_sensors()
+        metrics.end_stage("device_changes")
+
+        if sensor_ids != None:
+            sensors = [sensor for sensor in sensors if sensor.ID in sensor_ids]
+
+        if self.BULK_CONVERSION and any(not sensor.is_quarantined() for sensor in sensors):
+            self.__convert_all()
+        metrics.end_stage("conversion")
+
+        if self.EXECUTOR != None:
+            self.__poll_sensors_concurrently(sensors, timestamp, deadline)
+        else:
+            for sensor in sensors:
+                sensor.get_temp_at(timestamp, deadline)
+                LOGGER.debug("Polling finished for sensor named %s at position %s.", sensor.NAME, sensor.POSITION)
+        metrics.end_stage("read")
+
+        self.__log_temp_data(sensors)
+        self.__print_temp_data(sensors)
+        metrics.end_stage("print")
+        self.ALERT_CONTROLLER.publish_poll(sensors)
+        metrics.end_stage("alerts")
+        self.__save_checkpoint()
+        metrics.end_stage("checkpoint")
+
+        if self.HTTP_CONTROLLER != None:
+            self.HTTP_CONTROLLER.update_poll(sensors, self.__get_selected_temp_sensors())
+        metrics.end_stage("http")
+
+        if self.CONTROL_CONTROLLER != None:
+            self.CONTROL_CONTROLLER.print_status()
+        metrics.end_stage("control")
+
+        if self.EXPORT_CONTROLLER != None:
+            self.EXPORT_CONTROLLER.export_poll(sensors)
+        metrics.end_stage("export")
+
+        metrics.end_poll(self.__get_selected_temp_sensors(), timestamp)
+        self.__log_poll_summary(sensors)
+
+    # one line for the whole poll: each sensor's reading and status
+    def __log_poll_summary(self, sensors):
+        if not LOGGER.isEnabledFor(logging.INFO):
+            return
+
+        readings = []
+        for sensor in sensors:
+            if sensor.ERROR != None:
+                readings.append("{} {}".format(sensor.NAME, RunningTempStats.ERROR))
+            else:
+                readings.append("{} {}F {}".format(sensor.NAME, sensor.get_latest_recorded_temp_data().TEMP_IN_FAHRENHEIT, sensor.ALERT.state))
+
+        poll_milliseconds = round(self.METRICS_CONTROLLER.latest_poll_seconds * 1000, 1)
+        LOGGER.info("Polled %s sensors in %s ms: %s", len(sensors), poll_milliseconds, ", ".join(readings), extra={"fields": {
+            "sensors": len(sensors),
+            "errors": sum(sensor.ERROR != None for sensor in sensors),
+            "poll_ms": poll_milliseconds
+        }})
+
+    # reads every selected sensor at the same time, so a slow or retrying probe
+    # only delays its own reading and the poll takes as long as the slowest probe
+    def __poll_sensors_concurrently(self, sensors, timestamp, deadline):
+        futures = {
+            self.EXECUTOR.submit(sensor.get_temp_at, timestamp, deadline): sensor
+            for sensor in sensors
+        }
+
+        for future in as_completed(futures):
+            sensor = futures[future]
+            # re-raise any unexpected error from the worker thread on the main thread
+            future.result()
+            LOGGER.debug("Polling finished for sensor named %s at position %s.", sensor.NAME, sensor.POSITION)
 
+    # has every probe on the bus convert at once, and waits for their results, which
+    # each sensor's read then picks up without converting again
+    def __convert_all(self):
+        start = time.perf_counter()
+
+        if self.W1_THERM.start_conversion():
+            if not self.W1_THERM.wait_for_conversion():
+                LOGGER.warning("Bulk conversion is taking longer than expected. Reading the sensors anyway.")
+            LOGGER.debug("Converted every probe at once in %s ms.", round((time.perf_counter() - start) * 1000, 1))
+
+    # bulk conversion needs the w1_therm driver's therm_bulk_read, from Linux 5.10 on
+    def __check_bulk_conversion(self):
+        if self.W1_THERM.supports_bulk_conversion():
+            return True
+
+        print("!!! -> The w1 bus master does not support bulk conversion (therm_bulk_read, Linux 5.10+). Converting each probe as it is read.")
+        return False
+
+    # loads the last checkpoint and restores the aggregates of every selected sensor
+    # in it, and returns it (or None when there is nothing to resume)
+    def __resume_from_checkpoint(self):
+        start = time.perf_counter()
+        checkpoint = self.CHECKPOINT_CONTROLLER.load()
+
+        if checkpoint == None:
+            return None
+
+        restored_sensors = 0
         for sensor in self.__get_selected_temp_sensors():
-            sensor.get_temp_at(timestamp)
-            print("-> Polling finished for sensor named {} at position {}.".format(sensor.NAME, sensor.POSITION))
-        self.__print_temp_data()
+            if sensor.ID in checkpoint["sensors"]:
+                sensor.restore_checkpoint(checkpoint["sensors"][sensor.ID])
+                restored_sensors += 1
+
+        print("-> Resumed {} sensors from the checkpoint saved at {} (in {} ms).".format(
+            restored_sensors,
+            format_timestamp(checkpoint["saved_at"]),
+            round((time.perf_counter() - start) * 1000, 1)
+        ))
+        return checkpoint
+
+    def __save_checkpoint(self):
+        self.CHECKPOINT_CONTROLLER.save(self.__get_selected_temp_sensors(), {
+            "csv_filepath": self.CSV_CONTROLLER.filepath,
+            "json_filepath": self.JSON_CONTROLLER.filepath,
+            "sqlite_run_id": self.SQLITE_CONTROLLER.RUN_ID if self.SQLITE_CONTROLLER != None else None
+        })
+
+    # stops the temp control (turning its relays off), releases the polling worker
+    # threads and closes the log files
+    def close(self):
+        if self.HTTP_CONTROLLER != None:
+            self.HTTP_CONTROLLER.close()
+        if self.DEVICE_WATCHER != None:
+            self.DEVICE_WATCHER.close()
+        if self.CONTROL_CONTROLLER != None:
+            self.CONTROL_CONTROLLER.close()
+        if self.EXECUTOR != None:
+            self.EXECUTOR.shutdown(wait=False)
+        self.CSV_CONTROLLER.close()
+        self.JSON_CONTROLLER.close()
+        if self.SQLITE_CONTROLLER != None:
+            self.SQLITE_CONTROLLER.close()
+        if self.EXPORT_CONTROLLER != None:
+            self.EXPORT_CONTROLLER.close()
+        self.ALERT_CONTROLLER.close()
 
     # 1. detects all available temperature sensors
     # 2. sorts the list of sensors by directory name (eg ID)
     # 3. returns a list of dicts representing available sensors that includes
     # their position and ID
     def __get_available_temp_sensors(self):
-        available_temp_sensor_directories = sorted(glob.glob("/sys/bus/w1/devices/28*"))
+        available_temp_sensor_directories = sorted(glob.glob(os.path.join(self.W1_DEVICES_DIRECTORY, "28*")))
         available_temp_sensors = []
         position_counter = 1
 
@@ -61,9 +294,14 @@ class TempSensorController:
             exit()
 
     # prompt the user to select how many/which of the available temp sensors they
-    # want to use
+    # want to use, unless the sensors were configured up front
     def __select_temp_sensors(self):
         self.AVAILABLE_TEMP_SENSORS = self.__get_available_temp_sensors()
+
+        if self.SENSOR_CONFIGS != None:
+            self.__select_configured_temp_sensors()
+            return
+
         num_of_desired_sensors = self.__get_num_of_desired_sensors_from_available()
         target_temp, target_temp_positive_allowance, target_temp_negative_allowance = self.__set_target_temp_info()
         sensor_names = self.__name_sensors(num_of_desired_sensors)
@@ -81,13 +319,160 @@ class TempSensorController:
                     target_temp,
                     target_temp_positive_allowance,
                     target_temp_negative_allowance,
-                    self.LED_PIN_SETS[led_pin_set_counter] if attach_led else None
+                    self.LED_PIN_SETS[led_pin_set_counter] if attach_led else None,
+                    self.HISTORY_CAPACITY,
+                    None,
+                    self.W1_DEVICES_DIRECTORY,
+                    self.W1_PARSER_CLASS,
+                    self.ALERT_HYSTERESIS,
+                    self.ALERT_MINIMUM_DWELL
                 )
             )
 
             if attach_led:
                 led_pin_set_counter += 1
 
+    # sets up every configured sensor that was detected, in the order they were configured
+    # configured sensors that are not connected are reported, and attached if they are
+    # plugged in later on
+    def __select_configured_temp_sensors(self):
+        available_positions = {sensor["id"]: sensor["position"] for sensor in self.AVAILABLE_TEMP_SENSORS}
+        self.selected_temp_sensors = []
+
+        for sensor_config in self.SENSOR_CONFIGS:
+            if sensor_config["id"] not in available_positions:
+                print("!!! -> Configured sensor named {} ({}) was not detected. Continuing without it until it is plugged in.".format(sensor_config["name"], sensor_config["id"]))
+                self.unattached_sensor_configs.append(sensor_config)
+                continue
+
+            self.selected_temp_sensors.append(self.__get_configured_temp_sensor(sensor_config, available_positions[sensor_config["id"]]))
+
+            if sensor_config.get("control") != None:
+                self.control_channels.append(self.__get_control_channel(self.selected_temp_sensors[-1], sensor_config["control"]))
+
+        if len(self.selected_temp_sensors) < 1:
+            print("\n!!!!!!!!!!\n-> None of the configured temp sensors were detected.\n-> Exiting program.\n!!!!!!!!!!\n")
+            GPIO.cleanup()
+            # kills the program
+            exit()
+
+    # sets up a configured sensor, its schedule and its probe's resolution if one is configured
+    def __get_configured_temp_sensor(self, sensor_config, position):
+        if sensor_config.get("resolution") != None:
+            self.W1_THERM.set_resolution(sensor_config["id"], sensor_config["resolution"])
+
+        return TempSensor(
+            sensor_config["name"],
+            position,
+            sensor_config["id"],
+            sensor_config["target_temp"],
+            sensor_config["positive_allowance"],
+            sensor_config["negative_allowance"],
+            sensor_config["led_pins"],
+            self.HISTORY_CAPACITY,
+            sensor_config["polling_rate"],
+            self.W1_DEVICES_DIRECTORY,
+            self.W1_PARSER_CLASS,
+            self.ALERT_HYSTERESIS,
+            self.ALERT_MINIMUM_DWELL,
+            self.__get_schedule(sensor_config)
+        )
+
+    def __get_schedule(self, sensor_config):
+        schedule_config = sensor_config.get("schedule")
+
+        if schedule_config == None:
+            return None
+
+        return TempSchedule(schedule_config["steps"], schedule_config["start"])
+
+    # applies the target temps, allowances and schedules of a reloaded config (see
+    # TempSensorConfig) to the sensors being logged, from their next reading on, without
+    # a restart. a running schedule without a fixed start keeps its start, so it carries
+    # on from the step it is on. every other setting only applies on the next start
+    def update_sensor_targets(self, sensor_configs):
+        sensor_configs = {sensor_config["id"]: sensor_config for sensor_config in sensor_configs}
+        now = time.time()
+
+        for sensor in self.__get_selected_temp_sensors():
+            sensor_config = sensor_configs.get(sensor.ID)
+            if sensor_config == None or not self.__has_new_targets(sensor, sensor_config):
+                continue
+
+            sensor.set_schedule(self.__get_schedule(sensor_config), now)
+            if sensor.schedule == None:
+                sensor.set_target(sensor_config["target_temp"], sensor_config["positive_allowance"], sensor_config["negative_allowance"])
+
+            LOGGER.info("Updated the %s for sensor named %s.", "schedule" if sensor.schedule != None else "target temp", sensor.NAME, extra={"sensor": sensor.NAME})
+
+        # sensors plugged in later on start with the reloaded settings
+        self.unattached_sensor_configs = [sensor_configs.get(sensor_config["id"], sensor_config) for sensor_config in self.unattached_sensor_configs]
+
+    def __has_new_targets(self, sensor, sensor_config):
+        schedule_config = sensor_config.get("schedule")
+
+        if schedule_config == None:
+            return sensor.schedule != None or (sensor.TARGET_TEMP, sensor.TARGET_TEMP_POSITIVE_ALLOWANCE, sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE) != (sensor_config["target_temp"], sensor_config["positive_allowance"], sensor_config["negative_allowance"])
+
+        return sensor.schedule == None or sensor.schedule.STEPS != schedule_config["steps"] or (sensor.schedule.start if sensor.schedule.HAS_FIXED_START else None) != schedule_config["start"]
+
+    def __has_control(self):
+        return len(self.control_channels) > 0 or any(sensor_config.get("control") != None for sensor_config in self.unattached_sensor_configs)
+
+    # quarantines the sensors unplugged since the last poll, and releases (or attaches,
+    # if they are configured) the ones plugged in
+    def __apply_device_changes(self):
+        if self.DEVICE_WATCHER == None:
+            return
+
+        added_ids, removed_ids = self.DEVICE_WATCHER.get_changes()
+        sensors = {sensor.ID: sensor for sensor in self.__get_selected_temp_sensors()}
+
+        for sensor_id in sorted(removed_ids):
+            sensor = sensors.get(sensor_id)
+            if sensor != None and not sensor.is_quarantined():
+                LOGGER.warning("Sensor named %s at position %s was unplugged.", sensor.NAME, sensor.POSITION, extra={"sensor": sensor.NAME})
+                sensor.quarantine()
+
+        for sensor_id in sorted(added_ids):
+            if sensor_id in sensors:
+                sensors[sensor_id].release_quarantine()
+            else:
+                self.__attach_sensor(sensor_id)
+
+    # starts logging (and controlling) a configured sensor plugged in mid-run
+    def __attach_sensor(self, sensor_id):
+        sensor_config = next((config for config in self.unattached_sensor_configs if config["id"] == sensor_id), None)
+
+        if sensor_config == None:
+            LOGGER.info("New temp sensor %s detected. Add it to the config file to log it.", sensor_id)
+            return
+
+        self.unattached_sensor_configs.remove(sensor_config)
+        sensor = self.__get_configured_temp_sensor(sensor_config, max([sensor.POSITION for sensor in self.__get_selected_temp_sensors()] + [0]) + 1)
+        self.selected_temp_sensors.append(sensor)
+        self.JSON_CONTROLLER.add_sensor(sensor)
+        if self.SQLITE_CONTROLLER != None:
+            self.SQLITE_CONTROLLER.add_sensor(sensor)
+        if sensor_config.get("control") != None:
+            self.CONTROL_CONTROLLER.add_channel(self.__get_control_channel(sensor, sensor_config["control"]))
+
+        LOGGER.info("Attached sensor named %s (%s) at position %s.", sensor.NAME, sensor.ID, sensor.POSITION, extra={"sensor": sensor.NAME})
+
+    # sets up the relays and the control law for a sensor's configured control (see TempSensorConfig)
+    def __get_control_channel(self, sensor, control_config):
+        if control_config["mode"] == "deadband":
+            control = TempDeadbandControl(control_config["deadband"])
+        else:
+            control = TempPidControl(control_config["kp"], control_config["ki"], control_config["kd"])
+
+        relays = [
+            Relay(pin, control_config["minimum_on_time"], control_config["minimum_off_time"], control_config["active_low"]) if pin != None else None
+            for pin in (control_config["heater_pin"], control_config["cooler_pin"])
+        ]
+
+        return ControlChannel(sensor, control, relays[0], relays[1], self.W1_PARSER_CLASS(sensor.FILE), control_config["cycle_time"])
+
     # prompt the user for a number of desired sensors to use from the available set
     def __get_num_of_desired_sensors_from_available(self):
         num_of_available_sensors = len(self.AVAILABLE_TEMP_SENSORS)
@@ -155,30 +540,56 @@ class TempSensorController:
 
         return sensor_names
 
-    # gets the current date and time in format Day of Week, Month Day, Year Hour:Minute:Seconds AM/PM
-    # (e.g. Mon, Dec 17, 2018 04:43:02 PM)
-    def __get_datetime(self):
-        current_date_time = datetime.datetime.now()
-        return current_date_time.strftime("%a, %b %d, %Y %I:%M:%S %p")
+    # gets the current time in seconds since the epoch, to the millisecond
+    # (e.g. 1545083582.125), which is only formatted for display when printed
+    def __get_timestamp(self):
+        return round(time.time(), 3)
 
     # get the list of selected, named temperature sensors
     def __get_selected_temp_sensors(self):
         return self.selected_temp_sensors
 
-    # prints the latest temp data per sensor
-    def __print_temp_data(self):
-        print("=" * 10)
-        print("-" * 5)
-        for sensor in self.__get_selected_temp_sensors():
+    # returns the polling rate (in seconds) of each selected sensor by id,
+    # or None for sensors that use the default polling rate. configured sensors that
+    # are not plugged in yet are included, so they are scheduled once they are attached
+    def get_sensor_polling_rates(self):
+        polling_rates = {sensor.ID: sensor.POLLING_RATE for sensor in self.__get_selected_temp_sensors()}
+        polling_rates.update({sensor_config["id"]: sensor_config["polling_rate"] for sensor_config in self.unattached_sensor_configs})
+        return polling_rates
+
+    # logs the latest temp data of each of the given sensors, one log at a time so
+    # each is timed on its own
+    def __log_temp_data(self, sensors):
+        for sensor in sensors:
             self.CSV_CONTROLLER.append_sensor_data_to_file(sensor)
+        self.CSV_CONTROLLER.write_poll()
+        self.METRICS_CONTROLLER.end_stage("csv")
+
+        for sensor in sensors:
             self.JSON_CONTROLLER.update_sensor_data(sensor)
+        self.METRICS_CONTROLLER.end_stage("json")
+
+        if self.SQLITE_CONTROLLER != None:
+            for sensor in sensors:
+                self.SQLITE_CONTROLLER.update_sensor_data(sensor)
+            self.SQLITE_CONTROLLER.write_poll()
+        self.METRICS_CONTROLLER.end_stage("sqlite")
+
+    # prints the latest temp data of each of the given sensors
+    def __print_temp_data(self, sensors):
+        # the blocks are only shown in verbose output, so are not even built otherwise
+        if not LOGGER.isEnabledFor(logging.DEBUG):
+            return
+
+        lines = ["=" * 10, "-" * 5]
+        for sensor in sensors:
             temp_data = sensor.get_latest_recorded_temp_data()
 
             if sensor.ERROR == None:
-                print("NAME: {}\nPOSITION: {}\nLATEST TIMESTAMP: {}\nLATEST TEMP (F): {}\nTARGET TEMP (F): {}\nALLOWED TEMP RANGE (F): {}-{}\nHIGHEST TEMP (F): {}\nLOWEST TEMP (F): {}\n% SPENT ABOVE TEMP RANGE: {}\n% SPENT WITHIN TEMP RANGE: {}\n% SPENT BELOW TEMP RANGE: {}\n% SPENT IN ERROR STATE: {}\nHAS LED: {}".format(
+                lines.append("NAME: {}\nPOSITION: {}\nLATEST TIMESTAMP: {}\nLATEST TEMP (F): {}\nTARGET TEMP (F): {}\nALLOWED TEMP RANGE (F): {}-{}\nHIGHEST TEMP (F): {}\nLOWEST TEMP (F): {}\n% SPENT ABOVE TEMP RANGE: {}\n% SPENT WITHIN TEMP RANGE: {}\n% SPENT BELOW TEMP RANGE: {}\n% SPENT IN ERROR STATE: {}\nHAS LED: {}".format(
                     sensor.NAME,
                     sensor.POSITION,
-                    temp_data.DATETIME,
+                    format_timestamp(temp_data.TIMESTAMP),
                     temp_data.TEMP_IN_FAHRENHEIT,
                     sensor.TARGET_TEMP,
                     sensor.TARGET_TEMP - sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE,
@@ -192,13 +603,14 @@ class TempSensorController:
                     sensor.HAS_LED # debug purposes - can be removed
                 ))
             else:
-                print("!!!!!!!!!!\nERROR: {}\n!!!!!!!!!!\nNAME: {}\nPOSITION: {}\nLATEST TIMESTAMP: {}\nLATEST TEMP (F): {}\nHAS LED: {}".format(
+                lines.append("!!!!!!!!!!\nERROR: {}\n!!!!!!!!!!\nNAME: {}\nPOSITION: {}\nLATEST TIMESTAMP: {}\nLATEST TEMP (F): {}\nHAS LED: {}".format(
                     sensor.ERROR,
                     sensor.NAME,
                     sensor.POSITION,
-                    temp_data.DATETIME,
+                    format_timestamp(temp_data.TIMESTAMP),
                     temp_data.TEMP_IN_FAHRENHEIT,
                     sensor.HAS_LED # debug purposes - can be removed
                 ))
-            print("-" * 5)
-        print("=" * 10)
\ No newline at end of file
+            lines.append("-" * 5)
+        lines.append("=" * 10)
+        LOGGER.debug("\n".join(lines), extra={"raw": True})
\ No newline at end of file
@@ -1,14 +1,49 @@
+import os
 import csv
+import time
 import datetime
 import os.path
+from helpers.temp_sensor_files import truncate_partial_line
+from helpers.temp_sensor_segments import LogSegmenter, open_log
+from helpers.temp_sensor_timestamps import get_epoch_timestamp
 
 class CsvController:
     LOGS_DIRECTORY = "logs"
     CSV_DIRECTORY = "csv"
+    # flush the written rows to the OS after every poll
+    FLUSH_EVERY_POLL = "poll"
+    # flush the written rows to the OS once flush_interval seconds have passed
+    FLUSH_ON_INTERVAL = "interval"
+    # flush the written rows and fsync them to the SD card after every poll
+    FLUSH_AND_FSYNC = "fsync"
+    FLUSH_POLICIES = (FLUSH_EVERY_POLL, FLUSH_ON_INTERVAL, FLUSH_AND_FSYNC)
 
-    def __init__(self):
-        self.FILEPATH = self.__set_filepath()
-        self.__set_headers()
+    # the csv file is kept open for the whole run, and the rows of a poll are
+    # buffered and written together by write_poll()
+    # given the filepath of an existing log (e.g. from a checkpoint), the log is resumed
+    # instead, with a partially written last row cut off
+    # the log rolls over to a new file (each starting with the headers) once it is
+    # segment_size bytes or holds segment_interval seconds of readings, and closed
+    # files are gzipped in the background with compress_segments (see LogSegmenter)
+    def __init__(self, flush_policy=FLUSH_EVERY_POLL, flush_interval=60, filepath=None, segment_size=None, segment_interval=None, compress_segments=False):
+        if flush_policy not in self.FLUSH_POLICIES:
+            raise ValueError("Unknown csv flush policy: {}".format(flush_policy))
+
+        self.FLUSH_POLICY = flush_policy
+        self.FLUSH_INTERVAL = flush_interval
+
+        # the file being written to, which changes as the log rolls over
+        if filepath != None and os.path.exists(filepath):
+            self.filepath = filepath
+            self.__resume_file()
+        else:
+            self.filepath = self.__set_filepath()
+            self.__set_headers()
+        self.SEGMENTER = LogSegmenter(os.path.dirname(self.filepath), os.path.basename(self.filepath), segment_size, segment_interval, compress_segments, self.__read_rows)
+        self.__csv_file = open(self.filepath, 'a')
+        self.__writer = csv.writer(self.__csv_file)
+        self.__pending_rows = []
+        self.__last_flush_time = time.monotonic()
 
     def __set_filepath(self):
         filename = "ferm_temp_data_log_{}.csv".format(self.__get_datetime())
@@ -19,7 +54,7 @@ class CsvController:
         return os.path.join(self.LOGS_DIRECTORY, self.CSV_DIRECTORY, filename)
 
     def __set_headers(self):
-        with open(self.FILEPATH, 'w') as csv_file:
+        with open(self.filepath, 'w') as csv_file:
             row = [
                 "Sensor Name",
                 "Sensor Position",
@@ -40,31 +75,87 @@ class CsvController:
             writer = csv.writer(csv_file)
             writer.writerow(row)
 
+    def __resume_file(self):
+        if truncate_partial_line(self.filepath) > 0:
+            print("!! -> Cut a partially written row off the end of {}.".format(self.filepath))
+        print("-> Resuming csv log {}.".format(self.filepath))
+
+    # yields the sensor id and timestamp of each row of a log file
+    def __read_rows(self, filepath):
+        with open_log(filepath, newline='') as csv_file:
+            for row in csv.DictReader(csv_file):
+                try:
+                    yield row["Sensor ID"], get_epoch_timestamp(row["Timestamp"])
+                except (TypeError, ValueError):
+                    continue
+
     # gets the current date and time in format MonthDayYear_Hour-Minute-Seconds
     # (e.g. Dec-17-2018_04-32-56)
     def __get_datetime(self):
         current_date_time = datetime.datetime.now()
         return current_date_time.strftime("%b-%d-%Y_%I-%M-%S")
 
+    # buffers the latest data of the given sensor until the poll is written
     def append_sensor_data_to_file(self, sensor):
-        with open(self.FILEPATH, 'a') as csv_file:
-            temp_data = sensor.get_latest_recorded_temp_data()
-            row = [
-                sensor.NAME,
-                sensor.POSITION,
-                sensor.ID,
-                temp_data.DATETIME,
-                temp_data.TEMP_IN_FAHRENHEIT,
-                sensor.TARGET_TEMP,
-                "{}-{}".format(sensor.TARGET_TEMP - sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE, sensor.TARGET_TEMP + sensor.TARGET_TEMP_POSITIVE_ALLOWANCE),
-                sensor.highest_temp,
-                sensor.lowest_temp,
-                sensor.percentage_spent_above_target_temp_range,
-                sensor.percentage_spent_within_target_temp_range,
-                sensor.percentage_spent_below_target_temp_range,
-                sensor.percentage_spent_in_error_state,
-                sensor.ERROR
-            ]
+        temp_data = sensor.get_latest_recorded_temp_data()
+        self.__pending_rows.append([
+            sensor.NAME,
+            sensor.POSITION,
+            sensor.ID,
+            temp_data.TIMESTAMP,
+            temp_data.TEMP_IN_FAHRENHEIT,
+            sensor.TARGET_TEMP,
+            "{}-{}".format(sensor.TARGET_TEMP - sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE, sensor.TARGET_TEMP + sensor.TARGET_TEMP_POSITIVE_ALLOWANCE),
+            sensor.highest_temp,
+            sensor.lowest_temp,
+            sensor.percentage_spent_above_target_temp_range,
+            sensor.percentage_spent_within_target_temp_range,
+            sensor.percentage_spent_below_target_temp_range,
+            sensor.percentage_spent_in_error_state,
+            sensor.ERROR
+        ])
 
-            writer = csv.writer(csv_file)
-            writer.writerow(row)
\ No newline at end of file
+    # writes all of the rows buffered during this poll in one go (to a new file, if the
+    # current one is full), then flushes according to the flush policy
+    def write_poll(self):
+        if len(self.__pending_rows) > 0:
+            # the size on disk, without flushing anything the flush policy holds back
+            if self.SEGMENTER.is_due(os.fstat(self.__csv_file.fileno()).st_size, self.__pending_rows[0][3]):
+                self.__roll()
+
+            self.__writer.writerows(self.__pending_rows)
+            for row in self.__pending_rows:
+                # the sensor id and timestamp
+                self.SEGMENTER.add_row(row[2], row[3])
+            self.__pending_rows = []
+
+        if self.FLUSH_POLICY == self.FLUSH_ON_INTERVAL:
+            if time.monotonic() - self.__last_flush_time >= self.FLUSH_INTERVAL:
+                self.__flush()
+        else:
+            self.__flush()
+
+    # closes the full file and carries on in a new one
+    def __roll(self):
+        self.__flush()
+        self.__csv_file.close()
+        self.filepath = self.SEGMENTER.roll()
+        self.__set_headers()
+        self.__csv_file = open(self.filepath, 'a')
+        self.__writer = csv.writer(self.__csv_file)
+
+    def __flush(self):
+        self.__csv_file.flush()
+        if self.FLUSH_POLICY == self.FLUSH_AND_FSYNC:
+            os.fsync(self.__csv_file.fileno())
+        self.__last_flush_time = time.monotonic()
+
+    # writes anything still buffered and closes the csv file
+    def close(self):
+        if self.__csv_file.closed:
+            return
+
+        self.write_poll()
+        self.__flush()
+        self.__csv_file.close()
+        self.SEGMENTER.close()
\ No newline at end of file
@@ -0,0 +1,251 @@
+import os
+import time
+import queue
+import shutil
+import socket
+import threading
+import os.path
+from helpers.temp_sensor_frames import FrameCodec
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("export_controller")
+
+# streams each poll's readings to a temp_sensor_aggregator.py over tcp, as one
+# compact binary frame per poll (see FrameCodec). frames are sent from a
+# background thread so a slow or dead link never holds up polling; while the
+# aggregator cannot be reached they are spooled to disk, and replayed in order
+# once it can be reached again. once anything is spooled, every frame goes out
+# through the spool, so the aggregator always gets a run's frames in sequence order
+# a replay renames the spool to a .replay file and streams it from there, so frames
+# can be spooled (without waiting on the replay) while it is sent. the spool is kept
+# under MAXIMUM_SPOOL_SIZE bytes by dropping its oldest frames
+class ExportController:
+    LOGS_DIRECTORY = "logs"
+    SPOOL_DIRECTORY = "spool"
+    REPLAY_EXTENSION = ".replay"
+    MAXIMUM_SPOOL_SIZE = 64 * 1024 * 1024
+    QUEUE_SIZE = 100
+    CONNECT_TIMEOUT = 5
+    ACK_TIMEOUT = 10
+    MINIMUM_RECONNECT_DELAY = 1
+    MAXIMUM_RECONNECT_DELAY = 60
+
+    def __init__(self, host, port, node_name=None):
+        self.HOST = host
+        self.PORT = port
+        self.NODE_NAME = node_name if node_name != None else socket.gethostname()
+        self.RUN_START = time.time()
+        self.SPOOL_FILEPATH = self.__set_spool_filepath()
+        self.REPLAY_FILEPATH = self.SPOOL_FILEPATH + self.REPLAY_EXTENSION
+        self.QUEUE = queue.Queue(self.QUEUE_SIZE)
+        self.SPOOL_LOCK = threading.Lock()
+        self.__sequence = 0
+        self.__socket = None
+        self.__reconnect_delay = self.MINIMUM_RECONNECT_DELAY
+        self.__next_connect_time = 0
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__send_loop, name="export_sender", daemon=True)
+        self.__thread.start()
+
+    def __set_spool_filepath(self):
+        # try to make the subdirectories, if not found
+        os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.SPOOL_DIRECTORY), exist_ok=True)
+
+        # one spool per node, kept across restarts so nothing spooled is lost
+        return os.path.join(self.LOGS_DIRECTORY, self.SPOOL_DIRECTORY, "ferm_temp_export_{}.spool".format(self.NODE_NAME))
+
+    # queues the latest readings of the given sensors as one frame
+    def export_poll(self, sensors):
+        readings = []
+
+        for sensor in sensors:
+            temp_data = sensor.get_latest_recorded_temp_data()
+            readings.append((
+                sensor.ID,
+                temp_data.TIMESTAMP,
+                temp_data.TEMP_IN_FAHRENHEIT,
+                FrameCodec.STATUS_OK if sensor.ERROR == None else FrameCodec.STATUS_ERROR
+            ))
+
+        self.__sequence += 1
+        frame = FrameCodec.encode(self.NODE_NAME, self.RUN_START, self.__sequence, readings)
+
+        try:
+            self.QUEUE.put_nowait(frame)
+        except queue.Full:
+            # the sender is far behind, so the queued frames are kept on disk instead of
+            # in memory, followed by this one
+            self.__spool(self.__drain_queue() + [frame])
+
+    def __send_loop(self):
+        while not self.__stopped.is_set():
+            try:
+                frame = self.QUEUE.get(timeout=1)
+            except queue.Empty:
+                frame = None
+
+            # a queued frame is newer than the ones already spooled, so it joins them
+            # rather than being sent ahead of them
+            if frame != None and self.__has_spool():
+                self.__spool([frame] + self.__drain_queue())
+                frame = None
+
+            if self.__socket == None and time.monotonic() >= self.__next_connect_time:
+                self.__connect()
+
+            # a frame taken with nothing spooled is older than anything spooled since, so
+            # it is sent (or spooled ahead of them) first
+            if frame != None and (self.__socket == None or not self.__send(frame)):
+                self.__disconnect()
+                with open(self.REPLAY_FILEPATH, 'ab') as replay_file:
+                    replay_file.write(frame)
+
+            if self.__socket != None and not self.__replay_spool():
+                self.__disconnect()
+
+    def __connect(self):
+        try:
+            self.__socket = socket.create_connection((self.HOST, self.PORT), timeout=self.CONNECT_TIMEOUT)
+            self.__socket.settimeout(self.ACK_TIMEOUT)
+            self.__reconnect_delay = self.MINIMUM_RECONNECT_DELAY
+            LOGGER.info("Connected to the aggregator at %s:%s.", self.HOST, self.PORT)
+        except OSError:
+            self.__socket = None
+            self.__next_connect_time = time.monotonic() + self.__reconnect_delay
+            self.__reconnect_delay = min(self.__reconnect_delay * 2, self.MAXIMUM_RECONNECT_DELAY)
+
+    def __disconnect(self):
+        if self.__socket != None:
+            LOGGER.error("Lost the connection to the aggregator. Spooling readings to %s.", self.SPOOL_FILEPATH)
+            try:
+                self.__socket.close()
+            except OSError:
+                pass
+        self.__socket = None
+        self.__next_connect_time = time.monotonic() + self.__reconnect_delay
+
+    # sends a frame and waits for it to be acknowledged
+    def __send(self, frame):
+        try:
+            self.__socket.sendall(frame)
+            return self.__socket.recv(1) == FrameCodec.ACK
+        except OSError:
+            return False
+
+    def __drain_queue(self):
+        frames = []
+
+        while True:
+            try:
+                frames.append(self.QUEUE.get_nowait())
+            except queue.Empty:
+                return frames
+
+    def __has_spool(self):
+        return os.path.exists(self.REPLAY_FILEPATH) or os.path.exists(self.SPOOL_FILEPATH)
+
+    def __spool(self, frames):
+        data = b"".join(frames)
+
+        with self.SPOOL_LOCK:
+            try:
+                spool_size = os.path.getsize(self.SPOOL_FILEPATH)
+            except FileNotFoundError:
+                spool_size = 0
+
+            if spool_size + len(data) > self.MAXIMUM_SPOOL_SIZE:
+                self.__drop_oldest_frames(len(data))
+
+            with open(self.SPOOL_FILEPATH, 'ab') as spool_file:
+                spool_file.write(data)
+
+    # drops the oldest spooled frames, leaving the spool at under three quarters of
+    # MAXIMUM_SPOOL_SIZE (with room for incoming_size more bytes), so it is only
+    # rewritten once in a while
+    def __drop_oldest_frames(self, incoming_size):
+        target_size = self.MAXIMUM_SPOOL_SIZE * 3 // 4 - incoming_size
+        spool_size = os.path.getsize(self.SPOOL_FILEPATH)
+        dropped_frames = 0
+
+        with open(self.SPOOL_FILEPATH, 'rb') as spool_file:
+            offset = 0
+            while spool_size - offset > max(0, target_size):
+                header = spool_file.read(FrameCodec.LENGTH.size)
+                if len(header) < FrameCodec.LENGTH.size:
+                    offset = spool_size
+                    break
+                offset += FrameCodec.LENGTH.size + FrameCodec.LENGTH.unpack(header)[0]
+                spool_file.seek(offset)
+                dropped_frames += 1
+
+            temp_filepath = self.SPOOL_FILEPATH + ".tmp"
+            with open(temp_filepath, 'wb') as temp_file:
+                shutil.copyfileobj(spool_file, temp_file)
+        os.replace(temp_filepath, self.SPOOL_FILEPATH)
+
+        LOGGER.warning("The export spool %s reached %s bytes. Dropped its %s oldest frames.", self.SPOOL_FILEPATH, self.MAXIMUM_SPOOL_SIZE, dropped_frames)
+
+    # sends every spooled frame, oldest first: the .replay file (what was spooled before
+    # the last replay, and a frame that failed to send directly), then the spool. only
+    # the rename is done holding SPOOL_LOCK. returns False if the connection failed part
+    # way, in which case the frames not yet sent are kept
+    def __replay_spool(self):
+        while True:
+            if not os.path.exists(self.REPLAY_FILEPATH):
+                with self.SPOOL_LOCK:
+                    if not os.path.exists(self.SPOOL_FILEPATH):
+                        return True
+                    os.replace(self.SPOOL_FILEPATH, self.REPLAY_FILEPATH)
+
+            if not self.__send_replay_file():
+                return False
+
+    # streams the .replay file a frame at a time, and removes it once every frame is
+    # acknowledged, or else keeps the frames from the first one not acknowledged on
+    def __send_replay_file(self):
+        with open(self.REPLAY_FILEPATH, 'rb') as replay_file:
+            offset = 0
+            while True:
+                frame = self.__read_frame(replay_file)
+                if frame == None:
+                    break
+
+                if not self.__send(frame):
+                    replay_file.seek(offset)
+                    temp_filepath = self.REPLAY_FILEPATH + ".tmp"
+                    with open(temp_filepath, 'wb') as temp_file:
+                        shutil.copyfileobj(replay_file, temp_file)
+                    os.replace(temp_filepath, self.REPLAY_FILEPATH)
+                    return False
+
+                offset += len(frame)
+
+        os.remove(self.REPLAY_FILEPATH)
+        LOGGER.info("Replayed %s bytes of spooled readings to the aggregator.", offset)
+        return True
+
+    # reads the next frame (with its length prefix) from a spool file, or None at the end
+    # of it. a partially written last frame (e.g. after a power cut) is dropped
+    def __read_frame(self, spool_file):
+        header = spool_file.read(FrameCodec.LENGTH.size)
+        if len(header) < FrameCodec.LENGTH.size:
+            return None
+
+        length = FrameCodec.LENGTH.unpack(header)[0]
+        body = spool_file.read(length)
+        if len(body) < length:
+            return None
+
+        return header + body
+
+    # stops the sender, spooling whatever it had not sent yet
+    def close(self):
+        self.__stopped.set()
+        self.__thread.join(timeout=self.ACK_TIMEOUT)
+
+        frames = self.__drain_queue()
+        if len(frames) > 0:
+            self.__spool(frames)
+
+        if self.__socket != None:
+            self.__socket.close()
@@ -0,0 +1,327 @@
+import gzip
+import json
+import time
+import zlib
+import bisect
+import asyncio
+import threading
+import urllib.parse
+from array import array
+from models.temp_sensor_stats import RunningTempStats
+
+# serves the logger's current state over http as json, from an asyncio server on
+# its own thread, e.g. for a dashboard on the local network:
+# GET /latest                                 latest reading of every sensor
+# GET /stats                                  running aggregates of every sensor
+# GET /sensors/<id>/history?from=<ts>&to=<ts>  readings between two epoch timestamps
+# nothing is read from disk: update_poll() hands the server a snapshot once per poll,
+# and /latest and /stats are encoded (and gzipped) once per snapshot rather than per
+# request. every response has an ETag, so a dashboard polling with If-None-Match
+# gets a bodiless 304 until the next poll. the server only ever touches its own
+# copies of the readings (on its own thread), so requests never hold up polling
+class HttpController:
+    # readings kept per sensor for /history (two weeks, at a 2 minute polling rate)
+    HISTORY_CAPACITY = 10080
+    MAXIMUM_HEADER_SIZE = 8192
+    # responses shorter than this are not worth gzipping
+    GZIP_MINIMUM_LENGTH = 512
+    STATUS_TEXTS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+    def __init__(self, host, port, history_capacity=None):
+        self.HOST = host
+        self.HISTORY_CAPACITY = history_capacity if history_capacity != None else self.HISTORY_CAPACITY
+        self.LOOP = asyncio.new_event_loop()
+        # the port actually listened on (e.g. when 0 is given)
+        self.port = port
+        # sequence numbers start over with every run, so /history etags carry the
+        # run's start time (in milliseconds) too
+        self.RUN_TOKEN = "{:x}".format(int(time.time() * 1000))
+        self.requests = 0
+        self.not_modified_responses = 0
+        # only used on the server thread: path -> CachedResponse, and sensor id -> SensorHistory
+        self.__responses = {}
+        self.__histories = {}
+        self.__server = None
+        # the connections currently open
+        self.__writers = set()
+        self.__listening = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="http_api", daemon=True)
+        self.__thread.start()
+        self.__listening.wait(timeout=5)
+
+    def __run(self):
+        asyncio.set_event_loop(self.LOOP)
+
+        try:
+            self.__server = self.LOOP.run_until_complete(asyncio.start_server(self.__handle_connection, self.HOST, self.port))
+        except OSError as e:
+            print("!!! -> HTTP API could not listen on {}:{}: {}. Continuing without it.".format(self.HOST, self.port, e))
+            self.__listening.set()
+            return
+
+        self.port = self.__server.sockets[0].getsockname()[1]
+        print("-> HTTP API listening on http://{}:{}/latest.".format(self.HOST, self.port))
+        self.__listening.set()
+        self.LOOP.run_forever()
+
+        # stop listening, and hang up on any dashboards still connected
+        self.__server.close()
+        for writer in self.__writers:
+            writer.close()
+        self.LOOP.run_until_complete(asyncio.gather(*asyncio.all_tasks(self.LOOP), return_exceptions=True))
+        self.LOOP.close()
+
+    # hands the server the latest state after a poll: the readings of the polled
+    # sensors are added to their history, and /latest and /stats are rebuilt from
+    # every sensor. only copies of the plain values cross over to the server thread
+    def update_poll(self, polled_sensors, sensors):
+        if self.__server == None:
+            return
+
+        readings = [(sensor.ID, *self.__get_reading(sensor)) for sensor in polled_sensors]
+        latest = [self.__get_latest(sensor) for sensor in sensors]
+        stats = [self.__get_stats(sensor) for sensor in sensors]
+        self.LOOP.call_soon_threadsafe(self.__set_snapshot, readings, latest, stats)
+
+    def __get_reading(self, sensor):
+        temp_data = sensor.get_latest_recorded_temp_data()
+        return temp_data.TIMESTAMP, temp_data.TEMP_IN_FAHRENHEIT if sensor.ERROR == None else None
+
+    def __get_latest(self, sensor):
+        timestamp, temp = self.__get_reading(sensor)
+
+        return {
+            "id": sensor.ID,
+            "name": sensor.NAME,
+            "position": sensor.POSITION,
+            "timestamp": timestamp,
+            "temp": temp,
+            "error": sensor.ERROR,
+            "target_temp": sensor.TARGET_TEMP,
+            "allowed_temp_range": [sensor.TARGET_TEMP - sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE, sensor.TARGET_TEMP + sensor.TARGET_TEMP_POSITIVE_ALLOWANCE],
+            "alert_state": sensor.ALERT.state,
+            "quarantined": sensor.is_quarantined()
+        }
+
+    def __get_stats(self, sensor):
+        stats = sensor.STATS
+
+        return {
+            "id": sensor.ID,
+            "name": sensor.NAME,
+            "readings": stats.count,
+            "highest_temp": stats.highest_temp,
+            "lowest_temp": stats.lowest_temp,
+            "mean_temp": round(stats.mean_temp, 3) if stats.mean_temp != None else None,
+            "standard_deviation": round(stats.get_standard_deviation(), 3) if stats.temp_count > 1 else None,
+            "percentage_of_readings": {status: stats.get_percentage(status) for status in RunningTempStats.STATUSES},
+            "percentage_of_time": {status: stats.get_time_weighted_percentage(status) for status in RunningTempStats.STATUSES},
+            "alert_transitions": sensor.ALERT.transitions
+        }
+
+    # runs on the server thread
+    def __set_snapshot(self, readings, latest, stats):
+        for sensor_id, timestamp, temp in readings:
+            if sensor_id not in self.__histories:
+                self.__histories[sensor_id] = SensorHistory(self.HISTORY_CAPACITY)
+            self.__histories[sensor_id].append(timestamp, temp)
+
+        self.__responses["/latest"] = CachedResponse(self.__encode({"sensors": latest}))
+        self.__responses["/stats"] = CachedResponse(self.__encode({"sensors": stats}))
+
+    def __encode(self, document):
+        return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+    async def __handle_connection(self, reader, writer):
+        self.__writers.add(writer)
+
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    break
+                if len(head) > self.MAXIMUM_HEADER_SIZE:
+                    break
+
+                method, target, headers, keep_alive = self.__parse_head(head)
+                self.requests += 1
+                writer.write(self.__get_response(method, target, headers, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.__writers.discard(writer)
+            writer.close()
+
+    def __parse_head(self, head):
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, target, headers, keep_alive
+
+    def __get_response(self, method, target, headers, keep_alive):
+        if method not in ("GET", "HEAD"):
+            return self.__get_error_response(405, "only GET and HEAD are supported", keep_alive)
+
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip("/")
+        accepts_gzip = self.__accepts_gzip(headers.get("accept-encoding", ""))
+
+        if path in self.__responses:
+            cached_response = self.__responses[path]
+            body, is_gzipped = cached_response.get_body(accepts_gzip)
+            return self.__format_response(200, cached_response.ETAG, body, is_gzipped, headers, method, keep_alive)
+
+        parts = path.split("/")
+        if len(parts) == 4 and parts[1] == "sensors" and parts[3] == "history":
+            return self.__get_history_response(urllib.parse.unquote(parts[2]), url.query, accepts_gzip, headers, method, keep_alive)
+
+        if path in ("/latest", "/stats"):
+            # nothing has been polled yet
+            return self.__format_response(200, None, self.__encode({"sensors": []}), False, headers, method, keep_alive)
+
+        return self.__get_error_response(404, "unknown path {} (try /latest, /stats or /sensors/<id>/history)".format(url.path), keep_alive)
+
+    def __get_history_response(self, sensor_id, query, accepts_gzip, headers, method, keep_alive):
+        history = self.__histories.get(sensor_id)
+        if history == None:
+            return self.__get_error_response(404, "no readings for sensor {}".format(sensor_id), keep_alive)
+
+        parameters = urllib.parse.parse_qs(query)
+        try:
+            start = float(parameters["from"][0]) if "from" in parameters else float("-inf")
+            end = float(parameters["to"][0]) if "to" in parameters else float("inf")
+        except ValueError:
+            return self.__get_error_response(400, "from and to must be epoch timestamps", keep_alive)
+
+        first_sequence, last_sequence = history.get_sequence_range(start, end)
+        # the readings between two sequence numbers never change within a run, so the
+        # etag is known before anything is encoded
+        etag = "\"{}-{}-{}-{}\"".format(self.RUN_TOKEN, sensor_id, first_sequence, last_sequence)
+        if self.__is_not_modified(headers, etag):
+            return self.__format_response(304, etag, b"", False, headers, method, keep_alive)
+
+        body = self.__encode({"id": sensor_id, "readings": history.get_readings(first_sequence, last_sequence)})
+        if accepts_gzip and len(body) >= self.GZIP_MINIMUM_LENGTH:
+            body = gzip.compress(body, 6)
+        else:
+            accepts_gzip = False
+
+        return self.__format_response(200, etag, body, accepts_gzip, headers, method, keep_alive)
+
+    def __format_response(self, status, etag, body, is_gzipped, headers, method, keep_alive):
+        if status == 200 and etag != None and self.__is_not_modified(headers, etag):
+            status, body, is_gzipped = 304, b"", False
+
+        response_headers = [
+            "HTTP/1.1 {} {}".format(status, self.STATUS_TEXTS[status]),
+            "Content-Type: application/json",
+            "Content-Length: {}".format(len(body)),
+            "Cache-Control: no-cache",
+            "Vary: Accept-Encoding",
+            "Connection: {}".format("keep-alive" if keep_alive else "close")
+        ]
+        if etag != None:
+            response_headers.append("ETag: {}".format(etag))
+        if is_gzipped:
+            response_headers.append("Content-Encoding: gzip")
+
+        return ("\r\n".join(response_headers) + "\r\n\r\n").encode("latin-1") + (body if method == "GET" else b"")
+
+    def __get_error_response(self, status, message, keep_alive):
+        return self.__format_response(status, None, self.__encode({"error": message}), False, {}, "GET", keep_alive)
+
+    def __is_not_modified(self, headers, etag):
+        if_none_match = headers.get("if-none-match")
+        if if_none_match == None:
+            return False
+
+        if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            self.not_modified_responses += 1
+            return True
+
+        return False
+
+    def __accepts_gzip(self, accept_encoding):
+        for coding in accept_encoding.split(","):
+            name, _, parameters = coding.strip().partition(";")
+            if name.strip().lower() == "gzip":
+                return parameters.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+
+        return False
+
+    # stops the server and its thread
+    def close(self):
+        if self.LOOP.is_running():
+            self.LOOP.call_soon_threadsafe(self.LOOP.stop)
+        self.__thread.join(timeout=5)
+
+
+# a response encoded once and served until the next snapshot, gzipped the first
+# time a client asks for it that way
+class CachedResponse:
+    def __init__(self, body):
+        self.BODY = body
+        self.ETAG = "\"{:08x}-{:x}\"".format(zlib.crc32(body), len(body))
+        self.__gzipped_body = None
+
+    # returns the body, and whether it is gzipped
+    def get_body(self, accepts_gzip):
+        if not accepts_gzip or len(self.BODY) < HttpController.GZIP_MINIMUM_LENGTH:
+            return self.BODY, False
+
+        if self.__gzipped_body == None:
+            self.__gzipped_body = gzip.compress(self.BODY, 6)
+        return self.__gzipped_body, True
+
+
+# the latest readings of one sensor, oldest first, in flat arrays of epoch timestamps
+# and temps (NaN for error readings). every reading has a sequence number, which keeps
+# counting up as the oldest readings are dropped past capacity
+class SensorHistory:
+    def __init__(self, capacity):
+        self.CAPACITY = capacity
+        self.__timestamps = array('d')
+        self.__temps = array('d')
+        # the sequence number of the oldest reading kept
+        self.__first_sequence = 0
+
+    def append(self, timestamp, temp):
+        self.__timestamps.append(timestamp)
+        self.__temps.append(temp if temp != None else float("nan"))
+
+        # drop the oldest readings a quarter of the capacity at a time, not one per poll
+        excess = len(self.__timestamps) - self.CAPACITY
+        if excess > self.CAPACITY // 4:
+            del self.__timestamps[:excess]
+            del self.__temps[:excess]
+            self.__first_sequence += excess
+
+    # the (first, last + 1) sequence numbers of the readings from start to end (inclusive)
+    def get_sequence_range(self, start, end):
+        first_index = bisect.bisect_left(self.__timestamps, start)
+        last_index = bisect.bisect_right(self.__timestamps, end)
+        return self.__first_sequence + first_index, self.__first_sequence + max(first_index, last_index)
+
+    # the readings between the given sequence numbers, as [timestamp, temp] pairs
+    def get_readings(self, first_sequence, last_sequence):
+        first_index = first_sequence - self.__first_sequence
+        last_index = last_sequence - self.__first_sequence
+
+        return [
+            [timestamp, temp if temp == temp else None]
+            for timestamp, temp in zip(self.__timestamps[first_index:last_index], self.__temps[first_index:last_index])
+        ]
@@ -1,19 +1,56 @@
 import json
 import datetime
 import os.path
-from controllers.temp_sensor_matplotlib import Plotter
+from helpers.temp_sensor_files import write_file_atomically, truncate_partial_line
+from helpers.temp_sensor_segments import LogSegmenter, open_log
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("json_controller")
 
 class JsonController:
     LOGS_DIRECTORY = "logs"
     JSON_DIRECTORY = "json"
+    SENSOR_RECORD = "sensor"
+    READING_RECORD = "reading"
+
+    # the live log is an append-only JSON Lines file (one record per line), so each
+    # poll only ever writes the new readings instead of rewriting the whole history.
+    # the nested "Sensor Data" document is built on request by compact()
+    # if a png_render_interval (in seconds) is given, the graph is rendered headless
+    # to a png file next to the log on that interval instead of shown in a window
+    # otherwise matplotlib is not loaded at all until the graph is asked for
+    # given the filepath of an existing log (e.g. from a checkpoint), the log is resumed:
+    # a partially written last line is cut off, and sensor records are only added for
+    # the sensors that are not in logged_sensor_ids
+    # the log rolls over to a new file once it is segment_size bytes or holds
+    # segment_interval seconds of readings, and closed files are gzipped in the
+    # background with compress_segments (see LogSegmenter). each file starts with a
+    # record of every sensor, so it can be read on its own
+    def __init__(self, sensors, png_render_interval=None, filepath=None, logged_sensor_ids=(), segment_size=None, segment_interval=None, compress_segments=False):
+        # the file being written to, which changes as the log rolls over
+        self.filepath = self.__set_filepath(filepath)
+        self.PNG_RENDER_INTERVAL = png_render_interval
+        self.__sensors = list(sensors)
+        self.__plotter = None
+
+        if filepath != None and os.path.exists(filepath):
+            self.__resume_file(sensors, logged_sensor_ids)
+        else:
+            self.__create_file(sensors)
+
+        self.SEGMENTER = LogSegmenter(os.path.dirname(self.filepath), os.path.basename(self.filepath), segment_size, segment_interval, compress_segments, self.__read_rows)
+        # the compacted log and the graph cover the whole run, whichever file it is on
+        stem = os.path.join(self.SEGMENTER.DIRECTORY, self.SEGMENTER.RUN)
+        self.COMPACTED_FILEPATH, self.PNG_FILEPATH = stem + ".json", stem + ".png"
+
+        if png_render_interval != None:
+            self.get_plotter().start_rendering(self.PNG_FILEPATH, png_render_interval)
 
-    def __init__(self, sensors):
-        self.FILEPATH = self.__set_filepath()
-        self.__create_file(sensors)
-        self.PLOTTER = Plotter(self.FILEPATH)
+    def __set_filepath(self, filepath=None):
+        if filepath != None and os.path.exists(filepath):
+            return filepath
 
-    def __set_filepath(self):
-        filename = "ferm_temp_data_log_{}.json".format(self.__get_datetime())
+        filename = "ferm_temp_data_log_{}.jsonl".format(self.__get_datetime())
 
         # try to make the subdirectories, if not found
         os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.JSON_DIRECTORY), exist_ok=True)
@@ -27,13 +64,42 @@ class JsonController:
         return current_date_time.strftime("%b-%d-%Y_%I-%M-%S")
 
     def __create_file(self, sensors):
-        # create the initial json file w/ each sensor
-        sensors_array = []
+        # start the log with one sensor record per selected sensor
+        records = []
+
+        for sensor in sensors:
+            record = self.__set_initial_serializable_sensor_dict(sensor)
+            record["Record"] = self.SENSOR_RECORD
+            records.append(record)
+
+        self.__append_to_json_lines_file(records, 'w')
+
+    def __resume_file(self, sensors, logged_sensor_ids):
+        if truncate_partial_line(self.filepath) > 0:
+            print("!! -> Cut a partially written record off the end of {}.".format(self.filepath))
+
+        records = []
+        for sensor in sensors:
+            if sensor.ID not in logged_sensor_ids:
+                record = self.__set_initial_serializable_sensor_dict(sensor)
+                record["Record"] = self.SENSOR_RECORD
+                records.append(record)
+
+        if len(records) > 0:
+            self.__append_to_json_lines_file(records)
+        print("-> Resuming json log {}.".format(self.filepath))
 
-        for sensor in sensors:            
-            sensors_array.append(self.__set_initial_serializable_sensor_dict(sensor))
+    # yields the sensor id and timestamp of each reading in a log file
+    def __read_rows(self, filepath):
+        with open_log(filepath) as json_lines_file:
+            for line in json_lines_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
 
-        self.__write_to_json_file(sensors_array)
+                if record.get("Record") == self.READING_RECORD:
+                    yield record["Sensor ID"], record["Timestamp"]
 
     # instantiates the initial objects for the current json file's dataset
     def __set_initial_serializable_sensor_dict(self, sensor):
@@ -57,65 +123,157 @@ class JsonController:
                 "% Spent in Error State": sensor.percentage_spent_in_error_state
             }
         }
-    
-    # gets the latest recorded temperature data from the given sensor
-    # to update the sensor dict accordingly in our json file
-    def __get_updated_latest_recorded_temp_data(self, sensor):
+
+    # builds a single reading record from the latest recorded temperature data of the
+    # given sensor, carrying the sensor's running aggregates at the time of the reading
+    def __get_reading_record(self, sensor):
         latest_recorded_temp_data = sensor.get_latest_recorded_temp_data()
         return {
-            "Timestamp": latest_recorded_temp_data.DATETIME,
-            "Temp (in Fahrenheit)": latest_recorded_temp_data.TEMP_IN_FAHRENHEIT
+            "Record": self.READING_RECORD,
+            "Sensor ID": sensor.ID,
+            "Timestamp": latest_recorded_temp_data.TIMESTAMP,
+            "Temp (in Fahrenheit)": latest_recorded_temp_data.TEMP_IN_FAHRENHEIT,
+            "Highest Recorded Temp": sensor.highest_temp,
+            "Lowest Recorded Temp": sensor.lowest_temp,
+            "% Spent Above Temp Range": sensor.percentage_spent_above_target_temp_range,
+            "% Spent Within Temp Range": sensor.percentage_spent_within_target_temp_range,
+            "% Spent Below Temp Range": sensor.percentage_spent_below_target_temp_range,
+            "% Spent in Error State": sensor.percentage_spent_in_error_state
         }
 
-    # reads the current json file into a useable Python dict
-    def __get_json_data(self):
+    # appends the given records to the current json lines file, one compact
+    # record per line
+    def __append_to_json_lines_file(self, records, mode='a'):
         try:
-            with open(self.FILEPATH, 'r') as json_file:
-                return json.load(json_file)
-        except FileNotFoundError:
-            print("!!! -> JSON Read File Error: FILE NOT FOUND: {}".format(self.FILEPATH))
-            # need to do something more elegant here than pass?
-            pass
+            with open(self.filepath, mode) as json_lines_file:
+                json_lines_file.write("".join(
+                    json.dumps(record, separators=(",", ":")) + "\n" for record in records
+                ))
+
         except Exception as e:
-            print("!!! -> JSON Read File Error: {}".format(e))
+            LOGGER.error("JSON Write File Error: %s", e)
             # need to do something more elegant here than pass?
             pass
 
-    # writes the given dataset into the current json file
-    # sorted, and with pretty printing
-    def __write_to_json_file(self, data):
+    # starts logging a sensor attached mid-run (e.g. a probe plugged in)
+    def add_sensor(self, sensor):
+        self.__sensors.append(sensor)
+        record = self.__set_initial_serializable_sensor_dict(sensor)
+        record["Record"] = self.SENSOR_RECORD
+        self.__append_to_json_lines_file([record])
+
+    # appends the latest reading of the given sensor to the log (to a new file, if the
+    # current one is full)
+    def update_sensor_data(self, sensor):
+        record = self.__get_reading_record(sensor)
+
+        if self.SEGMENTER.is_due(self.__get_size(), record["Timestamp"]):
+            self.__roll()
+
+        self.__append_to_json_lines_file([record])
+        self.SEGMENTER.add_row(sensor.ID, record["Timestamp"])
+
+    def __get_size(self):
         try:
-            with open(self.FILEPATH, 'w') as json_file:
-                json.dump(data, json_file, indent=4, sort_keys=True)
+            return os.path.getsize(self.filepath)
+        except OSError:
+            return 0
+
+    # carries on in a new file, starting with a record of every sensor
+    def __roll(self):
+        if self.__plotter != None:
+            # the graph reads the rest of the full file before it can be compressed away
+            self.__plotter.update()
+
+        self.filepath = self.SEGMENTER.roll()
+        self.__create_file(self.__sensors)
+
+        if self.__plotter != None:
+            self.__plotter.set_file_to_read(self.filepath)
+
+    # closes the log (the file itself is only ever open while appending to it)
+    def close(self):
+        self.SEGMENTER.close()
+
+    # replays the given json lines log into the nested "Sensor Data" document
+    # (a list of sensor dicts, as the json log used to be written)
+    @staticmethod
+    def read_json_lines_log(filepath):
+        return JsonController.read_json_lines_logs([filepath])
+
+    # replays the files of a json lines log, in order (e.g. every segment of a run),
+    # into one "Sensor Data" document. a sensor's records at the start of later files
+    # are skipped, as its readings carry the aggregates on
+    @staticmethod
+    def read_json_lines_logs(filepaths):
+        data = []
+        sensor_dicts = {}
+
+        for filepath in filepaths:
+            with open_log(filepath) as json_lines_file:
+                for line in json_lines_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # a partially written last line (e.g. after a power cut) is skipped
+                        continue
+
+                    if record.pop("Record", None) == JsonController.SENSOR_RECORD:
+                        if record["Sensor ID"] not in sensor_dicts:
+                            sensor_dicts[record["Sensor ID"]] = record
+                            data.append(record)
+                        continue
+
+                    sensor_dict = sensor_dicts.get(record.pop("Sensor ID", None))
+                    if sensor_dict == None:
+                        continue
+
+                    sensor_data = sensor_dict["Sensor Data"]
+                    sensor_data["Recorded Temp Data"].append({
+                        "Timestamp": record.pop("Timestamp"),
+                        "Temp (in Fahrenheit)": record.pop("Temp (in Fahrenheit)")
+                    })
+                    # the remaining fields are the aggregates as of this reading
+                    sensor_data.update(record)
+
+        return data
+
+    # imports and creates the plotter the first time it is needed, so the
+    # logging path never pays for importing matplotlib
+    def get_plotter(self):
+        if self.__plotter == None:
+            from controllers.temp_sensor_matplotlib import Plotter
+            # the files the run rolled over from are read once, the current one as it grows
+            self.__plotter = Plotter(self.filepath, headless=self.PNG_RENDER_INTERVAL != None, finished_files_to_read=self.SEGMENTER.get_run_filepaths()[:-1])
+
+        return self.__plotter
+
+    # shows the graph of the log, or renders it a final time when headless
+    def graph(self):
+        try:
+            plotter = self.get_plotter()
+        except ImportError as e:
+            print("!!! -> Graphing is unavailable ({}). Install matplotlib to graph the log.".format(e))
+            return
+
+        if plotter.HEADLESS:
+            plotter.stop_rendering()
+            plotter.save_png(self.PNG_FILEPATH)
+        else:
+            plotter.animate()
+
+    # compacts the json lines log (every file of the run) into the nested "Sensor Data" document,
+    # writes it to the compacted json file (sorted, and with pretty printing)
+    # and returns it. the file is replaced atomically, so it is never left half written
+    def compact(self):
+        data = self.read_json_lines_logs(self.SEGMENTER.get_run_filepaths())
+
+        try:
+            write_file_atomically(self.COMPACTED_FILEPATH, json.dumps(data, indent=4, sort_keys=True))
 
         except Exception as e:
-            print("!!! -> JSON Write File Error: {}".format(e))
+            LOGGER.error("JSON Write File Error: %s", e)
             # need to do something more elegant here than pass?
             pass
 
-    # updates the corresponding object in the read json dataset
-    # with the appropriate fields that may have updated between readings
-    def update_sensor_data(self, sensor):
-        data = self.__get_json_data()
-        latest_recorded_temp_data = self.__get_updated_latest_recorded_temp_data(sensor)
-
-        # search through the given dataset
-        for sensor_dict in data:
-            # when we find the matching sensor dict for the given sensor
-            if sensor_dict["Sensor ID"] == sensor.ID:
-                # get a variable for the Sensor Data object that needs updating
-                sensor_data = sensor_dict["Sensor Data"]
-
-                # update the necessary fields
-                sensor_data["Recorded Temp Data"].append(latest_recorded_temp_data)
-                sensor_data["Highest Recorded Temp"] = sensor.highest_temp
-                sensor_data["Lowest Recorded Temp"] = sensor.lowest_temp
-                sensor_data["% Spent Above Temp Range"] = sensor.percentage_spent_above_target_temp_range
-                sensor_data["% Spent Within Temp Range"] = sensor.percentage_spent_within_target_temp_range
-                sensor_data["% Spent Below Temp Range"] = sensor.percentage_spent_below_target_temp_range
-                sensor_data["% Spent in Error State"] = sensor.percentage_spent_in_error_state
-
-        # overwrite the file with the newly updated dataset
-        self.__write_to_json_file(data)
-
-        #####self.PLOTTER.animate()
\ No newline at end of file
+        return data
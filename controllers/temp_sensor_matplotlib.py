@@ -1,49 +1,268 @@
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib import style
+import os
+import gzip
 import json
+import datetime
+import threading
+import matplotlib
+from helpers.temp_sensor_timestamps import get_epoch_timestamp
+from helpers.temp_sensor_segments import open_log, COMPRESSED_EXTENSION
 
 #style.use('fivethirtyeight')
 
+# graphs the readings of a json lines log (see JsonController). only the records
+# added since the last update are read, each sensor keeps a single Line2D that is
+# fed from a MinMaxDecimator, so redrawing stays cheap however long the log gets
 class Plotter:
-    def __init__(self, file_to_read):
-        self.FILE_TO_READ = file_to_read
-        plt.xlabel("Time")
-        plt.ylabel("Temperature (in F)")
-        plt.grid(True)
-        plt.title("Fermentation Temperatures")
-        
-
-    fig = plt.figure()
-    ax1 = fig.add_subplot(1, 1, 1)
-
-    def animate(self):
-        with open(self.FILE_TO_READ, 'r') as json_file:
-            sensor_data = json.load(json_file)
-            data_to_graph = []
-
-            for sensor in sensor_data:
-                recorded_temp_data = sensor["Sensor Data"]["Recorded Temp Data"]
-
-                x_axis_timestamps = []
-                y_axis_temperatures = []
-
-                for dataset in recorded_temp_data:
-                    x_axis_timestamps.append(dataset["Timestamp"])
-                    y_axis_temperatures.append(dataset["Temp (in Fahrenheit)"])
-
-                data_to_graph.append({
-                    "sensor_name": sensor["Sensor Name"],
-                    "x_axis_timestamps": x_axis_timestamps,
-                    "y_axis_temperatures": y_axis_temperatures
-                })
-
-        for dataset in data_to_graph:
-            timestamp_values = range(len(dataset["x_axis_timestamps"]))
-
-            self.ax1.plot(timestamp_values, dataset["y_axis_temperatures"], label=dataset["sensor_name"])
-            self.ax1.set_xticks(timestamp_values)
-            self.ax1.set_xticklabels(dataset["x_axis_timestamps"], rotation=45)
-
-        plt.legend(loc="lower right")
-        plt.show()
\ No newline at end of file
+    BUCKET_BUDGET = 1000
+
+    # when headless, the Agg backend is used so no GUI is ever needed,
+    # and the graph can only be rendered to image files
+    # finished_files_to_read (e.g. the files a log rolled over from) are read whole,
+    # once, before file_to_read
+    def __init__(self, file_to_read, headless=False, finished_files_to_read=()):
+        if headless:
+            matplotlib.use("Agg")
+
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+
+        self.file_to_read = file_to_read
+        self.HEADLESS = headless
+        self.PLT = plt
+        self.MDATES = mdates
+        self.fig = plt.figure()
+        self.ax1 = self.fig.add_subplot(1, 1, 1)
+        self.ax1.set_xlabel("Time")
+        self.ax1.set_ylabel("Temperature (in F)")
+        self.ax1.grid(True)
+        self.ax1.set_title("Fermentation Temperatures")
+
+        locator = mdates.AutoDateLocator()
+        self.ax1.xaxis.set_major_locator(locator)
+        self.ax1.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+        self.LOCK = threading.Lock()
+        self.__finished_files_to_read = list(finished_files_to_read)
+        self.__file_offset = 0
+        self.__sensor_names = {}
+        self.__decimators = {}
+        self.__lines = {}
+        self.__render_stopped = None
+        self.__refresh_timer = None
+
+    # reads the records appended to the log since the last call and adds their
+    # readings to each sensor's line
+    def update(self):
+        with self.LOCK:
+            updated_sensor_ids = set()
+
+            for record in self.__read_finished_files() + self.__read_new_records():
+                if "Sensor Name" in record:
+                    self.__sensor_names[record["Sensor ID"]] = record["Sensor Name"]
+                    continue
+
+                temp = record.get("Temp (in Fahrenheit)")
+                # error readings (0.0) are left out of the graph
+                if temp == None or temp == 0.0:
+                    continue
+
+                sensor_id = record["Sensor ID"]
+                if sensor_id not in self.__decimators:
+                    self.__decimators[sensor_id] = MinMaxDecimator(self.BUCKET_BUDGET)
+                self.__decimators[sensor_id].add(self.__get_date_number(record["Timestamp"]), temp)
+                updated_sensor_ids.add(sensor_id)
+
+            for sensor_id in updated_sensor_ids:
+                self.__update_line(sensor_id)
+
+            if len(updated_sensor_ids) > 0:
+                self.ax1.relim()
+                self.ax1.autoscale_view()
+
+    # switches to reading a new file (e.g. when the log rolls over) from its start,
+    # after reading finished_files_to_read (e.g. segments it rolled over to since) whole
+    def set_file_to_read(self, file_to_read, finished_files_to_read=()):
+        with self.LOCK:
+            self.file_to_read = file_to_read
+            self.__file_offset = 0
+            self.__finished_files_to_read.extend(finished_files_to_read)
+
+    def __read_finished_files(self):
+        records = []
+
+        for filepath in self.__finished_files_to_read:
+            try:
+                with open_log(filepath) as json_lines_file:
+                    for line in json_lines_file:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                print("!!! -> Plotter Read File Error: FILE NOT FOUND: {}".format(filepath))
+
+        self.__finished_files_to_read = []
+        return records
+
+    # reads only the complete lines appended since the last read
+    def __read_new_records(self):
+        records = []
+
+        try:
+            with self.__open_file_to_read() as json_lines_file:
+                json_lines_file.seek(self.__file_offset)
+                new_data = json_lines_file.read()
+        except FileNotFoundError:
+            print("!!! -> Plotter Read File Error: FILE NOT FOUND: {}".format(self.file_to_read))
+            return records
+
+        # a trailing partial line is left for the next read
+        complete_length = new_data.rfind(b"\n") + 1
+        self.__file_offset += complete_length
+
+        for line in new_data[:complete_length].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+        return records
+
+    # a finished segment may have been compressed since it was last read
+    def __open_file_to_read(self):
+        if not os.path.exists(self.file_to_read) and os.path.exists(self.file_to_read + COMPRESSED_EXTENSION):
+            return gzip.open(self.file_to_read + COMPRESSED_EXTENSION, 'rb')
+
+        return open(self.file_to_read, 'rb')
+
+    # converts a reading's timestamp (epoch seconds, or a legacy string from an older
+    # log) into a matplotlib date number, in local time
+    def __get_date_number(self, timestamp):
+        return self.MDATES.date2num(datetime.datetime.fromtimestamp(get_epoch_timestamp(timestamp)))
+
+    def __update_line(self, sensor_id):
+        x_values, y_values = self.__decimators[sensor_id].get_points()
+
+        if sensor_id in self.__lines:
+            self.__lines[sensor_id].set_data(x_values, y_values)
+        else:
+            self.__lines[sensor_id], = self.ax1.plot(
+                x_values,
+                y_values,
+                label=self.__sensor_names.get(sensor_id, sensor_id)
+            )
+            self.ax1.legend(loc="lower right")
+
+    # renders the graph to the given png file, replacing it atomically so a
+    # reader never sees a half written image
+    def save_png(self, png_filepath):
+        self.update()
+
+        with self.LOCK:
+            temp_filepath = png_filepath + ".tmp"
+            self.fig.savefig(temp_filepath, format="png")
+            os.replace(temp_filepath, png_filepath)
+
+    # re-renders the graph to the given png file every interval seconds
+    # on a background thread, until stop_rendering() is called
+    def start_rendering(self, png_filepath, interval):
+        self.__render_stopped = threading.Event()
+
+        def render_loop(stopped):
+            while not stopped.wait(interval):
+                try:
+                    self.save_png(png_filepath)
+                except Exception as e:
+                    print("!!! -> Plotter Render Error: {}".format(e))
+
+        threading.Thread(target=render_loop, args=(self.__render_stopped,), name="plotter_render", daemon=True).start()
+
+    def stop_rendering(self):
+        if self.__render_stopped != None:
+            self.__render_stopped.set()
+            self.__render_stopped = None
+        self.__refresh_timer = None
+
+    # shows the graph in a window (needs a GUI backend). with a refresh_interval (in
+    # seconds) the window is live: the records appended to the log since are added to
+    # the lines on that interval, after calling before_refresh (e.g. to follow the log
+    # onto a new segment with set_file_to_read), until the window is closed
+    def animate(self, refresh_interval=None, before_refresh=None):
+        self.update()
+
+        if refresh_interval != None:
+            def refresh():
+                try:
+                    if before_refresh != None:
+                        before_refresh()
+                    self.update()
+                    self.fig.canvas.draw_idle()
+                except Exception as e:
+                    print("!!! -> Plotter Refresh Error: {}".format(e))
+
+            # the timer is kept, as it stops once nothing refers to it
+            self.__refresh_timer = self.fig.canvas.new_timer(interval=int(refresh_interval * 1000))
+            self.__refresh_timer.add_callback(refresh)
+            self.__refresh_timer.start()
+
+        self.PLT.show()
+
+
+# incrementally reduces a series to at most 2 * bucket_budget points by keeping the
+# lowest and highest point of each bucket of consecutive points. when the buckets
+# run out, neighbouring buckets are merged and the bucket size doubles, so memory
+# and the number of points drawn stay bounded however many points are added
+class MinMaxDecimator:
+    def __init__(self, bucket_budget):
+        self.BUCKET_BUDGET = bucket_budget
+        self.__bucket_size = 1
+        # each bucket is a (min_x, min_y, max_x, max_y) tuple
+        self.__buckets = []
+        self.__open_bucket = None
+        self.__open_bucket_count = 0
+
+    def add(self, x, y):
+        if self.__open_bucket == None:
+            self.__open_bucket = (x, y, x, y)
+        else:
+            self.__open_bucket = self.__merge(self.__open_bucket, (x, y, x, y))
+        self.__open_bucket_count += 1
+
+        if self.__open_bucket_count >= self.__bucket_size:
+            self.__buckets.append(self.__open_bucket)
+            self.__open_bucket = None
+            self.__open_bucket_count = 0
+
+            if len(self.__buckets) >= 2 * self.BUCKET_BUDGET:
+                self.__halve_buckets()
+
+    def __merge(self, first, second):
+        min_x, min_y = (first[0], first[1]) if first[1] <= second[1] else (second[0], second[1])
+        max_x, max_y = (first[2], first[3]) if first[3] >= second[3] else (second[2], second[3])
+        return (min_x, min_y, max_x, max_y)
+
+    def __halve_buckets(self):
+        self.__buckets = [
+            self.__merge(self.__buckets[index], self.__buckets[index + 1])
+            for index in range(0, len(self.__buckets) - 1, 2)
+        ] + self.__buckets[len(self.__buckets) - len(self.__buckets) % 2:]
+        self.__bucket_size *= 2
+
+    # returns the decimated x and y values, in x order
+    def get_points(self):
+        x_values = []
+        y_values = []
+        buckets = self.__buckets if self.__open_bucket == None else self.__buckets + [self.__open_bucket]
+
+        for min_x, min_y, max_x, max_y in buckets:
+            if min_x == max_x:
+                x_values.append(min_x)
+                y_values.append(min_y)
+            elif min_x < max_x:
+                x_values.extend((min_x, max_x))
+                y_values.extend((min_y, max_y))
+            else:
+                x_values.extend((max_x, min_x))
+                y_values.extend((max_y, min_y))
+
+        return x_values, y_values
@@ -0,0 +1,301 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import os.path
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("metrics_controller")
+
+# instruments the polls: how long each stage of a poll takes (see
+# TempSensorController.get_temps), each sensor's reads, retries and errors and the
+# time they spend reading w1_slave, parsing it, sleeping between retries, classifying
+# the reading and updating the led (see TempSensor), the poll scheduler's jitter,
+# overruns and skipped ticks (see PollScheduler), and the process's resident memory
+# after every poll they can be written to logs/metrics as a prometheus text file (for
+# e.g. node_exporter's textfile collector) or as json, polls slower than
+# slow_poll_threshold seconds are logged with their breakdown, and the next
+# profile_polls polls can be captured with cProfile and tracemalloc
+class MetricsController:
+    LOGS_DIRECTORY = "logs"
+    METRICS_DIRECTORY = "metrics"
+    PROMETHEUS = "prometheus"
+    JSON = "json"
+    FILENAMES = {PROMETHEUS: "ferm_temp_metrics.prom", JSON: "ferm_temp_metrics.json"}
+    SLOW_POLLS_FILENAME = "ferm_temp_slow_polls.jsonl"
+    # the slow poll log is rolled over to a .1 file once it gets this big
+    MAXIMUM_SLOW_POLLS_FILE_SIZE = 1024 * 1024
+    # the stages of a poll, in the order they run
+    STAGES = ("device_changes", "conversion", "read", "csv", "json", "sqlite", "print", "alerts", "checkpoint", "http", "control", "export")
+    # where a sensor's read time goes, from the counters each TempSensor keeps
+    SENSOR_STAGES = ("sysfs", "parse", "retry_sleep", "classify", "gpio")
+    PROFILE_TOP_ENTRIES = 40
+    PROFILE_TRACEBACK_FRAMES = 10
+
+    def __init__(self, metrics_format=None, slow_poll_threshold=None, profile_polls=0, directory=None):
+        self.FORMAT = metrics_format
+        self.SLOW_POLL_THRESHOLD = slow_poll_threshold
+        self.DIRECTORY = directory if directory != None else self.__set_directory()
+        self.polls = 0
+        self.slow_polls = 0
+        self.latest_poll_seconds = 0.0
+        self.latest_stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.total_stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.maximum_stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.total_poll_seconds = 0.0
+        self.maximum_poll_seconds = 0.0
+        self.__poll_start = None
+        self.__stage_start = None
+        # each sensor's counters as of the previous poll, for the slow poll log
+        self.__previous_sensor_metrics = {}
+        # the latest PollScheduler.get_metrics(), when polls are scheduled by one
+        self.scheduler_metrics = None
+        self.__profile_polls_left = profile_polls
+        self.__profiled_polls = 0
+        self.__profiler = None
+
+    def __set_directory(self):
+        directory = os.path.join(self.LOGS_DIRECTORY, self.METRICS_DIRECTORY)
+        # try to make the subdirectories, if not found
+        os.makedirs(directory, exist_ok=True)
+
+        return directory
+
+    # starts timing a poll, from its first stage
+    def start_poll(self):
+        if self.__profile_polls_left > 0:
+            self.__start_profiling()
+
+        self.__poll_start = time.perf_counter()
+        self.__stage_start = self.__poll_start
+        self.latest_stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+
+    # keeps the poll scheduler's metrics, to be written out with the next poll's
+    def set_scheduler_metrics(self, scheduler_metrics):
+        self.scheduler_metrics = dict(scheduler_metrics)
+
+    # ends the given stage of the poll, which is timed from the end of the stage before it
+    def end_stage(self, stage):
+        now = time.perf_counter()
+        self.latest_stage_seconds[stage] += now - self.__stage_start
+        self.__stage_start = now
+
+    # ends the poll, and writes out its metrics (and slow poll record) with the
+    # counters of the given sensors (every selected sensor, polled or not)
+    def end_poll(self, sensors, timestamp):
+        if self.__profiler != None:
+            self.__profiler.disable()
+
+        self.latest_poll_seconds = time.perf_counter() - self.__poll_start
+        self.polls += 1
+        self.total_poll_seconds += self.latest_poll_seconds
+        self.maximum_poll_seconds = max(self.maximum_poll_seconds, self.latest_poll_seconds)
+        for stage, seconds in self.latest_stage_seconds.items():
+            self.total_stage_seconds[stage] += seconds
+            self.maximum_stage_seconds[stage] = max(self.maximum_stage_seconds[stage], seconds)
+
+        sensor_metrics = {sensor.ID: self.__get_sensor_metrics(sensor) for sensor in sensors}
+
+        if self.SLOW_POLL_THRESHOLD != None and self.latest_poll_seconds > self.SLOW_POLL_THRESHOLD:
+            self.slow_polls += 1
+            self.__log_slow_poll(timestamp, sensor_metrics)
+        self.__previous_sensor_metrics = sensor_metrics
+
+        if self.FORMAT != None:
+            self.__write_metrics(self.get_metrics(sensor_metrics, timestamp))
+
+        if self.__profiler != None:
+            self.__finish_profiling()
+
+    # returns every metric as a json serializable dict
+    def get_metrics(self, sensor_metrics, timestamp):
+        return {
+            "timestamp": timestamp,
+            "polls": self.polls,
+            "slow_polls": self.slow_polls,
+            "process_resident_memory_bytes": _get_resident_memory_bytes(),
+            "poll_seconds": {
+                "last": round(self.latest_poll_seconds, 6),
+                "total": round(self.total_poll_seconds, 6),
+                "maximum": round(self.maximum_poll_seconds, 6)
+            },
+            "stages": {
+                stage: {
+                    "last": round(self.latest_stage_seconds[stage], 6),
+                    "total": round(self.total_stage_seconds[stage], 6),
+                    "maximum": round(self.maximum_stage_seconds[stage], 6)
+                }
+                for stage in self.STAGES
+            },
+            "scheduler": self.scheduler_metrics,
+            "sensors": sensor_metrics
+        }
+
+    # the running counters of the given sensor
+    def __get_sensor_metrics(self, sensor):
+        parse_seconds = sensor.W1_PARSER.parse_seconds
+
+        return {
+            "name": sensor.NAME,
+            "reads": sensor.W1_PARSER.reads,
+            "retries": sensor.retries,
+            "errors": sensor.errors,
+            "seconds": {
+                # the parser's read time includes parsing, which is counted apart
+                "sysfs": round(sensor.read_seconds - parse_seconds, 6),
+                "parse": round(parse_seconds, 6),
+                "retry_sleep": round(sensor.retry_sleep_seconds, 6),
+                "classify": round(sensor.classify_seconds, 6),
+                "gpio": round(sensor.gpio_seconds, 6)
+            }
+        }
+
+    # appends the poll's stage times, and what each sensor did during it, to the
+    # slow poll log
+    def __log_slow_poll(self, timestamp, sensor_metrics):
+        sensors = {}
+        for sensor_id, metrics in sensor_metrics.items():
+            previous_metrics = self.__previous_sensor_metrics.get(sensor_id)
+            sensors[sensor_id] = {
+                key: metrics[key] - previous_metrics[key] if previous_metrics != None else metrics[key]
+                for key in ("reads", "retries", "errors")
+            }
+            sensors[sensor_id]["seconds"] = {
+                stage: round(metrics["seconds"][stage] - (previous_metrics["seconds"][stage] if previous_metrics != None else 0), 6)
+                for stage in self.SENSOR_STAGES
+            }
+
+        record = {
+            "timestamp": timestamp,
+            "poll_seconds": round(self.latest_poll_seconds, 6),
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.latest_stage_seconds.items()},
+            "sensors": sensors
+        }
+        filepath = os.path.join(self.DIRECTORY, self.SLOW_POLLS_FILENAME)
+        LOGGER.warning("Slow poll: %s seconds (over %s). Logged to %s.", round(self.latest_poll_seconds, 3), self.SLOW_POLL_THRESHOLD, filepath)
+
+        try:
+            if os.path.exists(filepath) and os.path.getsize(filepath) >= self.MAXIMUM_SLOW_POLLS_FILE_SIZE:
+                os.replace(filepath, filepath + ".1")
+            with open(filepath, 'a') as slow_polls_file:
+                slow_polls_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as e:
+            LOGGER.error("Slow Poll Log Write File Error: %s", e)
+
+    # rewrites the metrics file. it is replaced in one go so a reader never sees half of
+    # it, but not fsynced, as it is rewritten every poll and only describes the run
+    def __write_metrics(self, metrics):
+        filepath = os.path.join(self.DIRECTORY, self.FILENAMES[self.FORMAT])
+        if self.FORMAT == self.PROMETHEUS:
+            data = self.__get_prometheus_text(metrics)
+        else:
+            data = json.dumps(metrics, separators=(",", ":")) + "\n"
+
+        try:
+            with open(filepath + ".tmp", 'w') as metrics_file:
+                metrics_file.write(data)
+            os.replace(filepath + ".tmp", filepath)
+        except OSError as e:
+            LOGGER.error("Metrics Write File Error: %s", e)
+
+    # renders the metrics in the prometheus text exposition format
+    def __get_prometheus_text(self, metrics):
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            lines.append("# HELP ferm_{} {}".format(name, help_text))
+            lines.append("# TYPE ferm_{} {}".format(name, metric_type))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(key, _escape_label_value(label_value)) for key, label_value in labels)
+                lines.append("ferm_{}{} {}".format(name, "{" + label_text + "}" if label_text else "", value))
+
+        sensors = metrics["sensors"]
+        sensor_labels = {sensor_id: (("sensor_id", sensor_id), ("sensor_name", sensor["name"])) for sensor_id, sensor in sensors.items()}
+
+        add_metric("polls_total", "counter", "Polls made.", [((), metrics["polls"])])
+        add_metric("slow_polls_total", "counter", "Polls slower than the slow poll threshold.", [((), metrics["slow_polls"])])
+        # the whole polls are metrics of their own, so summing the stages never counts them twice
+        add_metric("poll_duration_seconds_total", "counter", "Time spent polling.", [((), metrics["poll_seconds"]["total"])])
+        add_metric("poll_duration_last_seconds", "gauge", "Time the last poll took.", [((), metrics["poll_seconds"]["last"])])
+        add_metric("poll_duration_maximum_seconds", "gauge", "Time the slowest poll took.", [((), metrics["poll_seconds"]["maximum"])])
+        add_metric("poll_seconds_total", "counter", "Time spent polling, by stage.", [((("stage", stage),), metrics["stages"][stage]["total"]) for stage in self.STAGES])
+        add_metric("poll_last_seconds", "gauge", "Time the last poll took, by stage.", [((("stage", stage),), metrics["stages"][stage]["last"]) for stage in self.STAGES])
+        add_metric("poll_maximum_seconds", "gauge", "Time the slowest poll took, by stage.", [((("stage", stage),), metrics["stages"][stage]["maximum"]) for stage in self.STAGES])
+        add_metric("sensor_reads_total", "counter", "w1_slave reads, including retries.", [(sensor_labels[sensor_id], sensor["reads"]) for sensor_id, sensor in sensors.items()])
+        add_metric("sensor_retries_total", "counter", "w1_slave reads retried after a bad reading.", [(sensor_labels[sensor_id], sensor["retries"]) for sensor_id, sensor in sensors.items()])
+        add_metric("sensor_errors_total", "counter", "Readings logged as errors.", [(sensor_labels[sensor_id], sensor["errors"]) for sensor_id, sensor in sensors.items()])
+        add_metric("sensor_seconds_total", "counter", "Time spent on each sensor's readings, by stage.", [
+            (sensor_labels[sensor_id] + (("stage", stage),), sensor["seconds"][stage])
+            for sensor_id, sensor in sensors.items()
+            for stage in self.SENSOR_STAGES
+        ])
+        scheduler = metrics["scheduler"]
+        if scheduler != None:
+            add_metric("scheduler_ticks_total", "counter", "Poll ticks fired.", [((), scheduler["ticks"])])
+            add_metric("scheduler_overruns_total", "counter", "Polls that ran past the next tick.", [((), scheduler["overruns"])])
+            add_metric("scheduler_skipped_ticks_total", "counter", "Ticks skipped after an overrun.", [((), scheduler["skipped_ticks"])])
+            add_metric("scheduler_jitter_seconds", "gauge", "How late poll ticks fired.", [
+                ((("statistic", "last"),), scheduler["last_jitter"]),
+                ((("statistic", "mean"),), scheduler["mean_jitter"]),
+                ((("statistic", "maximum"),), scheduler["max_jitter"])
+            ])
+        if metrics["process_resident_memory_bytes"] != None:
+            add_metric("process_resident_memory_bytes", "gauge", "Resident memory of the logger.", [((), metrics["process_resident_memory_bytes"])])
+
+        return "\n".join(lines) + "\n"
+
+    # profiles (only the polling thread: in threaded polling mode the reads themselves
+    # run on the worker threads, so use sequential polling to profile them too) and
+    # traces the allocations of the polls until profile_polls have been captured
+    def __start_profiling(self):
+        if self.__profiler == None:
+            print("-> Profiling the next {} polls.".format(self.__profile_polls_left))
+            self.__profiler = cProfile.Profile()
+            tracemalloc.start(self.PROFILE_TRACEBACK_FRAMES)
+
+        self.__profiler.enable()
+
+    # writes out the profile once every poll asked for has been captured: the raw stats
+    # (for pstats or snakeviz) and a summary of the slowest calls and largest allocations
+    def __finish_profiling(self):
+        self.__profile_polls_left -= 1
+        self.__profiled_polls += 1
+
+        if self.__profile_polls_left > 0:
+            return
+
+        filepath = os.path.join(self.DIRECTORY, "ferm_temp_profile_{}".format(time.strftime("%Y%m%d_%H%M%S")))
+        summary = io.StringIO()
+        summary.write("{} polls profiled\n\n".format(self.__profiled_polls))
+        pstats.Stats(self.__profiler, stream=summary).sort_stats("cumulative").print_stats(self.PROFILE_TOP_ENTRIES)
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        summary.write("\nlargest allocations still held after the last profiled poll:\n")
+        for statistic in snapshot.statistics("lineno")[:self.PROFILE_TOP_ENTRIES]:
+            summary.write("{}\n".format(statistic))
+
+        try:
+            self.__profiler.dump_stats(filepath + ".pstats")
+            with open(filepath + ".txt", 'w') as summary_file:
+                summary_file.write(summary.getvalue())
+            print("-> Profiled {} polls. Written to {}.pstats and {}.txt.".format(self.__profiled_polls, filepath, filepath))
+        except OSError as e:
+            print("!!! -> Profile Write File Error: {}".format(e))
+
+        self.__profiler = None
+
+
+# the process's resident memory in bytes, or None where /proc is not available
+def _get_resident_memory_bytes():
+    try:
+        with open("/proc/self/statm", 'r') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# escapes a prometheus label value
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
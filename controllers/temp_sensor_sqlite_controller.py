@@ -0,0 +1,188 @@
+import time
+import sqlite3
+import threading
+import os.path
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("sqlite_controller")
+
+# stores every run's readings in one sqlite database (in WAL mode), indexed by
+# (sensor id, epoch timestamp) so history can be looked up by range across runs
+# instead of by parsing every csv/json log
+class SqliteController:
+    LOGS_DIRECTORY = "logs"
+    SQLITE_DIRECTORY = "sqlite"
+    FILENAME = "ferm_temp_data.db"
+    # readings kept buffered while writes fail; past it the oldest are dropped, as
+    # they are still in the csv/json logs
+    MAXIMUM_PENDING_ROWS = 10000
+
+    # when sensors are given, a new run is started for them; without sensors the
+    # database is only opened for the query helpers (e.g. from another process)
+    # given the run_id of an earlier run (e.g. from a checkpoint), that run is carried on
+    def __init__(self, sensors=None, filepath=None, run_id=None):
+        self.FILEPATH = filepath if filepath != None else self.__set_filepath()
+        self.LOCK = threading.Lock()
+        self.CONNECTION = sqlite3.connect(self.FILEPATH, check_same_thread=False)
+        self.__create_tables()
+        self.RUN_ID = None
+        self.__pending_rows = []
+        self.__dropping_rows = False
+
+        if sensors != None:
+            self.RUN_ID = self.__start_run(sensors, run_id)
+
+    def __set_filepath(self):
+        # try to make the subdirectories, if not found
+        os.makedirs("{}/{}".format(self.LOGS_DIRECTORY, self.SQLITE_DIRECTORY), exist_ok=True)
+
+        return os.path.join(self.LOGS_DIRECTORY, self.SQLITE_DIRECTORY, self.FILENAME)
+
+    def __create_tables(self):
+        with self.LOCK, self.CONNECTION:
+            self.CONNECTION.execute("PRAGMA journal_mode=WAL")
+            self.CONNECTION.execute("PRAGMA synchronous=NORMAL")
+            self.CONNECTION.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY,
+                    started_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sensors (
+                    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                    sensor_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    position INTEGER,
+                    target_temp REAL,
+                    positive_allowance REAL,
+                    negative_allowance REAL,
+                    PRIMARY KEY (run_id, sensor_id)
+                );
+                CREATE TABLE IF NOT EXISTS readings (
+                    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                    sensor_id TEXT NOT NULL,
+                    epoch_ts REAL NOT NULL,
+                    temp REAL,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS readings_by_sensor_and_time ON readings (sensor_id, epoch_ts);
+                CREATE INDEX IF NOT EXISTS sensors_by_name ON sensors (name);
+            """)
+
+    def __start_run(self, sensors, run_id=None):
+        with self.LOCK, self.CONNECTION:
+            if run_id == None or self.CONNECTION.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() == None:
+                run_id = self.CONNECTION.execute(
+                    "INSERT INTO runs (started_at) VALUES (?)", (time.time(),)
+                ).lastrowid
+            # a resumed run already has its sensors, apart from any added since
+            self.CONNECTION.executemany(
+                "INSERT OR IGNORE INTO sensors VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self.__get_sensor_row(run_id, sensor) for sensor in sensors]
+            )
+
+        return run_id
+
+    # adds a sensor attached to the running run (e.g. a probe plugged in mid-run)
+    def add_sensor(self, sensor):
+        with self.LOCK, self.CONNECTION:
+            self.CONNECTION.execute("INSERT OR IGNORE INTO sensors VALUES (?, ?, ?, ?, ?, ?, ?)", self.__get_sensor_row(self.RUN_ID, sensor))
+
+    def __get_sensor_row(self, run_id, sensor):
+        return (
+            run_id,
+            sensor.ID,
+            sensor.NAME,
+            sensor.POSITION,
+            sensor.TARGET_TEMP,
+            sensor.TARGET_TEMP_POSITIVE_ALLOWANCE,
+            sensor.TARGET_TEMP_NEGATIVE_ALLOWANCE
+        )
+
+    # buffers the latest reading of the given sensor until the poll is written
+    def update_sensor_data(self, sensor):
+        temp_data = sensor.get_latest_recorded_temp_data()
+        self.__pending_rows.append((
+            self.RUN_ID,
+            sensor.ID,
+            temp_data.TIMESTAMP,
+            temp_data.TEMP_IN_FAHRENHEIT,
+            sensor.ERROR
+        ))
+
+        if len(self.__pending_rows) > self.MAXIMUM_PENDING_ROWS:
+            del self.__pending_rows[:len(self.__pending_rows) - self.MAXIMUM_PENDING_ROWS]
+            if not self.__dropping_rows:
+                self.__dropping_rows = True
+                LOGGER.error("SQLite writes have failed for %s readings. Dropping the oldest unwritten readings (they are still in the csv/json logs) until a write succeeds.", self.MAXIMUM_PENDING_ROWS, extra={"rate_limited": False})
+
+    # inserts all of the readings buffered during this poll in a single transaction
+    def write_poll(self):
+        if len(self.__pending_rows) == 0:
+            return
+
+        try:
+            with self.LOCK, self.CONNECTION:
+                self.CONNECTION.executemany("INSERT INTO readings VALUES (?, ?, ?, ?, ?)", self.__pending_rows)
+            self.__pending_rows = []
+            self.__dropping_rows = False
+
+        except sqlite3.Error as e:
+            LOGGER.error("SQLite Write Error: %s", e)
+            # the readings stay buffered and are retried with the next poll
+            pass
+
+    def close(self):
+        self.write_poll()
+        self.CONNECTION.close()
+
+    # returns the runs as (run_id, started_at) tuples, newest first
+    def get_runs(self, limit=None):
+        with self.LOCK:
+            return self.CONNECTION.execute(
+                "SELECT run_id, started_at FROM runs ORDER BY run_id DESC LIMIT ?",
+                (limit if limit != None else -1,)
+            ).fetchall()
+
+    # returns the (epoch_ts, temp) readings of the given sensor between the given
+    # epoch timestamps (inclusive), oldest first
+    def get_readings(self, sensor_id, start, end):
+        with self.LOCK:
+            return self.CONNECTION.execute(
+                "SELECT epoch_ts, temp FROM readings WHERE sensor_id = ? AND epoch_ts BETWEEN ? AND ? ORDER BY epoch_ts",
+                (sensor_id, start, end)
+            ).fetchall()
+
+    # returns the count, lowest, highest and mean temp of the given sensor's
+    # successful readings between the given epoch timestamps (inclusive)
+    def get_aggregates(self, sensor_id, start, end):
+        with self.LOCK:
+            count, lowest, highest, mean = self.CONNECTION.execute(
+                "SELECT COUNT(temp), MIN(temp), MAX(temp), AVG(temp) FROM readings "
+                "WHERE sensor_id = ? AND epoch_ts BETWEEN ? AND ? AND error IS NULL",
+                (sensor_id, start, end)
+            ).fetchone()
+
+        return {"count": count, "lowest": lowest, "highest": highest, "mean": mean}
+
+    # returns the readings of the sensor with the given name between from_seconds and
+    # to_seconds after the start of each of the last number_of_runs runs, as a dict of
+    # run_id -> [(epoch_ts, temp), ...]
+    # e.g. what did FV3 do between day 2 and day 4 of the last ten batches:
+    # get_readings_by_run_offset("FV3", 2 * 86400, 4 * 86400, 10)
+    def get_readings_by_run_offset(self, sensor_name, from_seconds, to_seconds, number_of_runs=10):
+        with self.LOCK:
+            runs = self.CONNECTION.execute(
+                "SELECT runs.run_id, runs.started_at, sensors.sensor_id FROM runs "
+                "JOIN sensors ON sensors.run_id = runs.run_id "
+                "WHERE sensors.name = ? ORDER BY runs.run_id DESC LIMIT ?",
+                (sensor_name, number_of_runs)
+            ).fetchall()
+
+            return {
+                run_id: self.CONNECTION.execute(
+                    "SELECT epoch_ts, temp FROM readings "
+                    "WHERE sensor_id = ? AND epoch_ts BETWEEN ? AND ? AND run_id = ? ORDER BY epoch_ts",
+                    (sensor_id, started_at + from_seconds, started_at + to_seconds, run_id)
+                ).fetchall()
+                for run_id, started_at, sensor_id in runs
+            }
@@ -0,0 +1,342 @@
+import json
+import sys
+import time
+sys.path.append("..")
+from helpers.temp_sensor_exceptions import InvalidConfigException
+from helpers.temp_sensor_w1_parser import W1_DEVICES_DIRECTORY
+from helpers.temp_sensor_w1_therm import W1Therm
+from helpers.temp_sensor_logging import OUTPUT_MODES
+
+# class to load and validate a json config file, so the logger can start without
+# prompting for anything (e.g. from systemd after a power blip). see
+# ferm_temp_tracker.example.json for a complete example
+class TempSensorConfig:
+    MINIMUM_POLLING_RATE = 2
+    MINIMUM_CONTROL_PERIOD = 1
+    LED_COLORS = ("red", "green", "blue")
+    CONTROL_MODES = ("pid", "deadband")
+    METRICS_FORMATS = ("prometheus", "json")
+
+    def __init__(self, filepath):
+        self.FILEPATH = filepath
+        config = self.__read_file()
+
+        # polling rate is in minutes, as when prompted for it
+        self.POLLING_RATE = self.__get_number(config, "polling_rate", self.MINIMUM_POLLING_RATE)
+        self.POLLING_MODE = config.get("polling_mode", "threaded")
+        self.SENSOR_DEADLINE = self.__get_number(config, "sensor_deadline", 15)
+        self.HISTORY_CAPACITY = self.__get_optional_integer(config, "history_capacity")
+        self.PNG_RENDER_INTERVAL = self.__get_optional_number(config, "png_render_interval")
+        self.CSV_FLUSH_POLICY = config.get("csv_flush_policy", "poll")
+        self.CSV_FLUSH_INTERVAL = self.__get_number(config, "csv_flush_interval", 60)
+        self.SQLITE = config.get("sqlite", False) == True
+        self.W1_DEVICES_DIRECTORY = config.get("w1_devices_directory", W1_DEVICES_DIRECTORY)
+        self.EXPORT_ADDRESS = self.__get_address(config, "export_address")
+        self.HTTP_ADDRESS = self.__get_address(config, "http_address")
+        self.NODE_NAME = config.get("node_name")
+        self.ALERT_HYSTERESIS, self.ALERT_MINIMUM_DWELL, self.ALERT_WEBHOOK_URL = self.__get_alerts(config)
+        # the control period is in seconds, as it is far shorter than any polling rate
+        self.CONTROL_PERIOD = self.__get_number(config, "control_period", 5)
+        # how often (in seconds) the bus is rescanned for probes being plugged in and out,
+        # or null to never look again after starting
+        self.DEVICE_RESCAN_INTERVAL = self.__get_optional_number(config, "device_rescan_interval") if "device_rescan_interval" in config else 10
+        # whether every probe converts at once at the start of a poll (see W1Therm)
+        self.BULK_CONVERSION = config.get("bulk_conversion", False) == True
+        self.METRICS_FORMAT, self.SLOW_POLL_THRESHOLD = self.__get_metrics(config)
+        # how much is written to the console each poll (see configure_logging), and how
+        # often (in seconds) a repeated warning is written, or null for every time
+        self.CONSOLE_OUTPUT = config.get("console_output", "verbose")
+        self.REPEATED_MESSAGE_INTERVAL = self.__get_optional_number(config, "repeated_message_interval") if "repeated_message_interval" in config else 300
+        self.SEGMENT_SIZE, self.SEGMENT_INTERVAL, self.COMPRESS_SEGMENTS = self.__get_log_segments(config)
+        self.SENSORS = self.__get_sensors(config)
+
+        if self.POLLING_MODE not in ("threaded", "sequential"):
+            raise InvalidConfigException("polling_mode must be \"threaded\" or \"sequential\", not {}".format(self.POLLING_MODE))
+
+        if self.CSV_FLUSH_POLICY not in ("poll", "interval", "fsync"):
+            raise InvalidConfigException("csv_flush_policy must be \"poll\", \"interval\" or \"fsync\", not {}".format(self.CSV_FLUSH_POLICY))
+
+        if self.CONTROL_PERIOD < self.MINIMUM_CONTROL_PERIOD:
+            raise InvalidConfigException("\"control_period\" must be at least {} second, as a probe takes 750 ms to read".format(self.MINIMUM_CONTROL_PERIOD))
+
+        if self.CONSOLE_OUTPUT not in OUTPUT_MODES:
+            raise InvalidConfigException("console_output must be \"verbose\", \"summary\" or \"quiet\", not {}".format(self.CONSOLE_OUTPUT))
+
+        if self.REPEATED_MESSAGE_INTERVAL != None and self.REPEATED_MESSAGE_INTERVAL < 0:
+            raise InvalidConfigException("\"repeated_message_interval\" cannot be negative")
+
+        if self.DEVICE_RESCAN_INTERVAL != None and self.DEVICE_RESCAN_INTERVAL <= 0:
+            raise InvalidConfigException("\"device_rescan_interval\" must be a positive number of seconds, or null")
+
+        if self.POLLING_RATE < self.MINIMUM_POLLING_RATE:
+            print("-> The minimum required polling rate is {} minutes.\n-> Setting polling rate to {} minutes.".format(self.MINIMUM_POLLING_RATE, self.MINIMUM_POLLING_RATE))
+            self.POLLING_RATE = self.MINIMUM_POLLING_RATE
+
+    def __read_file(self):
+        try:
+            with open(self.FILEPATH, 'r') as config_file:
+                config = json.load(config_file)
+        except FileNotFoundError:
+            raise InvalidConfigException("config file not found: {}".format(self.FILEPATH))
+        except ValueError as e:
+            raise InvalidConfigException("config file {} is not valid json: {}".format(self.FILEPATH, e))
+
+        if not isinstance(config, dict):
+            raise InvalidConfigException("config file {} must contain a json object".format(self.FILEPATH))
+
+        return config
+
+    # returns the configured sensors as a list of dicts with the keys
+    # id, name, target_temp, positive_allowance, negative_allowance, led_pins,
+    # polling_rate, resolution, control and schedule
+    def __get_sensors(self, config):
+        sensors = config.get("sensors")
+
+        if not isinstance(sensors, list) or len(sensors) < 1:
+            raise InvalidConfigException("\"sensors\" must be a list of at least one sensor")
+
+        validated_sensors = []
+        seen_ids = set()
+
+        for sensor in sensors:
+            if not isinstance(sensor, dict) or not isinstance(sensor.get("id"), str):
+                raise InvalidConfigException("every sensor needs an \"id\" (e.g. \"28-0316a2794aff\")")
+            if sensor["id"] in seen_ids:
+                raise InvalidConfigException("sensor {} is configured more than once".format(sensor["id"]))
+            seen_ids.add(sensor["id"])
+
+            positive_allowance = self.__get_number(sensor, "positive_allowance")
+            negative_allowance = self.__get_number(sensor, "negative_allowance")
+            schedule = self.__get_schedule(sensor, positive_allowance, negative_allowance)
+
+            validated_sensors.append({
+                "id": sensor["id"],
+                "name": str(sensor.get("name", sensor["id"])),
+                # a scheduled sensor's target temp is its first step's, unless given
+                "target_temp": self.__get_number(sensor, "target_temp", schedule["steps"][0]["target_temp"] if schedule != None else None),
+                "positive_allowance": positive_allowance,
+                "negative_allowance": negative_allowance,
+                "led_pins": self.__get_led_pins(sensor),
+                "polling_rate": self.__get_sensor_polling_rate(sensor),
+                "resolution": self.__get_resolution(sensor),
+                "control": self.__get_control(sensor),
+                "schedule": schedule
+            })
+
+        return validated_sensors
+
+    # a sensor's own polling rate is given in minutes, like the main polling rate,
+    # and is returned in seconds
+    def __get_sensor_polling_rate(self, sensor):
+        polling_rate = self.__get_optional_number(sensor, "polling_rate")
+
+        if polling_rate == None:
+            return None
+
+        if polling_rate < self.MINIMUM_POLLING_RATE:
+            print("-> The minimum required polling rate is {} minutes.\n-> Setting polling rate for sensor {} to {} minutes.".format(self.MINIMUM_POLLING_RATE, sensor["id"], self.MINIMUM_POLLING_RATE))
+            polling_rate = self.MINIMUM_POLLING_RATE
+
+        return round(polling_rate * 60, 2)
+
+    # a probe's resolution in bits, or None to leave it as it is (12 bit out of the box)
+    def __get_resolution(self, sensor):
+        resolution = sensor.get("resolution")
+
+        if resolution != None and (not isinstance(resolution, int) or resolution not in W1Therm.RESOLUTIONS):
+            raise InvalidConfigException("resolution for sensor {} must be 9, 10, 11 or 12 bits, not {}".format(sensor["id"], resolution))
+
+        return resolution
+
+    # returns the sensor's fermentation schedule (see TempSchedule) as a dict of start
+    # (epoch seconds, or None to start when the logger does) and steps, each step a dict
+    # of target_temp, positive_allowance, negative_allowance (the sensor's own, unless
+    # given), days (null on the last step holds it forever) and ramp_days, or None
+    # start can be given as epoch seconds or as local time, e.g. "2018-12-17 16:00"
+    def __get_schedule(self, sensor, positive_allowance, negative_allowance):
+        schedule = sensor.get("schedule")
+
+        if schedule == None:
+            return None
+
+        if not isinstance(schedule, dict) or not isinstance(schedule.get("steps"), list) or len(schedule["steps"]) < 1:
+            raise InvalidConfigException("schedule for sensor {} must be an object with a list of at least one step".format(sensor["id"]))
+
+        start = schedule.get("start")
+        if isinstance(start, str):
+            try:
+                start = time.mktime(time.strptime(start, "%Y-%m-%d %H:%M"))
+            except ValueError:
+                raise InvalidConfigException("schedule start for sensor {} must look like \"YYYY-MM-DD HH:MM\", not {}".format(sensor["id"], start))
+        elif start != None:
+            start = self.__get_number(schedule, "start")
+
+        validated_steps = []
+
+        for index, step in enumerate(schedule["steps"]):
+            if not isinstance(step, dict):
+                raise InvalidConfigException("schedule steps for sensor {} must be objects".format(sensor["id"]))
+
+            validated_step = {
+                "target_temp": self.__get_number(step, "target_temp"),
+                "positive_allowance": self.__get_number(step, "positive_allowance", positive_allowance),
+                "negative_allowance": self.__get_number(step, "negative_allowance", negative_allowance),
+                "days": self.__get_optional_number(step, "days"),
+                "ramp_days": self.__get_number(step, "ramp_days", 0)
+            }
+
+            if validated_step["days"] == None and index < len(schedule["steps"]) - 1:
+                raise InvalidConfigException("only the last schedule step for sensor {} can hold forever, every other step needs \"days\"".format(sensor["id"]))
+            if any(validated_step[key] != None and validated_step[key] < 0 for key in ("positive_allowance", "negative_allowance", "days", "ramp_days")):
+                raise InvalidConfigException("schedule step settings for sensor {} cannot be negative".format(sensor["id"]))
+
+            validated_steps.append(validated_step)
+
+        return {"start": start, "steps": validated_steps}
+
+    # returns a (host, port) from "host:port", e.g. of the aggregator to stream readings
+    # to (export_address) or to serve the http api on (http_address)
+    def __get_address(self, config, key):
+        address = config.get(key)
+
+        if address == None:
+            return None
+
+        host, _, port = str(address).rpartition(":")
+        if host == "" or not port.isdigit():
+            raise InvalidConfigException("\"{}\" must look like \"host:port\", not {}".format(key, address))
+
+        return host, int(port)
+
+    # returns the alert hysteresis (in degrees F), minimum dwell (given in minutes,
+    # returned in seconds) and the webhook url to post alerts to, if any
+    def __get_alerts(self, config):
+        alerts = config.get("alerts", {})
+
+        if not isinstance(alerts, dict):
+            raise InvalidConfigException("\"alerts\" must be an object")
+
+        hysteresis = self.__get_number(alerts, "hysteresis", 0.5)
+        minimum_dwell = self.__get_number(alerts, "minimum_dwell", 0)
+        webhook_url = alerts.get("webhook_url")
+
+        if hysteresis < 0 or minimum_dwell < 0:
+            raise InvalidConfigException("alert \"hysteresis\" and \"minimum_dwell\" cannot be negative")
+        if webhook_url != None and not str(webhook_url).startswith(("http://", "https://")):
+            raise InvalidConfigException("alert \"webhook_url\" must be an http(s) url, not {}".format(webhook_url))
+
+        return hysteresis, round(minimum_dwell * 60, 2), webhook_url
+
+    # returns the format to write the poll metrics file in (or None for no file), and
+    # how long (in seconds) a poll can take before it is logged as slow (or None)
+    def __get_metrics(self, config):
+        metrics = config.get("metrics", {})
+
+        if not isinstance(metrics, dict):
+            raise InvalidConfigException("\"metrics\" must be an object")
+
+        metrics_format = metrics.get("format")
+        slow_poll_threshold = self.__get_optional_number(metrics, "slow_poll_threshold")
+
+        if metrics_format != None and metrics_format not in self.METRICS_FORMATS:
+            raise InvalidConfigException("metrics \"format\" must be \"prometheus\", \"json\" or null, not {}".format(metrics_format))
+        if slow_poll_threshold != None and slow_poll_threshold <= 0:
+            raise InvalidConfigException("metrics \"slow_poll_threshold\" must be a positive number of seconds, or null")
+
+        return metrics_format, slow_poll_threshold
+
+    # returns how big (given in megabytes, returned in bytes) and how long (given in
+    # hours, returned in seconds) each file of the csv and json logs can get before
+    # they roll over to a new one (either None for no limit), and whether the closed
+    # files are gzipped
+    def __get_log_segments(self, config):
+        log_segments = config.get("log_segments", {})
+
+        if not isinstance(log_segments, dict):
+            raise InvalidConfigException("\"log_segments\" must be an object")
+
+        max_megabytes = self.__get_optional_number(log_segments, "max_megabytes")
+        max_hours = self.__get_optional_number(log_segments, "max_hours")
+
+        if any(value != None and value <= 0 for value in (max_megabytes, max_hours)):
+            raise InvalidConfigException("log segment \"max_megabytes\" and \"max_hours\" must be positive numbers, or null")
+
+        return (
+            int(max_megabytes * 1024 * 1024) if max_megabytes != None else None,
+            round(max_hours * 3600, 2) if max_hours != None else None,
+            log_segments.get("compress", False) == True
+        )
+
+    # returns how the sensor's vessel is temp controlled (see ControlChannel), or None
+    # if it is only monitored. every time is in seconds
+    def __get_control(self, sensor):
+        control = sensor.get("control")
+
+        if control == None:
+            return None
+
+        if not isinstance(control, dict):
+            raise InvalidConfigException("control for sensor {} must be an object".format(sensor["id"]))
+
+        mode = control.get("mode", "pid")
+        if mode not in self.CONTROL_MODES:
+            raise InvalidConfigException("control mode for sensor {} must be \"pid\" or \"deadband\", not {}".format(sensor["id"], mode))
+
+        heater_pin = control.get("heater_pin")
+        cooler_pin = control.get("cooler_pin")
+        if any(pin != None and (isinstance(pin, bool) or not isinstance(pin, int)) for pin in (heater_pin, cooler_pin)):
+            raise InvalidConfigException("heater_pin and cooler_pin for sensor {} must be board pin numbers".format(sensor["id"]))
+        if heater_pin == None and cooler_pin == None:
+            raise InvalidConfigException("control for sensor {} needs a heater_pin, a cooler_pin or both".format(sensor["id"]))
+
+        validated_control = {
+            "mode": mode,
+            "heater_pin": heater_pin,
+            "cooler_pin": cooler_pin,
+            "kp": self.__get_number(control, "kp", 1.0),
+            "ki": self.__get_number(control, "ki", 1.0 / 7200),
+            "kd": self.__get_number(control, "kd", 0.0),
+            "deadband": self.__get_number(control, "deadband", 0.5),
+            "cycle_time": self.__get_number(control, "cycle_time", 600),
+            "minimum_on_time": self.__get_number(control, "minimum_on_time", 60),
+            "minimum_off_time": self.__get_number(control, "minimum_off_time", 60),
+            "active_low": control.get("active_low", True) == True
+        }
+
+        if any(validated_control[key] < 0 for key in ("kp", "ki", "kd", "deadband", "minimum_on_time", "minimum_off_time")) or validated_control["cycle_time"] <= 0:
+            raise InvalidConfigException("control settings for sensor {} cannot be negative".format(sensor["id"]))
+
+        return validated_control
+
+    def __get_led_pins(self, sensor):
+        led_pins = sensor.get("led_pins")
+
+        if led_pins == None:
+            return None
+
+        if not isinstance(led_pins, dict) or any(not isinstance(led_pins.get(color), int) for color in self.LED_COLORS):
+            raise InvalidConfigException("led_pins for sensor {} must map red, green and blue to board pin numbers".format(sensor["id"]))
+
+        return {color: led_pins[color] for color in self.LED_COLORS}
+
+    def __get_number(self, config, key, default=None):
+        value = config.get(key, default)
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise InvalidConfigException("\"{}\" must be a number".format(key))
+
+        return value
+
+    def __get_optional_number(self, config, key):
+        if config.get(key) == None:
+            return None
+
+        return self.__get_number(config, key)
+
+    def __get_optional_integer(self, config, key):
+        value = self.__get_optional_number(config, key)
+
+        if value != None and (not isinstance(value, int) or value < 1):
+            raise InvalidConfigException("\"{}\" must be a positive whole number".format(key))
+
+        return value
@@ -1,3 +1,7 @@
 # custom exception for when no sensors are detected
 class NoSensorsDetectedException(Exception):
+    pass
+
+# custom exception for when a config file is missing required settings or has invalid values
+class InvalidConfigException(Exception):
     pass
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+
+# writes the given data (str or bytes) to filepath so that a power cut leaves either
+# the old file or the new one, never a truncated mix: the data goes to a temp file
+# next to it, is fsynced, and then renamed over the old file
+def write_file_atomically(filepath, data):
+    temp_filepath = filepath + ".tmp"
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+
+    with open(temp_filepath, mode) as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+
+    os.replace(temp_filepath, filepath)
+    _fsync_directory(os.path.dirname(filepath))
+
+# makes the rename itself durable. not every platform can open a directory to fsync it
+def _fsync_directory(directory):
+    try:
+        directory_descriptor = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(directory_descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_descriptor)
+
+# cuts a partially written last line (e.g. from a power cut mid-append) off the end
+# of a line based log, so appending to it again starts on a fresh line. returns the
+# number of bytes removed
+def truncate_partial_line(filepath, chunk_size=65536):
+    with open(filepath, 'rb+') as log_file:
+        end = log_file.seek(0, os.SEEK_END)
+        position = end
+
+        while position > 0:
+            start = max(0, position - chunk_size)
+            log_file.seek(start)
+            chunk = log_file.read(position - start)
+            newline_index = chunk.rfind(b"\n")
+            if newline_index != -1:
+                position = start + newline_index + 1
+                break
+            position = start
+
+        if position < end:
+            log_file.truncate(position)
+
+        return end - position
@@ -0,0 +1,69 @@
+import struct
+
+# compact binary frames for streaming readings from a logger to the aggregator.
+# every frame is length-prefixed, and holds the readings of one poll of one node:
+#
+# frame:   length (uint32) | body
+# body:    version (uint8) | node name length (uint8) | node name (utf-8)
+#          | run start (float64, epoch seconds) | sequence (uint32)
+#          | reading count (uint16) | readings
+# reading: sensor id length (uint8) | sensor id (ascii) | timestamp (float64, epoch seconds)
+#          | temp (int16, hundredths of a degree F) | status (uint8)
+#
+# the run start and sequence let the aggregator drop frames it has already
+# stored when a spooled frame is replayed after a lost acknowledgement
+class FrameCodec:
+    VERSION = 1
+    LENGTH = struct.Struct("!I")
+    HEADER = struct.Struct("!dIH")
+    READING = struct.Struct("!dhB")
+    # maximum frame size accepted, so a bad peer cannot make the reader buffer without bound
+    MAXIMUM_FRAME_LENGTH = 1 << 20
+    # acknowledgement byte sent back for every frame stored
+    ACK = b"\x06"
+    STATUS_OK = 0
+    STATUS_ERROR = 1
+
+    # returns a length-prefixed frame for the given readings, a list of
+    # (sensor_id, epoch_timestamp, temp_in_fahrenheit, status) tuples
+    @classmethod
+    def encode(cls, node_name, run_start, sequence, readings):
+        node_name_bytes = node_name.encode("utf-8")[:255]
+        parts = [
+            bytes((cls.VERSION, len(node_name_bytes))),
+            node_name_bytes,
+            cls.HEADER.pack(run_start, sequence, len(readings))
+        ]
+
+        for sensor_id, timestamp, temp, status in readings:
+            sensor_id_bytes = sensor_id.encode("ascii")
+            parts.append(bytes((len(sensor_id_bytes),)))
+            parts.append(sensor_id_bytes)
+            parts.append(cls.READING.pack(timestamp, int(round((temp or 0.0) * 100)), status))
+
+        body = b"".join(parts)
+        return cls.LENGTH.pack(len(body)) + body
+
+    # decodes a frame body (without its length prefix) into
+    # (node_name, run_start, sequence, readings)
+    @classmethod
+    def decode(cls, body):
+        version, node_name_length = body[0], body[1]
+        if version != cls.VERSION:
+            raise ValueError("unsupported frame version {}".format(version))
+
+        offset = 2 + node_name_length
+        node_name = body[2:offset].decode("utf-8")
+        run_start, sequence, reading_count = cls.HEADER.unpack_from(body, offset)
+        offset += cls.HEADER.size
+        readings = []
+
+        for _ in range(reading_count):
+            sensor_id_length = body[offset]
+            sensor_id = body[offset + 1:offset + 1 + sensor_id_length].decode("ascii")
+            offset += 1 + sensor_id_length
+            timestamp, centi_temp, status = cls.READING.unpack_from(body, offset)
+            offset += cls.READING.size
+            readings.append((sensor_id, timestamp, centi_temp / 100.0, status))
+
+        return node_name, run_start, sequence, readings
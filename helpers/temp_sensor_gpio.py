@@ -0,0 +1,13 @@
+import os
+
+# the GPIO module used throughout the project: RPi.GPIO on a Raspberry Pi, or
+# GpioStub only when FERM_GPIO_STUB=1 is set. a missing RPi.GPIO is an error
+# otherwise, as falling back to the stub would leave the LEDs and relays undriven
+# while the control loop reports them switching
+if os.environ.get("FERM_GPIO_STUB") == "1":
+    from helpers.temp_sensor_gpio_stub import GPIO
+else:
+    try:
+        import RPi.GPIO as GPIO
+    except ImportError as e:
+        raise ImportError("RPi.GPIO is not installed. Install it, or set FERM_GPIO_STUB=1 to run without driving any LEDs or relays.") from e
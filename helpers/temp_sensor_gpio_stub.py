@@ -0,0 +1,41 @@
+# stand-in for the RPi.GPIO module, for running the project off a Raspberry Pi
+# (e.g. against a SimulatedW1Bus). it keeps the last value written to each pin
+# and counts the calls made, so GPIO traffic can be measured
+class GpioStub:
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self):
+        self.mode = None
+        self.pin_modes = {}
+        self.pin_values = {}
+        self.output_calls = 0
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, initial=None):
+        self.pin_modes[pin] = mode
+        if initial != None:
+            self.pin_values[pin] = initial
+
+    def output(self, pin, value):
+        self.output_calls += 1
+        self.pin_values[pin] = value
+
+    def input(self, pin):
+        return self.pin_values.get(pin, self.LOW)
+
+    def cleanup(self):
+        self.pin_modes = {}
+        self.pin_values = {}
+
+
+GPIO = GpioStub()
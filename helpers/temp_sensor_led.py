@@ -1,12 +1,30 @@
-import RPi.GPIO as GPIO
+from helpers.temp_sensor_gpio import GPIO
 
+# the led is edge triggered: it remembers the value last written to each pin and
+# only writes the pins that change, so a status that holds costs no GPIO traffic
 class RgbLed:
+    # (red, green, blue) outputs per temp status
+    # 0 = on
+    # 1 = off
+    COLORS = {
+        # WHITE
+        "ABOVE": (0, 0, 0),
+        # BLUE
+        "BELOW": (1, 1, 0),
+        # GREEN
+        "WITHIN": (1, 0, 1),
+        # RED
+        "ERROR": (0, 1, 1)
+    }
+    OFF = (1, 1, 1)
+
     def __init__(self, pins):
         GPIO.setmode(GPIO.BOARD)
 
         self.RED_PIN = pins["red"]
         self.GREEN_PIN = pins["green"]
         self.BLUE_PIN = pins["blue"]
+        self.__outputs = (None, None, None)
 
         self.__setup_pins()
     
@@ -21,26 +39,20 @@ class RgbLed:
     def __update_gpio_output(self, red_output, green_output, blue_output):
         # 0 = on
         # 1 = off
+        outputs = (red_output, green_output, blue_output)
+
+        for pin, output, last_output in zip((self.RED_PIN, self.GREEN_PIN, self.BLUE_PIN), outputs, self.__outputs):
+            if output != last_output:
+                GPIO.output(pin, output)
 
-        GPIO.output(self.RED_PIN, red_output)
-        GPIO.output(self.GREEN_PIN, green_output)
-        GPIO.output(self.BLUE_PIN, blue_output)
+        self.__outputs = outputs
 
+    # sets the led to the color of the given temp status (one of COLORS)
     def update_color(self, temp_status):
-        status = temp_status.upper()
-
-        if status == "ABOVE":
-            # set LED color to WHITE
-            self.__update_gpio_output(0, 0, 0)
-        elif status == "BELOW":
-            # set LED color to BLUE
-            self.__update_gpio_output(1, 1, 0)
-        elif status == "WITHIN":
-            # set LED color to GREEN
-            self.__update_gpio_output(1, 0, 1)
-        elif status == "ERROR":
-            # set LED color to RED
-            self.__update_gpio_output(0, 1, 1)
-        else:
+        outputs = self.COLORS.get(temp_status)
+
+        if outputs == None:
             print("\n!!!!!!!!!!\n-> ERROR: Unknown temp status command.\n-> Turning LEDs off.\n!!!!!!!!!!\n")
-            self.__update_gpio_output(1, 1, 1)
+            outputs = self.OFF
+
+        self.__update_gpio_output(*outputs)
@@ -0,0 +1,138 @@
+import sys
+import json
+import time
+import logging
+import threading
+
+# the console output of a run goes through the logging module, under loggers named
+# ferm_temp_tracker.<module> (see get_logger), at one of three output modes:
+# - verbose: everything, as it has always been printed (each sensor's full reading
+#   block every poll, each retry, ...) plus a one line summary of each poll
+# - summary: one structured line per poll, and any warnings and errors
+# - quiet: only warnings and errors, as structured lines
+# structured lines are key=value pairs (logfmt), e.g.
+# time=2018-12-17T16:43:02 level=warning logger=temp_sensor sensor=FV1 msg="..."
+# warnings and errors repeating the same message (for the same sensor) are only written
+# once every repeated_message_interval seconds, with a count of the ones left out
+LOGGER_NAME = "ferm_temp_tracker"
+VERBOSE = "verbose"
+SUMMARY = "summary"
+QUIET = "quiet"
+OUTPUT_MODES = (VERBOSE, SUMMARY, QUIET)
+LEVELS = {VERBOSE: logging.DEBUG, SUMMARY: logging.INFO, QUIET: logging.WARNING}
+
+def get_logger(name):
+    if len(logging.getLogger(LOGGER_NAME).handlers) < 1:
+        configure_logging()
+
+    return logging.getLogger("{}.{}".format(LOGGER_NAME, name))
+
+# (re)sets the output mode and how often repeated warnings are written (in seconds,
+# or None to write every one of them)
+def configure_logging(output_mode=VERBOSE, repeated_message_interval=300):
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    handler = StdoutHandler()
+    handler.setFormatter(VerboseFormatter() if output_mode == VERBOSE else StructuredFormatter())
+    if repeated_message_interval != None:
+        handler.addFilter(RepeatedMessageFilter(repeated_message_interval))
+
+    logger.addHandler(handler)
+    logger.setLevel(LEVELS[output_mode])
+    # the run's output stays on stdout, whatever else configures the root logger
+    logger.propagate = False
+
+
+# writes to whatever sys.stdout is when each record is written, like print() does,
+# so redirecting stdout (e.g. contextlib.redirect_stdout) still catches the output
+class StdoutHandler(logging.StreamHandler):
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, stream):
+        pass
+
+
+# writes records the way the rest of the program prints: "-> message", with "!! ->"
+# for warnings and "!!! ->" for errors, or as they are for records logged with
+# extra={"raw": True} (e.g. a sensor's multi-line reading block)
+class VerboseFormatter(logging.Formatter):
+    PREFIXES = {logging.WARNING: "!! -> ", logging.ERROR: "!!! -> ", logging.CRITICAL: "!!! -> "}
+
+    def format(self, record):
+        message = record.getMessage()
+
+        if getattr(record, "raw", False):
+            return message
+
+        if getattr(record, "suppressed", 0) > 0:
+            message += " ({} more like this left out)".format(record.suppressed)
+
+        return self.PREFIXES.get(record.levelno, "-> ") + message
+
+
+# writes each record as one line of key=value pairs: time, level, logger, the sensor
+# (from extra={"sensor": name}), the message, any extra={"fields": {...}} and how many
+# repeats of it were left out
+class StructuredFormatter(logging.Formatter):
+    def format(self, record):
+        pairs = [
+            ("time", time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))),
+            ("level", record.levelname.lower()),
+            ("logger", record.name[len(LOGGER_NAME) + 1:] if record.name.startswith(LOGGER_NAME + ".") else record.name)
+        ]
+        if getattr(record, "sensor", None) != None:
+            pairs.append(("sensor", record.sensor))
+        pairs.append(("msg", record.getMessage()))
+        pairs.extend(getattr(record, "fields", {}).items())
+        if getattr(record, "suppressed", 0) > 0:
+            pairs.append(("suppressed", record.suppressed))
+
+        return " ".join("{}={}".format(key, _format_value(value)) for key, value in pairs)
+
+
+# lets a warning or error through at most once per interval seconds for each message
+# (the unformatted message, so only its values may differ) and sensor, and tags the
+# next one let through with how many were left out in between. records logged with
+# extra={"rate_limited": False} are always let through
+class RepeatedMessageFilter(logging.Filter):
+    def __init__(self, interval):
+        super().__init__()
+        self.INTERVAL = interval
+        self.LOCK = threading.Lock()
+        # (logger name, message, sensor) -> [monotonic time last let through, repeats left out since]
+        self.__latest_messages = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or not getattr(record, "rate_limited", True):
+            return True
+
+        key = (record.name, record.msg, getattr(record, "sensor", None))
+        now = time.monotonic()
+
+        with self.LOCK:
+            latest_message = self.__latest_messages.get(key)
+            if latest_message != None and now - latest_message[0] < self.INTERVAL:
+                latest_message[1] += 1
+                return False
+
+            record.suppressed = latest_message[1] if latest_message != None else 0
+            self.__latest_messages[key] = [now, 0]
+
+        return True
+
+
+# numbers and plain words as they are, anything else as a quoted json string
+def _format_value(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+
+    text = str(value)
+    if text == "" or any(character in text for character in " =\"\n\\"):
+        return json.dumps(text)
+
+    return text
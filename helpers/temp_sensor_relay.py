@@ -0,0 +1,56 @@
+from helpers.temp_sensor_gpio import GPIO
+
+# a relay on a GPIO pin (e.g. a glycol valve or a heat wrap), switched on and off by
+# a ControlChannel. like the led it is edge triggered, and it refuses to switch
+# until it has been on for minimum_on_time seconds or off for minimum_off_time
+# seconds, so a controller hovering at its set point cannot short cycle a glycol
+# pump or compressor. most relay boards switch on a LOW output, hence active_low
+class Relay:
+    def __init__(self, pin, minimum_on_time=0, minimum_off_time=0, active_low=True):
+        GPIO.setmode(GPIO.BOARD)
+
+        self.PIN = pin
+        self.MINIMUM_ON_TIME = minimum_on_time
+        self.MINIMUM_OFF_TIME = minimum_off_time
+        self.ACTIVE_LOW = active_low
+        self.is_on = False
+        self.switches = 0
+        self.seconds_on = 0.0
+        self.__switched_at = None
+        self.__updated_at = None
+
+        GPIO.setup(self.PIN, GPIO.OUT)
+        # default state is OFF
+        GPIO.output(self.PIN, self.__get_output(False))
+
+    # asks for the relay to be on or off at the given time (in seconds, from any
+    # monotonic clock) and returns whether it is on. a forced switch ignores the
+    # minimum on time, e.g. to turn everything off when the probe is lost
+    def set(self, on, now, force=False):
+        self.__add_seconds_on(now)
+
+        if on == self.is_on:
+            return self.is_on
+
+        if self.__switched_at != None and not force:
+            held_for = now - self.__switched_at
+            if held_for < (self.MINIMUM_ON_TIME if self.is_on else self.MINIMUM_OFF_TIME):
+                return self.is_on
+
+        GPIO.output(self.PIN, self.__get_output(on))
+        self.is_on = on
+        self.switches += 1
+        self.__switched_at = now
+        return self.is_on
+
+    # counts the time on since the last call, for the duty cycle
+    def __add_seconds_on(self, now):
+        if self.__updated_at != None and self.is_on:
+            self.seconds_on += now - self.__updated_at
+        self.__updated_at = now
+
+    def __get_output(self, on):
+        if self.ACTIVE_LOW:
+            return GPIO.LOW if on else GPIO.HIGH
+
+        return GPIO.HIGH if on else GPIO.LOW
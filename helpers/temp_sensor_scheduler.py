@@ -0,0 +1,97 @@
+import math
+import time
+
+# schedules polls on fixed ticks that line up with the wall clock (e.g. every
+# 2 minutes on the even minute), timed with time.monotonic() so the polls never
+# drift by however long each poll took. sensors can have their own polling rate,
+# as long as it is a whole number of seconds; ticks then fire on the greatest
+# common divisor of all the rates, and only the sensors that are due are polled
+class PollScheduler:
+    # polling_rate and the values of sensor_polling_rates (sensor id -> rate) are in seconds
+    def __init__(self, polling_rate, sensor_polling_rates=None):
+        self.POLLING_RATE = int(round(polling_rate))
+        self.SENSOR_POLLING_RATES = {
+            sensor_id: int(round(rate if rate != None else polling_rate))
+            for sensor_id, rate in (sensor_polling_rates or {}).items()
+        }
+        self.TICK = self.POLLING_RATE
+        for rate in self.SENSOR_POLLING_RATES.values():
+            self.TICK = math.gcd(self.TICK, rate)
+
+        # monotonic time of the next tick, and the wall clock tick number it stands for
+        self.__next_tick = None
+        self.__next_tick_number = None
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.__total_jitter = 0.0
+
+    # waits for the next tick and returns the ids of the sensors due on it
+    # (every sensor is due on the very first call, which returns straight away)
+    def wait_for_next_tick(self):
+        if self.__next_tick == None:
+            self.__start()
+            self.ticks += 1
+            return list(self.SENSOR_POLLING_RATES.keys())
+
+        now = time.monotonic()
+
+        # if the last poll ran past the tick it should have been woken for,
+        # record the overrun and skip ahead to the next tick still in the future
+        if now >= self.__next_tick:
+            missed_ticks = int((now - self.__next_tick) // self.TICK) + 1
+            self.overruns += 1
+            self.skipped_ticks += missed_ticks
+            self.__next_tick += missed_ticks * self.TICK
+            self.__next_tick_number += missed_ticks
+
+        while now < self.__next_tick:
+            time.sleep(self.__next_tick - now)
+            now = time.monotonic()
+
+        self.__record_jitter(now - self.__next_tick)
+        tick_number = self.__next_tick_number
+        self.__next_tick += self.TICK
+        self.__next_tick_number += 1
+        self.ticks += 1
+
+        return self.__get_due_sensor_ids(tick_number)
+
+    # lines the first tick up with the next whole multiple of the tick length since the
+    # epoch. the very first poll runs straight away, so an aligned tick less than half a
+    # tick after it is skipped rather than polling twice in quick succession (or
+    # counting the first poll running into it as an overrun)
+    def __start(self):
+        wall_now = time.time()
+        monotonic_now = time.monotonic()
+        self.__next_tick_number = math.floor(wall_now / self.TICK) + 1
+        self.__next_tick = monotonic_now + (self.__next_tick_number * self.TICK - wall_now)
+
+        if self.__next_tick - monotonic_now < self.TICK / 2:
+            self.__next_tick_number += 1
+            self.__next_tick += self.TICK
+
+    def __get_due_sensor_ids(self, tick_number):
+        tick_seconds = tick_number * self.TICK
+        return [
+            sensor_id for sensor_id, rate in self.SENSOR_POLLING_RATES.items()
+            if tick_seconds % rate == 0
+        ]
+
+    def __record_jitter(self, jitter):
+        self.last_jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.__total_jitter += jitter
+
+    # returns the poll timing metrics (jitter in seconds)
+    def get_metrics(self):
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "last_jitter": self.last_jitter,
+            "max_jitter": self.max_jitter,
+            "mean_jitter": self.__total_jitter / (self.ticks - 1) if self.ticks > 1 else 0.0
+        }
@@ -0,0 +1,277 @@
+import os
+import gzip
+import json
+import queue
+import threading
+from helpers.temp_sensor_files import write_file_atomically
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("segments")
+
+# each log directory (logs/csv, logs/json) holds a manifest of the segments written to
+# it, so a reader can tell which files hold the sensors and time range it wants
+# without opening any of them (see find_segments). it is json, under an extension of
+# its own so nothing takes it for a log
+MANIFEST_FILENAME = "ferm_temp_segments.manifest"
+COMPRESSED_EXTENSION = ".gz"
+
+# opens a log (compressed or not) for reading as text. a segment compressed since its
+# filepath was looked up is opened from its .gz file instead
+def open_log(filepath, newline=None):
+    if not filepath.endswith(COMPRESSED_EXTENSION) and not os.path.exists(filepath) and os.path.exists(filepath + COMPRESSED_EXTENSION):
+        filepath += COMPRESSED_EXTENSION
+
+    if filepath.endswith(COMPRESSED_EXTENSION):
+        return gzip.open(filepath, 'rt', newline=newline)
+
+    return open(filepath, 'r', newline=newline)
+
+# the extension of a log, whether it is compressed or not (e.g. .csv for x.csv.gz)
+def get_log_extension(filepath):
+    if filepath.endswith(COMPRESSED_EXTENSION):
+        filepath = filepath[:-len(COMPRESSED_EXTENSION)]
+
+    return os.path.splitext(filepath)[1]
+
+# returns the filepaths of the segments in a log directory holding readings of
+# sensor_id (or of any sensor) between start and end (epoch seconds, or None for no
+# bound), oldest first, going by the manifest alone
+def find_segments(directory, sensor_id=None, start=None, end=None):
+    return [os.path.join(directory, segment["filename"]) for segment in SegmentManifest(directory).get_segments(sensor_id, start, end)]
+
+
+# the manifest of one log directory: a list of segments, each a dict of
+#   filename, run (the name every segment of a run shares), index (1 for the first
+#   segment of a run), sensor_ids, first_timestamp, last_timestamp, rows, bytes (as
+#   written), closed (False while it is written to) and compressed
+# the manifest is rewritten atomically whenever a segment is opened, closed or
+# compressed, never per poll, so the bounds of a segment still being written to are
+# only known up to when it was opened
+class SegmentManifest:
+    def __init__(self, directory):
+        self.FILEPATH = os.path.join(directory, MANIFEST_FILENAME)
+        self.LOCK = threading.Lock()
+        self.segments = self.__read_file()
+
+    def __read_file(self):
+        try:
+            with open(self.FILEPATH, 'r') as manifest_file:
+                return json.load(manifest_file)["segments"]
+        except FileNotFoundError:
+            return []
+        except (ValueError, KeyError, TypeError) as e:
+            LOGGER.warning("Could not read the segment manifest %s (%s). Starting a new one.", self.FILEPATH, e)
+            return []
+
+    def get_segment(self, filename):
+        with self.LOCK:
+            return next((dict(segment) for segment in self.segments if segment["filename"] == filename), None)
+
+    # adds the segment, or updates the one it was (previous_filename, e.g. before it
+    # was compressed), and rewrites the manifest
+    def save_segment(self, segment, previous_filename=None):
+        filename = previous_filename or segment["filename"]
+
+        with self.LOCK:
+            index = next((index for index, saved_segment in enumerate(self.segments) if saved_segment["filename"] == filename), None)
+            if index == None:
+                self.segments.append(dict(segment))
+            else:
+                self.segments[index] = dict(segment)
+
+            write_file_atomically(self.FILEPATH, json.dumps({"segments": self.segments}, indent=1))
+
+    # the segments of a run, in order
+    def get_run(self, run):
+        with self.LOCK:
+            return sorted((dict(segment) for segment in self.segments if segment["run"] == run), key=lambda segment: segment["index"])
+
+    # the segments that may hold readings of sensor_id (or of any sensor) between start
+    # and end, oldest first. a segment still being written to is kept unless it
+    # started after end
+    def get_segments(self, sensor_id=None, start=None, end=None):
+        with self.LOCK:
+            segments = [dict(segment) for segment in self.segments]
+
+        return sorted(
+            (
+                segment for segment in segments
+                if (sensor_id == None or not segment["closed"] or sensor_id in segment["sensor_ids"])
+                and (end == None or segment["first_timestamp"] == None or segment["first_timestamp"] <= end)
+                and (start == None or not segment["closed"] or segment["last_timestamp"] == None or segment["last_timestamp"] >= start)
+            ),
+            key=lambda segment: (segment["first_timestamp"] or 0, segment["run"], segment["index"])
+        )
+
+
+# splits a log into segments, rolling over to a new file once the one being written
+# is max_size bytes or holds max_age seconds of readings, and records each segment
+# in the directory's manifest. with compress, closed segments are gzipped on a
+# worker thread, so polls never wait on it. segments after a run's first are named
+# <run>.<index><extension>, e.g. ferm_temp_data_log_Dec-17-2018_04-32-56.2.csv
+# filename is the run's first segment, or the segment to carry on with when resuming.
+# read_rows(filepath) yields the (sensor id, timestamp) of each reading in a segment,
+# to rebuild its entry when it is resumed or was left open by a crash
+class LogSegmenter:
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, directory, filename, max_size=None, max_age=None, compress=False, read_rows=None):
+        self.DIRECTORY = directory
+        self.MAX_SIZE = max_size
+        self.MAX_AGE = max_age
+        self.COMPRESS = compress
+        self.READ_ROWS = read_rows
+        self.MANIFEST = SegmentManifest(directory)
+        self.__compression_queue = None
+        self.__compression_thread = None
+
+        segment = self.MANIFEST.get_segment(filename)
+        stem, self.EXTENSION = os.path.splitext(filename)
+        self.RUN = segment["run"] if segment != None else stem
+        self.__segment = self.__get_new_segment(filename, segment["index"] if segment != None else 1)
+
+        # a resumed segment's entry is rebuilt from the file, as it was last saved when opened
+        if os.path.exists(self.get_filepath()):
+            self.__read_segment(self.__segment)
+        self.MANIFEST.save_segment(self.__segment)
+        self.__close_stale_segments()
+
+    def __get_new_segment(self, filename, index):
+        return {
+            "filename": filename,
+            "run": self.RUN,
+            "index": index,
+            "sensor_ids": [],
+            "first_timestamp": None,
+            "last_timestamp": None,
+            "rows": 0,
+            "bytes": 0,
+            "closed": False,
+            "compressed": False
+        }
+
+    def __read_segment(self, segment):
+        sensor_ids = set()
+        segment.update({"first_timestamp": None, "last_timestamp": None, "rows": 0})
+
+        for sensor_id, timestamp in self.READ_ROWS(os.path.join(self.DIRECTORY, segment["filename"])) if self.READ_ROWS != None else ():
+            sensor_ids.add(sensor_id)
+            self.__add_row(segment, timestamp)
+
+        segment["sensor_ids"] = sorted(sensor_ids)
+        segment["bytes"] = os.path.getsize(os.path.join(self.DIRECTORY, segment["filename"]))
+
+    # closes the segments left open by a run that stopped without closing them (e.g. a
+    # power cut), and compresses the closed ones that are not yet
+    def __close_stale_segments(self):
+        for segment in self.MANIFEST.get_segments():
+            if segment["filename"] == self.__segment["filename"] or not os.path.exists(os.path.join(self.DIRECTORY, segment["filename"])):
+                continue
+
+            if not segment["closed"]:
+                self.__read_segment(segment)
+                segment["closed"] = True
+                self.MANIFEST.save_segment(segment)
+
+            if self.COMPRESS and not segment["compressed"]:
+                self.__queue_compression(segment)
+
+    # the filepath of the segment being written to
+    def get_filepath(self):
+        return os.path.join(self.DIRECTORY, self.__segment["filename"])
+
+    # the filepaths of every segment of this run, in order, ending with the one being written to
+    def get_run_filepaths(self):
+        return [os.path.join(self.DIRECTORY, segment["filename"]) for segment in self.MANIFEST.get_run(self.RUN)]
+
+    # counts a reading written to the current segment
+    def add_row(self, sensor_id, timestamp):
+        if sensor_id not in self.__segment["sensor_ids"]:
+            self.__segment["sensor_ids"].append(sensor_id)
+        self.__add_row(self.__segment, timestamp)
+
+    def __add_row(self, segment, timestamp):
+        if timestamp != None:
+            segment["first_timestamp"] = timestamp if segment["first_timestamp"] == None else min(segment["first_timestamp"], timestamp)
+            segment["last_timestamp"] = timestamp if segment["last_timestamp"] == None else max(segment["last_timestamp"], timestamp)
+        segment["rows"] += 1
+
+    # whether the next reading (taken at timestamp) should go to a new segment, with
+    # the current one at size bytes
+    def is_due(self, size, timestamp):
+        segment = self.__segment
+
+        if segment["rows"] < 1:
+            return False
+
+        return (self.MAX_SIZE != None and size >= self.MAX_SIZE) or (self.MAX_AGE != None and timestamp != None and segment["first_timestamp"] != None and timestamp - segment["first_timestamp"] >= self.MAX_AGE)
+
+    # closes the current segment (which the caller has already flushed and closed) and
+    # returns the filepath of the next one to write to
+    def roll(self):
+        closed_segment = self.__close_segment()
+        index = closed_segment["index"] + 1
+        self.__segment = self.__get_new_segment("{}.{}{}".format(self.RUN, index, self.EXTENSION), index)
+        self.MANIFEST.save_segment(self.__segment)
+
+        if self.COMPRESS:
+            self.__queue_compression(closed_segment)
+
+        LOGGER.debug("Rolled %s over to %s after %s rows.", closed_segment["filename"], self.__segment["filename"], closed_segment["rows"])
+        return self.get_filepath()
+
+    def __close_segment(self):
+        segment = self.__segment
+        segment["sensor_ids"] = sorted(segment["sensor_ids"])
+        segment["bytes"] = os.path.getsize(self.get_filepath()) if os.path.exists(self.get_filepath()) else 0
+        segment["closed"] = True
+        self.MANIFEST.save_segment(segment)
+        return dict(segment)
+
+    def __queue_compression(self, segment):
+        if self.__compression_thread == None:
+            self.__compression_queue = queue.Queue()
+            self.__compression_thread = threading.Thread(target=self.__compress_segments, name="temp_sensor_segments", daemon=True)
+            self.__compression_thread.start()
+
+        self.__compression_queue.put(segment)
+
+    def __compress_segments(self):
+        while True:
+            segment = self.__compression_queue.get()
+            if segment == None:
+                return
+
+            try:
+                self.__compress_segment(segment)
+            except Exception as e:
+                LOGGER.error("Could not compress log segment %s: %s", segment["filename"], e)
+
+    # gzips a closed segment next to it, and only removes the segment once the
+    # compressed copy is on disk and in the manifest
+    def __compress_segment(self, segment):
+        filepath = os.path.join(self.DIRECTORY, segment["filename"])
+        compressed_filepath = filepath + COMPRESSED_EXTENSION
+
+        with open(filepath, 'rb') as log_file:
+            write_file_atomically(compressed_filepath, gzip.compress(log_file.read(), self.COMPRESSION_LEVEL))
+
+        previous_filename = segment["filename"]
+        segment["filename"] = previous_filename + COMPRESSED_EXTENSION
+        segment["compressed"] = True
+        self.MANIFEST.save_segment(segment, previous_filename)
+        os.remove(filepath)
+        LOGGER.debug("Compressed %s from %s to %s bytes.", previous_filename, segment["bytes"], os.path.getsize(compressed_filepath))
+
+    # closes the current segment, which is left uncompressed so a resumed run can carry
+    # on with it, and waits for the segments queued for compression
+    def close(self):
+        if self.__segment["closed"]:
+            return
+
+        self.__close_segment()
+
+        if self.__compression_thread != None:
+            self.__compression_queue.put(None)
+            self.__compression_thread.join()
+            self.__compression_thread = None
@@ -0,0 +1,58 @@
+import math
+
+# a simulated fermenter to run the temp control against without a Pi (see the
+# control benchmark). the beer is one lumped thermal mass (temps in degrees F,
+# times in seconds) that:
+# - drifts towards the ambient temp over ambient_time_constant seconds
+# - warms while fermenting, most quickly (fermentation_peak_rate F per hour)
+#   fermentation_peak_time seconds in, tailing off over fermentation_width seconds
+# - is warmed by a heat wrap at heater_rate F per hour while the heater is on
+# - is cooled by a glycol jacket at cooler_rate F per hour while the valve is open,
+#   though the jacket takes jacket_time_constant seconds to cool down and warm up
+# the probe sits in a thermowell, so it lags the beer by probe_time_constant seconds.
+# step() can feed a SimulatedW1Bus probe, so the whole read path is exercised
+class SimulatedFermenter:
+    MAXIMUM_STEP = 5
+
+    def __init__(self, start_temp=68.0, ambient_temp=72.0, ambient_time_constant=20 * 3600, fermentation_peak_rate=1.5, fermentation_peak_time=36 * 3600, fermentation_width=24 * 3600, heater_rate=3.0, cooler_rate=6.0, jacket_time_constant=600, probe_time_constant=120):
+        self.AMBIENT_TEMP = ambient_temp
+        self.AMBIENT_TIME_CONSTANT = ambient_time_constant
+        self.FERMENTATION_PEAK_RATE = fermentation_peak_rate
+        self.FERMENTATION_PEAK_TIME = fermentation_peak_time
+        self.FERMENTATION_WIDTH = fermentation_width
+        self.HEATER_RATE = heater_rate
+        self.COOLER_RATE = cooler_rate
+        self.JACKET_TIME_CONSTANT = jacket_time_constant
+        self.PROBE_TIME_CONSTANT = probe_time_constant
+        self.elapsed = 0.0
+        self.beer_temp = start_temp
+        self.probe_temp = start_temp
+        # how far the jacket is towards full cooling, from 0 to 1
+        self.jacket_cooling = 0.0
+
+    # the heat the yeast gives off at the given time, in degrees F per hour
+    def get_fermentation_rate(self, elapsed):
+        return self.FERMENTATION_PEAK_RATE * math.exp(-((elapsed - self.FERMENTATION_PEAK_TIME) / self.FERMENTATION_WIDTH) ** 2)
+
+    # advances the simulation by the given number of seconds with the relays as given,
+    # and returns the temp the probe reads
+    def step(self, seconds, heater_on, cooler_on):
+        while seconds > 0:
+            dt = min(seconds, self.MAXIMUM_STEP)
+            self.jacket_cooling += ((1.0 if cooler_on else 0.0) - self.jacket_cooling) * dt / self.JACKET_TIME_CONSTANT
+
+            rate_per_hour = (
+                self.get_fermentation_rate(self.elapsed)
+                + (self.HEATER_RATE if heater_on else 0.0)
+                - self.COOLER_RATE * self.jacket_cooling
+            )
+            self.beer_temp += (self.AMBIENT_TEMP - self.beer_temp) * dt / self.AMBIENT_TIME_CONSTANT + rate_per_hour * dt / 3600
+            self.probe_temp += (self.beer_temp - self.probe_temp) * dt / self.PROBE_TIME_CONSTANT
+            self.elapsed += dt
+            seconds -= dt
+
+        return self.probe_temp
+
+    # the probe temp in Celsius, as a SimulatedW1Bus keeps it
+    def get_probe_temp_in_celsius(self):
+        return (self.probe_temp - 32.0) * 5.0 / 9.0
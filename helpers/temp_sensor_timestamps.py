@@ -0,0 +1,92 @@
+import time
+import datetime
+
+# readings carry their timestamp as seconds since the epoch (a float, as returned by
+# time.time()) everywhere in the data path: TempData, the csv/json/sqlite logs, the
+# export frames and the graph. timestamps are only formatted for people to read
+# where they are displayed, with format_timestamp()
+#
+# logs written before then hold local, 12 hour strings (e.g. Mon, Dec 17, 2018 04:43:02 PM),
+# which get_epoch_timestamp() and get_epoch_timestamps() convert
+
+LEGACY_DATETIME_FORMAT = "%a, %b %d, %Y %I:%M:%S %p"
+# layout of a legacy timestamp: every field is zero padded, so each one is always
+# found at the same characters
+LEGACY_TIMESTAMP_LENGTH = 29
+LEGACY_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+# formats an epoch timestamp as local time for display (e.g. Mon, Dec 17, 2018 04:43:02 PM)
+def format_timestamp(timestamp):
+    if timestamp == None:
+        return None
+
+    return datetime.datetime.fromtimestamp(timestamp).strftime(LEGACY_DATETIME_FORMAT)
+
+# converts a timestamp from any log into seconds since the epoch: epoch seconds
+# (as numbers, or as text from a csv log) are kept, legacy strings are parsed as local time
+def get_epoch_timestamp(timestamp):
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+
+    try:
+        return float(timestamp)
+    except ValueError:
+        return time.mktime(datetime.datetime.strptime(timestamp, LEGACY_DATETIME_FORMAT).timetuple())
+
+# converts a whole column of timestamps into seconds since the epoch at once, as a
+# numpy array. legacy strings are taken apart by character position instead of one
+# strptime() per reading, and the utc offset is only looked up once per distinct hour,
+# so a long log converts in a fraction of the time. without numpy (or for columns it
+# cannot take apart, e.g. written under another locale) a list is returned instead
+def get_epoch_timestamps(timestamps):
+    try:
+        import numpy
+    except ImportError:
+        return [get_epoch_timestamp(timestamp) for timestamp in timestamps]
+
+    values = numpy.asarray(timestamps)
+    if len(values) == 0 or values.dtype.kind in "iuf":
+        return values.astype(numpy.float64)
+
+    values = values.astype(str)
+    try:
+        return values.astype(numpy.float64)
+    except ValueError:
+        pass
+
+    if values.dtype.itemsize // 4 != LEGACY_TIMESTAMP_LENGTH or numpy.any(numpy.char.str_len(values) != LEGACY_TIMESTAMP_LENGTH):
+        return numpy.array([get_epoch_timestamp(timestamp) for timestamp in values], dtype=numpy.float64)
+
+    # one row of unicode code points per timestamp
+    characters = values.view(numpy.uint32).reshape(-1, LEGACY_TIMESTAMP_LENGTH)
+
+    def get_number(start, end):
+        digits = characters[:, start:end].astype(numpy.int64) - ord("0")
+        return digits @ (10 ** numpy.arange(end - start - 1, -1, -1))
+
+    month_names = numpy.array(LEGACY_MONTHS).view(numpy.uint32).reshape(-1, 3)
+    month_matches = numpy.all(characters[:, None, 5:8] == month_names[None, :, :], axis=2)
+    if not numpy.all(month_matches.any(axis=1)):
+        return numpy.array([get_epoch_timestamp(timestamp) for timestamp in values], dtype=numpy.float64)
+
+    months = month_matches.argmax(axis=1)
+    days = get_number(9, 11)
+    years = get_number(13, 17)
+    hours = get_number(18, 20) % 12 + numpy.where(characters[:, 27] == ord("P"), 12, 0)
+    minutes = get_number(21, 23)
+    seconds = get_number(24, 26)
+
+    dates = (years - 1970).astype("datetime64[Y]") + months.astype("timedelta64[M]")
+    dates = dates.astype("datetime64[D]") + (days - 1).astype("timedelta64[D]")
+    # the local time, counted as if it were utc
+    local_seconds = dates.astype(numpy.int64) * 86400 + hours * 3600 + minutes * 60 + seconds
+
+    # the local utc offset only changes on the hour (with daylight saving time), so
+    # it is looked up once per distinct hour
+    local_hours, hour_indexes = numpy.unique(local_seconds // 3600, return_inverse=True)
+    offsets = numpy.array([
+        local_hour * 3600 - time.mktime(time.gmtime(local_hour * 3600)[:8] + (-1,))
+        for local_hour in local_hours.tolist()
+    ])
+
+    return (local_seconds - offsets[hour_indexes.reshape(-1)]).astype(numpy.float64)
@@ -0,0 +1,135 @@
+import os
+import time
+
+# where the w1 kernel driver lists the 1-Wire devices
+W1_DEVICES_DIRECTORY = "/sys/bus/w1/devices"
+
+# class to represent the result of reading a w1_slave file: a status, and the
+# temperature in Celsius when the status is OK
+class W1Reading:
+    OK = "OK"
+    FILE_NOT_FOUND = "FILE NOT FOUND"
+    FILE_EMPTY = "FILE EMPTY"
+    MALFORMED = "MALFORMED DATA"
+    CRC_ERROR = "CRC CHECK FAILED"
+    POWER_ON_RESET = "POWER-ON RESET VALUE (85 C)"
+    DISCONNECTED = "DISCONNECTED (-127 C)"
+    OUT_OF_RANGE = "TEMP OUT OF RANGE"
+    # statuses that a probe can recover from, so are worth reading again
+    RETRYABLE_STATUSES = (MALFORMED, CRC_ERROR, POWER_ON_RESET, DISCONNECTED, OUT_OF_RANGE)
+
+    __slots__ = ("STATUS", "TEMP_IN_CELSIUS")
+
+    def __init__(self, status, temp_in_celsius=None):
+        self.STATUS = status
+        self.TEMP_IN_CELSIUS = temp_in_celsius
+
+    def is_retryable(self):
+        return self.STATUS in self.RETRYABLE_STATUSES
+
+
+# hex digit value of each ascii character code, or 0xFF if it is not a hex digit
+HEX_VALUES = bytes(
+    int(chr(code), 16) if chr(code) in "0123456789abcdefABCDEF" else 0xFF
+    for code in range(256)
+)
+
+# Dallas/Maxim (1-Wire) CRC-8 lookup table, polynomial x^8 + x^5 + x^4 + 1
+def _build_crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8C if crc & 0x01 else crc >> 1
+        table.append(crc)
+    return bytes(table)
+
+CRC8_TABLE = _build_crc8_table()
+
+# class to read a ds18b20 w1_slave file, e.g.
+# 72 01 4b 46 7f ff 0e 10 57 : crc=57 YES
+# 72 01 4b 46 7f ff 0e 10 57 t=23125
+# the file is read with a single os.read into a buffer that is reused between
+# reads, the crc of the 9 scratchpad bytes is checked here rather than trusted
+# from the YES/NO flag, and the temp is decoded straight from the scratchpad
+# reads counts the reads, and parse_seconds the time spent parsing them (see MetricsController)
+class W1SlaveParser:
+    BUFFER_SIZE = 128
+    SCRATCHPAD_LENGTH = 9
+    # raw scratchpad values (in 1/16 C) the probe reports when it has no real reading
+    POWER_ON_RESET_RAW = 85 * 16
+    DISCONNECTED_RAW = -127 * 16
+    MINIMUM_RAW = -55 * 16
+    MAXIMUM_RAW = 125 * 16
+
+    def __init__(self, filepath):
+        self.FILEPATH = filepath
+        self.__buffer = bytearray(self.BUFFER_SIZE)
+        self.__scratchpad = bytearray(self.SCRATCHPAD_LENGTH)
+        self.reads = 0
+        self.parse_seconds = 0.0
+
+    # reads and parses the w1_slave file, returning a W1Reading
+    def read(self):
+        self.reads += 1
+
+        try:
+            file_descriptor = os.open(self.FILEPATH, os.O_RDONLY)
+        except OSError:
+            return W1Reading(W1Reading.FILE_NOT_FOUND)
+
+        try:
+            length = os.readv(file_descriptor, [self.__buffer])
+        except OSError:
+            # sysfs answers a failed bus transaction with an I/O error
+            return W1Reading(W1Reading.MALFORMED)
+        finally:
+            os.close(file_descriptor)
+
+        start = time.perf_counter()
+        reading = self.parse(self.__buffer, length)
+        self.parse_seconds += time.perf_counter() - start
+
+        return reading
+
+    # parses the first length bytes of the given w1_slave contents
+    def parse(self, buffer, length):
+        if length == 0:
+            return W1Reading(W1Reading.FILE_EMPTY)
+
+        # the scratchpad is 9 hex bytes separated by spaces ("xx xx ... xx")
+        if length < self.SCRATCHPAD_LENGTH * 3 - 1:
+            return W1Reading(W1Reading.MALFORMED)
+
+        scratchpad = self.__scratchpad
+        crc = 0
+        for index in range(self.SCRATCHPAD_LENGTH):
+            high = HEX_VALUES[buffer[index * 3]]
+            low = HEX_VALUES[buffer[index * 3 + 1]]
+            if high == 0xFF or low == 0xFF:
+                return W1Reading(W1Reading.MALFORMED)
+            scratchpad[index] = (high << 4) | low
+            if index < self.SCRATCHPAD_LENGTH - 1:
+                crc = CRC8_TABLE[crc ^ scratchpad[index]]
+
+        # an all-zero scratchpad passes the crc, but is what a probe that lost
+        # power or its data line reads as
+        if crc != scratchpad[8] or not any(scratchpad):
+            return W1Reading(W1Reading.CRC_ERROR)
+
+        raw = scratchpad[0] | (scratchpad[1] << 8)
+        if raw & 0x8000:
+            raw -= 0x10000
+
+        # bits below the configured resolution (9-12 bits, config register bits 5-6) are undefined
+        resolution = 9 + ((scratchpad[4] >> 5) & 0x03)
+        raw &= ~((1 << (12 - resolution)) - 1)
+
+        if raw == self.POWER_ON_RESET_RAW:
+            return W1Reading(W1Reading.POWER_ON_RESET)
+        if raw == self.DISCONNECTED_RAW:
+            return W1Reading(W1Reading.DISCONNECTED)
+        if raw < self.MINIMUM_RAW or raw > self.MAXIMUM_RAW:
+            return W1Reading(W1Reading.OUT_OF_RANGE)
+
+        return W1Reading(W1Reading.OK, raw / 16.0)
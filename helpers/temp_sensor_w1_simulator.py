@@ -0,0 +1,201 @@
+import os
+import time
+import random
+import shutil
+import threading
+from helpers.temp_sensor_w1_parser import W1SlaveParser, CRC8_TABLE
+from helpers.temp_sensor_w1_therm import W1Therm
+
+# reads w1_slave files of a SimulatedW1Bus, waiting out the probe's conversion
+# time on every read and failing the crc on a share of the reads, like a real probe
+class SimulatedW1SlaveParser(W1SlaveParser):
+    CONVERSION_LATENCY = 0.75
+    CRC_FAILURE_RATE = 0.0
+    RANDOM = random.Random()
+    # the SimulatedW1Bus being read, which times the conversions when set
+    BUS = None
+
+    def __init__(self, filepath):
+        super().__init__(filepath)
+        self.SENSOR_ID = os.path.basename(os.path.dirname(filepath))
+
+    def read(self):
+        if self.BUS != None:
+            self.BUS.convert(self.SENSOR_ID)
+        elif self.CONVERSION_LATENCY > 0:
+            time.sleep(self.CONVERSION_LATENCY)
+
+        return super().read()
+
+    def parse(self, buffer, length):
+        if length > 0 and self.RANDOM.random() < self.CRC_FAILURE_RATE:
+            # flip a bit of the first scratchpad byte, which the crc check will catch
+            buffer[1] = ord("0") if buffer[1] != ord("0") else ord("1")
+
+        return super().parse(buffer, length)
+
+
+# stands in for W1Therm on a SimulatedW1Bus (see SimulatedW1Bus.get_therm_class())
+class SimulatedW1Therm(W1Therm):
+    BUS = None
+
+    def supports_bulk_conversion(self):
+        return True
+
+    def start_conversion(self):
+        self.BUS.start_bulk_conversion()
+        self.conversions += 1
+        return True
+
+    def wait_for_conversion(self, timeout=None):
+        deadline = time.monotonic() + (timeout if timeout != None else self.MAXIMUM_CONVERSION_TIME * 1.5)
+
+        while self.BUS.get_bulk_conversion_status() == self.CONVERTING:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.STATUS_CHECK_INTERVAL)
+
+        return True
+
+    def set_resolution(self, sensor_id, resolution):
+        if sensor_id not in self.BUS.temps:
+            print("!!! -> Could not set the resolution of sensor {} to {} bit: no such probe".format(sensor_id, resolution))
+            return False
+
+        self.BUS.set_resolution(sensor_id, resolution)
+        return True
+
+
+# generates and updates a fake /sys/bus/w1/devices tree holding the given number
+# of ds18b20 probes, for running the project (and benchmarks) without a Pi:
+# TempSensorController(..., w1_devices_directory=bus.DIRECTORY, w1_parser_class=bus.get_parser_class())
+# every update() moves each probe's temperature a little, and can make probes
+# disappear from (and come back to) the bus
+# like on a real bus master, one probe converts at a time unless a bulk conversion
+# (see W1Therm) starts them all at once: w1_parser_class=bus.get_parser_class(),
+# w1_therm_class=bus.get_therm_class()
+class SimulatedW1Bus:
+    BUS_MASTER = "w1_bus_master1"
+
+    # temps are in Celsius; rates are chances (0-1) per read (crc failures)
+    # or per update() (disappearing and reappearing probes)
+    def __init__(self, directory, number_of_sensors, conversion_latency=0.75, crc_failure_rate=0.0, disappearance_rate=0.0, reappearance_rate=0.5, start_temp=18.0, seed=None):
+        self.DIRECTORY = directory
+        self.CONVERSION_LATENCY = conversion_latency
+        self.CRC_FAILURE_RATE = crc_failure_rate
+        self.DISAPPEARANCE_RATE = disappearance_rate
+        self.REAPPEARANCE_RATE = reappearance_rate
+        self.RANDOM = random.Random(seed)
+        self.SENSOR_IDS = ["28-{:012x}".format(0x0316a2790000 + index) for index in range(number_of_sensors)]
+        self.temps = {sensor_id: start_temp + self.RANDOM.uniform(-2, 2) for sensor_id in self.SENSOR_IDS}
+        self.resolutions = {sensor_id: W1Therm.RESOLUTIONS[-1] for sensor_id in self.SENSOR_IDS}
+        self.missing_sensor_ids = set()
+        # held while a probe converts, as the bus master only talks to one probe at a time
+        self.LOCK = threading.Lock()
+        # the probes whose result from the last bulk conversion has not been read yet
+        self.bulk_converted_ids = set()
+        self.bulk_conversion_done_at = 0
+
+        os.makedirs(os.path.join(self.DIRECTORY, self.BUS_MASTER), exist_ok=True)
+        for sensor_id in self.SENSOR_IDS:
+            self.__write_sensor(sensor_id)
+
+    # returns a W1SlaveParser class that reads this bus with its latency and crc failures
+    def get_parser_class(self):
+        return type("SimulatedW1SlaveParser", (SimulatedW1SlaveParser,), {
+            "CONVERSION_LATENCY": self.CONVERSION_LATENCY,
+            "CRC_FAILURE_RATE": self.CRC_FAILURE_RATE,
+            "RANDOM": self.RANDOM,
+            "BUS": self
+        })
+
+    # returns a W1Therm class that bulk converts and sets resolutions on this bus
+    def get_therm_class(self):
+        return type("SimulatedW1Therm", (SimulatedW1Therm,), {"BUS": self})
+
+    # waits out the probe's conversion for a w1_slave read, unless it still has the
+    # result of a bulk conversion to hand out
+    def convert(self, sensor_id):
+        with self.LOCK:
+            if sensor_id in self.bulk_converted_ids:
+                self.bulk_converted_ids.discard(sensor_id)
+                conversion_time = self.bulk_conversion_done_at - time.monotonic()
+            else:
+                conversion_time = self.__get_conversion_time(sensor_id)
+
+            if conversion_time > 0:
+                time.sleep(conversion_time)
+
+    # starts every probe on the bus converting at once, like a write to therm_bulk_read
+    def start_bulk_conversion(self):
+        with self.LOCK:
+            self.bulk_converted_ids = set(self.SENSOR_IDS) - self.missing_sensor_ids
+            self.bulk_conversion_done_at = time.monotonic() + max([self.__get_conversion_time(sensor_id) for sensor_id in self.bulk_converted_ids] + [0])
+
+    # what reading therm_bulk_read gives (see W1Therm.CONVERTING)
+    def get_bulk_conversion_status(self):
+        with self.LOCK:
+            if len(self.bulk_converted_ids) < 1:
+                return 0
+            return W1Therm.CONVERTING if time.monotonic() < self.bulk_conversion_done_at else 1
+
+    # sets a probe's resolution (9-12 bit), which its readings and conversion time follow
+    def set_resolution(self, sensor_id, resolution):
+        self.resolutions[sensor_id] = resolution
+        if sensor_id not in self.missing_sensor_ids:
+            self.__write_sensor(sensor_id)
+
+    def __get_conversion_time(self, sensor_id):
+        # halves for every bit of resolution below 12
+        return self.CONVERSION_LATENCY / 2 ** (W1Therm.RESOLUTIONS[-1] - self.resolutions[sensor_id])
+
+    # advances the simulation by one step
+    def update(self):
+        for sensor_id in self.SENSOR_IDS:
+            if sensor_id in self.missing_sensor_ids:
+                if self.RANDOM.random() < self.REAPPEARANCE_RATE:
+                    self.missing_sensor_ids.discard(sensor_id)
+                    self.__write_sensor(sensor_id)
+                continue
+
+            if self.RANDOM.random() < self.DISAPPEARANCE_RATE:
+                self.missing_sensor_ids.add(sensor_id)
+                shutil.rmtree(os.path.join(self.DIRECTORY, sensor_id), ignore_errors=True)
+                continue
+
+            self.temps[sensor_id] += self.RANDOM.choice((-0.0625, 0.0, 0.0625))
+            self.__write_sensor(sensor_id)
+
+    # sets a probe to the given temp (in Celsius), e.g. from a SimulatedFermenter,
+    # instead of letting update() wander it
+    def set_temp(self, sensor_id, temp_in_celsius):
+        self.temps[sensor_id] = temp_in_celsius
+        if sensor_id not in self.missing_sensor_ids:
+            self.__write_sensor(sensor_id)
+
+    def __write_sensor(self, sensor_id):
+        sensor_directory = os.path.join(self.DIRECTORY, sensor_id)
+        os.makedirs(sensor_directory, exist_ok=True)
+
+        with open(os.path.join(sensor_directory, "w1_slave"), "w") as w1_slave_file:
+            w1_slave_file.write(self.get_w1_slave_contents(self.temps[sensor_id], self.resolutions[sensor_id]))
+
+    # returns the w1_slave file contents a ds18b20 at the given resolution reports for the given temp
+    @staticmethod
+    def get_w1_slave_contents(temp_in_celsius, resolution=12):
+        # bits below the resolution are left undefined (zero here), and the resolution
+        # is set in bits 5-6 of the config register
+        raw = int(round(temp_in_celsius * 16)) & 0xFFFF & ~((1 << (12 - resolution)) - 1)
+        scratchpad = [raw & 0xFF, raw >> 8, 0x4B, 0x46, ((resolution - 9) << 5) | 0x1F, 0xFF, 0x0C, 0x10]
+        crc = 0
+        for byte in scratchpad:
+            crc = CRC8_TABLE[crc ^ byte]
+        scratchpad.append(crc)
+        hex_bytes = " ".join("{:02x}".format(byte) for byte in scratchpad)
+        temp = raw - 0x10000 if raw & 0x8000 else raw
+
+        return "{} : crc={:02x} YES\n{} t={}\n".format(hex_bytes, crc, hex_bytes, temp * 1000 // 16)
+
+    # removes the whole simulated tree
+    def remove(self):
+        shutil.rmtree(self.DIRECTORY, ignore_errors=True)
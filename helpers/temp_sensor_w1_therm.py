@@ -0,0 +1,86 @@
+import os
+import glob
+import time
+from helpers.temp_sensor_w1_parser import W1_DEVICES_DIRECTORY
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("w1_therm")
+
+# class to use the bus-wide features of the kernel's w1_therm driver (Linux 5.10+)
+# through sysfs, rather than reading one w1_slave file at a time:
+# - start_conversion() writes "trigger" to every bus master's therm_bulk_read, so every
+#   probe on the bus converts at the same time. each probe's next w1_slave read returns
+#   the result of that conversion straight away instead of starting its own, so a poll
+#   costs one conversion (~750 ms at 12 bit) rather than one per probe
+# - set_resolution() sets a probe's resolution from 9 bit (0.5 C steps, ~94 ms to
+#   convert) to 12 bit (0.0625 C steps, ~750 ms to convert)
+# see SimulatedW1Bus.get_therm_class() for a stand-in that drives a simulated bus
+class W1Therm:
+    BUS_MASTER_PATTERN = "w1_bus_master*"
+    BULK_READ_FILENAME = "therm_bulk_read"
+    RESOLUTION_FILENAME = "resolution"
+    RESOLUTIONS = (9, 10, 11, 12)
+    # how long a ds18b20 takes to convert at 12 bit, in seconds. every bit less halves it
+    MAXIMUM_CONVERSION_TIME = 0.75
+    # therm_bulk_read reads -1 while any probe on the bus is still converting, 1 once
+    # they are done but not every result has been read, and 0 otherwise
+    CONVERTING = -1
+    STATUS_CHECK_INTERVAL = 0.01
+
+    def __init__(self, directory=W1_DEVICES_DIRECTORY):
+        self.DIRECTORY = directory
+        self.BULK_READ_FILES = sorted(glob.glob(os.path.join(self.DIRECTORY, self.BUS_MASTER_PATTERN, self.BULK_READ_FILENAME)))
+        self.conversions = 0
+
+    def supports_bulk_conversion(self):
+        return len(self.BULK_READ_FILES) > 0
+
+    # starts every probe on every bus converting at once. returns False if no bus
+    # master could be triggered, in which case each read converts on its own as usual
+    def start_conversion(self):
+        triggered = False
+
+        for filepath in self.BULK_READ_FILES:
+            try:
+                with open(filepath, 'w') as bulk_read_file:
+                    bulk_read_file.write("trigger\n")
+                triggered = True
+            except OSError as e:
+                LOGGER.error("Could not start a bulk conversion through %s: %s", filepath, e)
+
+        if triggered:
+            self.conversions += 1
+
+        return triggered
+
+    # waits until no probe is converting any more, for at most timeout seconds
+    # (by default half again a 12 bit conversion). returns whether the conversion finished
+    # a w1_slave read during a conversion waits for it anyway, so this only lets every
+    # probe be read back to back once their results are in
+    def wait_for_conversion(self, timeout=None):
+        deadline = time.monotonic() + (timeout if timeout != None else self.MAXIMUM_CONVERSION_TIME * 1.5)
+
+        while any(self.__get_status(filepath) == self.CONVERTING for filepath in self.BULK_READ_FILES):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.STATUS_CHECK_INTERVAL)
+
+        return True
+
+    def __get_status(self, filepath):
+        try:
+            with open(filepath, 'r') as bulk_read_file:
+                return int(bulk_read_file.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    # sets the probe's resolution (9-12 bit) until it is next powered off
+    def set_resolution(self, sensor_id, resolution):
+        try:
+            with open(os.path.join(self.DIRECTORY, sensor_id, self.RESOLUTION_FILENAME), 'w') as resolution_file:
+                resolution_file.write("{}\n".format(resolution))
+        except OSError as e:
+            print("!!! -> Could not set the resolution of sensor {} to {} bit: {}".format(sensor_id, resolution, e))
+            return False
+
+        return True
@@ -0,0 +1,133 @@
+import os
+import glob
+import select
+import ctypes
+import ctypes.util
+import threading
+from helpers.temp_sensor_w1_parser import W1_DEVICES_DIRECTORY
+
+# watches the w1 devices directory from a background thread for ds18b20 probes
+# (28-*) appearing and disappearing, so probes can be plugged in and out of a running
+# logger. the directory is watched with inotify (through libc, no extra packages)
+# where it is available, and rescanned every rescan_interval seconds regardless:
+# sysfs does not raise inotify events for every device change, and off Linux (or
+# against a SimulatedW1Bus on a filesystem without inotify) rescanning is all there is
+# the changes are collected until get_changes() is called (e.g. at the start of a
+# poll), so the sensors are only ever changed on the polling thread
+class W1DeviceWatcher:
+    SENSOR_PATTERN = "28*"
+    # inotify_init1() and inotify_add_watch() flags, from <sys/inotify.h>
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+
+    def __init__(self, directory=W1_DEVICES_DIRECTORY, rescan_interval=10):
+        self.DIRECTORY = directory
+        self.RESCAN_INTERVAL = rescan_interval
+        self.LOCK = threading.Lock()
+        self.device_ids = self.__scan()
+        self.rescans = 0
+        self.__added_ids = set()
+        self.__removed_ids = set()
+        self.__inotify_descriptor = self.__start_inotify()
+        self.USING_INOTIFY = self.__inotify_descriptor != None
+        # written to by close() to wake the watching thread straight away
+        self.__wake_reader, self.__wake_writer = os.pipe()
+        self.__stopped = False
+        self.__thread = None
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__watch, name="w1_device_watcher", daemon=True)
+        self.__thread.start()
+        print("-> Watching {} for probes being plugged in or out ({}).".format(
+            self.DIRECTORY,
+            "inotify, and rescanning every {} seconds".format(self.RESCAN_INTERVAL) if self.USING_INOTIFY else "rescanning every {} seconds".format(self.RESCAN_INTERVAL)
+        ))
+
+    # returns the sets of (added ids, removed ids) since the last call. a probe that
+    # came and went in between is in neither
+    def get_changes(self):
+        with self.LOCK:
+            changes = (self.__added_ids, self.__removed_ids)
+            self.__added_ids = set()
+            self.__removed_ids = set()
+
+        return changes
+
+    def __scan(self):
+        return {os.path.basename(path) for path in glob.glob(os.path.join(self.DIRECTORY, self.SENSOR_PATTERN))}
+
+    def __rescan(self):
+        device_ids = self.__scan()
+        self.rescans += 1
+
+        with self.LOCK:
+            for sensor_id in device_ids - self.device_ids:
+                if sensor_id in self.__removed_ids:
+                    self.__removed_ids.discard(sensor_id)
+                else:
+                    self.__added_ids.add(sensor_id)
+            for sensor_id in self.device_ids - device_ids:
+                if sensor_id in self.__added_ids:
+                    self.__added_ids.discard(sensor_id)
+                else:
+                    self.__removed_ids.add(sensor_id)
+            self.device_ids = device_ids
+
+    def __watch(self):
+        watched_descriptors = [self.__wake_reader]
+        if self.USING_INOTIFY:
+            watched_descriptors.append(self.__inotify_descriptor)
+
+        while not self.__stopped:
+            readable_descriptors, _, _ = select.select(watched_descriptors, [], [], self.RESCAN_INTERVAL)
+
+            if self.__stopped:
+                return
+
+            # the events themselves are not needed, only that something changed
+            if self.__inotify_descriptor in readable_descriptors:
+                self.__drain(self.__inotify_descriptor)
+
+            self.__rescan()
+
+    def __drain(self, descriptor):
+        try:
+            while len(os.read(descriptor, 4096)) > 0:
+                pass
+        except BlockingIOError:
+            pass
+
+    # returns a non blocking inotify descriptor watching the devices directory, or
+    # None if inotify cannot be used here
+    def __start_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError, TypeError):
+            return None
+
+        descriptor = inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if descriptor < 0:
+            return None
+
+        mask = self.IN_CREATE | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+        if inotify_add_watch(descriptor, os.fsencode(self.DIRECTORY), mask) < 0:
+            os.close(descriptor)
+            return None
+
+        return descriptor
+
+    def close(self):
+        self.__stopped = True
+        os.write(self.__wake_writer, b"\0")
+        if self.__thread != None:
+            self.__thread.join(timeout=1)
+
+        for descriptor in (self.__inotify_descriptor, self.__wake_reader, self.__wake_writer):
+            if descriptor != None:
+                os.close(descriptor)
@@ -1,36 +1,84 @@
+import os
 import time
 import datetime
 import sys
 sys.path.append("..")
 from helpers.temp_sensor_led import RgbLed
+from helpers.temp_sensor_w1_parser import W1SlaveParser, W1Reading, W1_DEVICES_DIRECTORY
+from models.temp_sensor_stats import RunningTempStats, TempDataRingBuffer
+from models.temp_sensor_alert import TempAlertStateMachine
+from helpers.temp_sensor_timestamps import format_timestamp
+from helpers.temp_sensor_logging import get_logger
+
+LOGGER = get_logger("temp_sensor")
 
 class TempSensor:
-    FILE_NOT_FOUND = "FILE NOT FOUND"
-    NO_SUCCESSFUL_TEMP = "NO SUCCESSFUL TEMP READING"
-    FILE_EMPTY = "FILE EMPTY"
+    MAX_READ_TRIES = 5
+    RETRY_DELAY = 2
+    # a probe that is lost (its w1_slave missing or empty), or fails
+    # MAXIMUM_CONSECUTIVE_ERRORS readings in a row after their retries, is quarantined:
+    # it is not read again (and its readings are logged as errors) for
+    # QUARANTINE_BACKOFF seconds, doubling after every failed retry up to
+    # MAXIMUM_QUARANTINE_BACKOFF, or until it is detected again on the bus
+    QUARANTINE_BACKOFF = 30
+    MAXIMUM_QUARANTINE_BACKOFF = 30 * 60
+    MAXIMUM_CONSECUTIVE_ERRORS = 3
+    LOST_STATUSES = (W1Reading.FILE_NOT_FOUND, W1Reading.FILE_EMPTY)
+    QUARANTINED = "QUARANTINED"
 
     # each sensor will be init'd with a user-given name, and an assigned position
     # based off of the sensor's directory id value, eg 28-0*
-    def __init__(self, name, position, id, target_temp, target_temp_positive_allowance, target_temp_negative_allowance, led_pins):
+    # only the latest reading is kept unless a history_capacity is given, in which case
+    # the most recent history_capacity readings are kept in a ring buffer
+    # polling_rate (in seconds) is only set if the sensor is polled at its own rate
+    # w1_devices_directory and w1_parser_class can be swapped out to read a simulated bus
+    # the led shows the alert state (see TempAlertStateMachine), which only changes past
+    # alert_hysteresis degrees inside the range and after alert_minimum_dwell seconds
+    # with a schedule (see TempSchedule), the target temp and allowances follow it from
+    # reading to reading, and the given ones are only used until the first reading
+    def __init__(self, name, position, id, target_temp, target_temp_positive_allowance, target_temp_negative_allowance, led_pins, history_capacity=None, polling_rate=None, w1_devices_directory=W1_DEVICES_DIRECTORY, w1_parser_class=W1SlaveParser, alert_hysteresis=0.0, alert_minimum_dwell=0, schedule=None):
         self.NAME = name
         self.POSITION = position
         self.ID = id
-        self.FILE = "/sys/bus/w1/devices/{}/w1_slave".format(self.ID)
+        self.FILE = os.path.join(w1_devices_directory, self.ID, "w1_slave")
+        self.W1_PARSER = w1_parser_class(self.FILE)
         self.ERROR = None
         self.TARGET_TEMP = target_temp
         self.TARGET_TEMP_POSITIVE_ALLOWANCE = target_temp_positive_allowance
         self.TARGET_TEMP_NEGATIVE_ALLOWANCE = target_temp_negative_allowance
+        self.POLLING_RATE = polling_rate
+        self.STATS = RunningTempStats()
+        self.ALERT = TempAlertStateMachine(target_temp, target_temp_positive_allowance, target_temp_negative_allowance, alert_hysteresis, alert_minimum_dwell)
+        # the alert event raised by the latest reading, if it changed the alert state
+        self.latest_alert_event = None
         self.highest_temp = None
         self.lowest_temp = None
-        self.above_target_temp_range = []
-        self.within_target_temp_range = []
-        self.below_target_temp_range = []
-        self.in_error_state = []
         self.percentage_spent_above_target_temp_range = None
         self.percentage_spent_within_target_temp_range = None
         self.percentage_spent_below_target_temp_range = None
         self.percentage_spent_in_error_state = None
-        self.recorded_temp_data = []
+        self.latest_temp_data = None
+        self.recorded_temp_data = TempDataRingBuffer(history_capacity) if history_capacity else None
+        # in time.monotonic() seconds, while quarantined
+        self.quarantined_until = None
+        self.__quarantine_backoff = self.QUARANTINE_BACKOFF
+        # error readings in a row, which quarantine a probe still on the bus once there
+        # are MAXIMUM_CONSECUTIVE_ERRORS of them
+        self.consecutive_errors = 0
+        self.schedule = None
+        # the index of the schedule step the latest reading was taken in
+        self.schedule_step = None
+        if schedule != None:
+            self.set_schedule(schedule, time.time())
+        # running counters for MetricsController: error readings, retried reads, and the
+        # seconds spent reading w1_slave (including parsing), sleeping between retries,
+        # classifying readings (stats and alert state) and updating the led
+        self.errors = 0
+        self.retries = 0
+        self.read_seconds = 0.0
+        self.retry_sleep_seconds = 0.0
+        self.classify_seconds = 0.0
+        self.gpio_seconds = 0.0
 
         if led_pins != None:
             self.LED = RgbLed(led_pins)
@@ -40,190 +88,270 @@ class TempSensor:
             self.HAS_LED = False
 
     def get_latest_recorded_temp_data(self):
-        if len(self.recorded_temp_data) > 0:
-            return self.recorded_temp_data[-1]
+        if self.latest_temp_data != None:
+            return self.latest_temp_data
         else:
             return TempData()
 
-    # will print out all recorded temp data for this sensor
+    # the sensor's running aggregates, alert state and latest reading as a json
+    # serializable dict, so a restarted run can carry on from them (see CheckpointController)
+    def get_checkpoint(self):
+        temp_data = self.latest_temp_data
+
+        return {
+            "stats": self.STATS.to_dict(),
+            "alert": self.ALERT.to_dict(),
+            "latest_temp_data": [temp_data.TIMESTAMP, temp_data.TEMP_IN_FAHRENHEIT] if temp_data != None else None,
+            "error": self.ERROR,
+            "schedule_start": self.schedule.start if self.schedule != None else None
+        }
+
+    # carries on from a dict made by get_checkpoint(). the readings kept in history
+    # (with a history_capacity) are not restored
+    def restore_checkpoint(self, checkpoint):
+        self.STATS = RunningTempStats.from_dict(checkpoint["stats"])
+        self.ALERT.restore(checkpoint["alert"])
+        self.ERROR = checkpoint["error"]
+        if checkpoint["latest_temp_data"] != None:
+            self.latest_temp_data = TempData(*checkpoint["latest_temp_data"])
+        # a schedule without a fixed start carries on from where the interrupted run was
+        if self.schedule != None and not self.schedule.HAS_FIXED_START and checkpoint.get("schedule_start") != None:
+            self.schedule.start = checkpoint["schedule_start"]
+
+        self.__update_aggregates()
+        self.__try_update_led(self.ALERT.state)
+
+    # will print out all recorded temp data kept for this sensor
     def print_all_recorded_temp_data(self):
         print("Recorded temp data for sensor named {} at position {}:".format(self.NAME, self.POSITION))
-        for data_set in self.recorded_temp_data:
-            print("timestamp: {}, temperature: {}".format(data_set.DATETIME, data_set.TEMP_IN_FAHRENHEIT))
+        for data_set in self.recorded_temp_data or [self.get_latest_recorded_temp_data()]:
+            print("timestamp: {}, temperature: {}".format(format_timestamp(data_set.TIMESTAMP), data_set.TEMP_IN_FAHRENHEIT))
 
     # gets the current temperature data in Fahrenheit, rounded to two decimal places,
     # at the time of the given timestamp (for consistency w/ other sensor readings)
-    def get_temp_at(self, timestamp):
-        raw_temp = self.__get_raw_temp_data()
+    # if a deadline (in time.monotonic() seconds) is given, retries stop once it would be passed
+    # a quarantined probe is not read at all, and one coming out of quarantine is only read once
+    def get_temp_at(self, timestamp, deadline=None):
+        if self.schedule != None:
+            self.__follow_schedule(timestamp)
+
+        if self.is_quarantined():
+            self.ERROR = self.__set_error(self.QUARANTINED)
+            self.errors += 1
+            self.__update_recorded_temp_data(timestamp, 0.0)
+            return
+
+        reading = self.__get_reading(deadline, retry=self.quarantined_until == None)
         # default temp data is 0.0 for an error state, only to be updated
         # below if a proper temp is found
         temp = 0.0
 
-        # if raw_temp is not empty and it contains a "t=" string (temp indicator)
-        if len(raw_temp) > 0 and raw_temp.find("t=") != -1:
-            # get the temp in celsius, then convert it to fahrenheit
-            temp_celsius = raw_temp[raw_temp.find("t=") + 2:]
-            temp_fahrenheit = round(self.__convert_temp_to_fahrenheit(temp_celsius), 2)
-
-            # if the temp in fahrenheit does not exceed 110 and is not 0.0, eg is not an error temp
-            # (ds18b20 probes return high 100 F temps when erring sometimes)
-            if temp_fahrenheit < 110 and temp_fahrenheit != 0.0:
-                # set the temp equal to the temp_fahrenheit
-                temp = temp_fahrenheit
-            else:
-                self.ERROR = self.__set_error(self.NO_SUCCESSFUL_TEMP)
-        
+        if reading.STATUS == W1Reading.OK:
+            self.ERROR = None
+            self.consecutive_errors = 0
+            temp = round(self.__convert_temp_to_fahrenheit(reading.TEMP_IN_CELSIUS), 2)
+            if self.quarantined_until != None:
+                self.release_quarantine()
+        else:
+            self.ERROR = self.__set_error(reading.STATUS)
+            self.errors += 1
+            self.consecutive_errors += 1
+            # a bad reading of a probe still on the bus (e.g. a crc failure) is retried as
+            # usual next poll, unless it keeps failing or is coming out of quarantine
+            if reading.STATUS in self.LOST_STATUSES or self.consecutive_errors >= self.MAXIMUM_CONSECUTIVE_ERRORS or self.quarantined_until != None:
+                self.quarantine()
+
         # update the recorded temp data array with the given timestamp and final temp
         self.__update_recorded_temp_data(timestamp, temp)
 
-    # extracts the raw temperature data from the associated w1_slave file
-    # or returns an empty array if the file cannot be found
-    def __get_raw_temp_data(self):
-        lines = self.__read_file()
-
-        # if there are lines, then the file was (at least) present
-        if len(lines) > 0:
-            # but we need to verify now that it is reading temps
-            # if the first line doesn't end in YES, then we
-            # have a sensor error of some sort, which could be
-            # an internal error in the probe, or a disconnect that
-            # happened outside of the ~90 second detection zone
-            if lines[0].strip()[-3:] != "YES":
-                print("\n!! -> Hmmm...sensor named {} at position {} is not reporting temperatures correctly.".format(self.NAME, self.POSITION))
-                tries = 1
-                max_tries = 5
-
-                # retry reading the file to see if a proper temp is reported
-                while tries <= max_tries:
-                    print("\n!! -> Attempting to read file again...attempt {} of {}".format(tries, max_tries))
-                    lines = self.__read_file()
-                    # if the file is still not empty
-                    if len(lines) > 0:
-                        # check again to see if a temp is being reported
-                        if lines[0].strip()[-3:] != "YES":
-                            # if not, increase our tries counter, wait a couple seconds,
-                            # then try again
-                            tries += 1
-                            time.sleep(2)
-                            continue
-                        # if we got a successful temp reported, return it
-                        else:
-                            print("\n----------\n-> File reading now successful for sensor named {} at position {}.\n-> Continuing...\n----------\n".format(self.NAME, self.POSITION))
-                            return lines[1]
-                    # if the file is now empty, return an empty array (error state)
-                    else:
-                        if self.ERROR == None:
-                            print("\n!! -> File for sensor named {} at position {}  may have been empty after retrying.\n!! -> Continuing with its temp reporting at 0.0 degrees F.".format(self.NAME, self.POSITION))
-                            self.ERROR = self.__set_error(self.FILE_EMPTY)
-                        return []
-                # if we were never successful in getting a temp reported
-                # and the file was never empty, return an empty array (error state)
-                if self.ERROR == None:
-                    print("\n!! -> Couldn't find a successful temp reading for sensor named {} at position {}.\n!! -> Continuing with its temp reporting at 0.0 degrees F.".format(self.NAME, self.POSITION))
-                    self.ERROR = self.__set_error(self.NO_SUCCESSFUL_TEMP)
-
-                return []
-            # if the file's first line ended in YES, it is reporting a temp reading
-            # return that reading for analysis
-            return lines[1]
-        # if the file was empty, return an empty array (error state)
-        else:
-            if self.ERROR == None:
-                print("\n!! -> File for sensor named {} at position {} was empty.\n!! -> Continuing with its temp reporting at 0.0 degrees F.".format(self.NAME, self.POSITION))
-                self.ERROR = self.__set_error(self.FILE_EMPTY)
-            
-            return []
-
-    # returns the lines from the associated w1_slave file
-    # or returns an empty array if the file cannot be found
-    def __read_file(self):
-        try:
-            with open(self.FILE, "r") as data_file:
-                self.ERROR = None
-                return data_file.readlines()
-        
-        except IOError:
-            print("\n!!!!!!!!!!" +
-                "\n-> Uh oh, file for sensor named {} at position {} no longer found.".format(self.NAME, self.POSITION) +
-                "\n-> Continuing with its temp reporting at 0.0 degrees F." +
-                "\n-> Please check its connections." +
-                "\n!!!!!!!!!!\n"
-            )
-            self.ERROR = self.__set_error(self.FILE_NOT_FOUND)
-
-            return []
+    # sets the target temp and allowances the readings are classified against
+    def set_target(self, target_temp, target_temp_positive_allowance, target_temp_negative_allowance):
+        self.TARGET_TEMP = target_temp
+        self.TARGET_TEMP_POSITIVE_ALLOWANCE = target_temp_positive_allowance
+        self.TARGET_TEMP_NEGATIVE_ALLOWANCE = target_temp_negative_allowance
+        self.ALERT.set_range(target_temp, target_temp_positive_allowance, target_temp_negative_allowance)
 
-    # converts the given temp Celsius to temp Fahrenheit
-    def __convert_temp_to_fahrenheit(self, temp):
-        temp_celsius = float(temp) / 1000.0
-        temp_fahrenheit = temp_celsius * 9.0 / 5.0 + 32.0
+    # follows the given schedule (or the fixed target again, with None) from the next
+    # reading on. a schedule without a fixed start takes the start of the schedule it
+    # replaces, so editing a running schedule does not restart it, or else timestamp
+    def set_schedule(self, schedule, timestamp):
+        if schedule != None and not schedule.HAS_FIXED_START:
+            schedule.start = self.schedule.start if self.schedule != None else timestamp
+
+        self.schedule = schedule
+        self.schedule_step = None
+
+    # the target temp at the given epoch timestamp, e.g. partway through a ramp
+    def get_target_temp_at(self, timestamp):
+        schedule = self.schedule
+        if schedule == None:
+            return self.TARGET_TEMP
+
+        return schedule.get_range_at(timestamp)[0]
+
+    def is_quarantined(self):
+        return self.quarantined_until != None and time.monotonic() < self.quarantined_until
+
+    # stops reading the probe for the current back off, which then doubles
+    def quarantine(self):
+        self.quarantined_until = time.monotonic() + self.__quarantine_backoff
+        LOGGER.warning("Quarantined sensor named %s at position %s for %s seconds.", self.NAME, self.POSITION, self.__quarantine_backoff, extra={"sensor": self.NAME})
+        self.__quarantine_backoff = min(self.__quarantine_backoff * 2, self.MAXIMUM_QUARANTINE_BACKOFF)
+
+    # reads the probe again from the next poll on, e.g. once it is back on the bus
+    def release_quarantine(self):
+        if self.quarantined_until != None:
+            LOGGER.info("Sensor named %s at position %s is back. Released it from quarantine.", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+        self.quarantined_until = None
+        self.__quarantine_backoff = self.QUARANTINE_BACKOFF
+        self.consecutive_errors = 0
+
+    # reads the associated w1_slave file, retrying while the probe reports something
+    # it may recover from (a failed crc, the 85 C power-on value, -127 C, etc.)
+    # unless retry is False
+    def __get_reading(self, deadline=None, retry=True):
+        reading = self.__read()
+
+        if reading.STATUS == W1Reading.FILE_NOT_FOUND:
+            LOGGER.warning("Uh oh, file for sensor named %s at position %s no longer found. Continuing with its temp reporting at 0.0 degrees F. Please check its connections.", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+            return reading
+
+        if reading.STATUS == W1Reading.FILE_EMPTY:
+            LOGGER.warning("File for sensor named %s at position %s was empty. Continuing with its temp reporting at 0.0 degrees F.", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+            return reading
 
-        return temp_fahrenheit
+        if not reading.is_retryable() or not retry:
+            return reading
 
-    # updates the recorded temp data list associated with this sensor, including a timestamp and
+        # the probe is present but not reporting temperatures correctly, which could be
+        # an internal error in the probe, or a disconnect that happened outside of the
+        # ~90 second detection zone
+        LOGGER.warning("Hmmm...sensor named %s at position %s is not reporting temperatures correctly (%s).", self.NAME, self.POSITION, reading.STATUS, extra={"sensor": self.NAME})
+        tries = 1
+        max_tries = self.MAX_READ_TRIES
+
+        # retry reading the file to see if a proper temp is reported
+        while tries <= max_tries:
+            LOGGER.debug("Attempting to read file again...attempt %s of %s", tries, max_tries, extra={"sensor": self.NAME})
+            self.retries += 1
+            reading = self.__read()
+
+            if reading.STATUS == W1Reading.OK:
+                LOGGER.debug("File reading now successful for sensor named %s at position %s. Continuing...", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+                return reading
+
+            # the file went missing or empty while retrying
+            if not reading.is_retryable():
+                LOGGER.warning("File for sensor named %s at position %s may have been %s after retrying. Continuing with its temp reporting at 0.0 degrees F.", self.NAME, self.POSITION, reading.STATUS.lower(), extra={"sensor": self.NAME})
+                return reading
+
+            tries += 1
+
+            # stop retrying if waiting again would miss this sensor's deadline
+            if deadline != None and time.monotonic() + self.RETRY_DELAY > deadline:
+                LOGGER.warning("Deadline reached for sensor named %s at position %s. Giving up on this reading.", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+                break
+
+            # wait a couple seconds, then try again
+            if tries <= max_tries:
+                start = time.perf_counter()
+                time.sleep(self.RETRY_DELAY)
+                self.retry_sleep_seconds += time.perf_counter() - start
+
+        # if we were never successful in getting a temp reported
+        LOGGER.warning("Couldn't find a successful temp reading for sensor named %s at position %s. Continuing with its temp reporting at 0.0 degrees F.", self.NAME, self.POSITION, extra={"sensor": self.NAME})
+        return reading
+
+    def __follow_schedule(self, timestamp):
+        target_temp, positive_allowance, negative_allowance, step = self.schedule.get_range_at(timestamp)
+
+        if (target_temp, positive_allowance, negative_allowance) != (self.TARGET_TEMP, self.TARGET_TEMP_POSITIVE_ALLOWANCE, self.TARGET_TEMP_NEGATIVE_ALLOWANCE):
+            self.set_target(target_temp, positive_allowance, negative_allowance)
+
+        if step != self.schedule_step:
+            self.schedule_step = step
+            LOGGER.info("Sensor named %s at position %s is on step %s of %s of its schedule (target %s F).", self.NAME, self.POSITION, step + 1, len(self.schedule.STEPS), self.schedule.STEPS[step]["target_temp"], extra={"sensor": self.NAME})
+
+    def __read(self):
+        start = time.perf_counter()
+        reading = self.W1_PARSER.read()
+        self.read_seconds += time.perf_counter() - start
+
+        return reading
+
+    # converts the given temp Celsius to temp Fahrenheit
+    def __convert_temp_to_fahrenheit(self, temp_celsius):
+        return temp_celsius * 9.0 / 5.0 + 32.0
+
+    # updates the recorded temp data associated with this sensor, including a timestamp and
     # temperature in Fahrenheit, rounded to two decimal places
     def __update_recorded_temp_data(self, timestamp, temp_fahrenheit):
-        self.recorded_temp_data.append(TempData(timestamp, temp_fahrenheit))
-        self.__update_percentage_spent_lists(temp_fahrenheit)
-
-        # if the temperature successfully recorded, also update highest/lowest
-        if temp_fahrenheit != 0.0:
-            self.__update_highest_and_lowest_temps(temp_fahrenheit)
-
-    def __update_highest_and_lowest_temps(self, latest_temp):
-        if self.highest_temp == None:
-            self.highest_temp = latest_temp
-        elif self.highest_temp < latest_temp:
-            self.highest_temp = latest_temp
-
-        if self.lowest_temp == None:
-            self.lowest_temp = latest_temp
-        elif self.lowest_temp > latest_temp:
-            self.lowest_temp = latest_temp
-
-    def __update_percentage_spent_lists(self, latest_temp):
-        total_entries = len(self.recorded_temp_data)
+        start = time.perf_counter()
+        self.latest_temp_data = TempData(timestamp, temp_fahrenheit)
+        if self.recorded_temp_data != None:
+            self.recorded_temp_data.append(self.latest_temp_data)
+
+        status = self.__get_temp_status(temp_fahrenheit)
+        self.STATS.add(temp_fahrenheit, status, timestamp)
+        self.__update_aggregates()
+        self.__update_alert(timestamp, temp_fahrenheit)
+        self.classify_seconds += time.perf_counter() - start
+
+        # the led only changes along with the alert state
+        if self.latest_alert_event != None:
+            self.__try_update_led(self.ALERT.state)
+
+    # feeds the reading to the alert state machine, and tags the event it raises
+    # (if the alert state changed) with this sensor
+    def __update_alert(self, timestamp, temp_fahrenheit):
+        self.latest_alert_event = self.ALERT.update(temp_fahrenheit, timestamp, self.ERROR != None)
+
+        if self.latest_alert_event != None:
+            self.latest_alert_event["sensor_id"] = self.ID
+            self.latest_alert_event["sensor_name"] = self.NAME
+
+    # classifies the given temp against the target temp range
+    def __get_temp_status(self, latest_temp):
         positive_range = self.TARGET_TEMP + self.TARGET_TEMP_POSITIVE_ALLOWANCE
         negative_range = self.TARGET_TEMP - self.TARGET_TEMP_NEGATIVE_ALLOWANCE
 
         # if the sensor is in an error state
-        if latest_temp == 0.0:
-            self.in_error_state.append(latest_temp)
-            self.__try_update_led("ERROR")
+        if self.ERROR != None:
+            return RunningTempStats.ERROR
         # if the temp is below the allowed minimum (target temp - negative allowance)
         elif latest_temp < negative_range:
-            self.below_target_temp_range.append(latest_temp)
-            self.__try_update_led("BELOW")
+            return RunningTempStats.BELOW
         # if the temp is above the allowed maximum (target temp + positive allowance)
         elif latest_temp > positive_range:
-            self.above_target_temp_range.append(latest_temp)
-            self.__try_update_led("ABOVE")
+            return RunningTempStats.ABOVE
         # if the temp is within the allowed range of temps
-        elif latest_temp >= negative_range and latest_temp <= positive_range:
-            self.within_target_temp_range.append(latest_temp)
-            self.__try_update_led("WITHIN")
-
-        below_entries = len(self.below_target_temp_range)
-        above_entries = len(self.above_target_temp_range)
-        within_entries = len(self.within_target_temp_range)
-        error_entries = len(self.in_error_state)
+        else:
+            return RunningTempStats.WITHIN
 
-        self.percentage_spent_below_target_temp_range = round(below_entries / total_entries * 100, 2)
-        self.percentage_spent_above_target_temp_range = round(above_entries / total_entries * 100, 2)
-        self.percentage_spent_within_target_temp_range = round(within_entries / total_entries * 100, 2)
-        self.percentage_spent_in_error_state = round(error_entries / total_entries * 100, 2)
+    # copies the running aggregates onto the sensor's reported fields
+    def __update_aggregates(self):
+        self.highest_temp = self.STATS.highest_temp
+        self.lowest_temp = self.STATS.lowest_temp
+        self.percentage_spent_below_target_temp_range = self.STATS.get_percentage(RunningTempStats.BELOW)
+        self.percentage_spent_above_target_temp_range = self.STATS.get_percentage(RunningTempStats.ABOVE)
+        self.percentage_spent_within_target_temp_range = self.STATS.get_percentage(RunningTempStats.WITHIN)
+        self.percentage_spent_in_error_state = self.STATS.get_percentage(RunningTempStats.ERROR)
 
     def __set_error(self, error_type):
         return "File error: {}.\nPlease check connections for this sensor.".format(error_type)
 
     def __try_update_led(self, color):
         if self.LED != None:
+            start = time.perf_counter()
             self.LED.update_color(color)
+            self.gpio_seconds += time.perf_counter() - start
 
 
-# class to represent a given temperature recording's data set, including a timestamp and
-# temperature in Fahrenheit, rounded to two decimal places
+# class to represent a given temperature recording's data set, including a timestamp
+# (in seconds since the epoch) and temperature in Fahrenheit, rounded to two decimal places
 class TempData:
-    def __init__(self, datetime = None, temp_in_fahrenheit = None):
-        self.DATETIME = datetime
+    __slots__ = ("TIMESTAMP", "TEMP_IN_FAHRENHEIT")
+
+    def __init__(self, timestamp = None, temp_in_fahrenheit = None):
+        self.TIMESTAMP = timestamp
         self.TEMP_IN_FAHRENHEIT = temp_in_fahrenheit
\ No newline at end of file
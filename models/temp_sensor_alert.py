@@ -0,0 +1,109 @@
+from models.temp_sensor_stats import RunningTempStats
+
+# per sensor alert state machine, fed every reading. unlike the status each reading
+# is counted under (see RunningTempStats), the alert state only changes:
+# - past a hysteresis band: once above (or below) the allowed range, the temp has to
+#   come back hysteresis degrees inside the range before the state is WITHIN again,
+#   so a probe sitting on the edge of the range does not flip state every poll
+# - after a minimum dwell: a new state has to hold for minimum_dwell seconds of
+#   readings before it is taken, so a single odd reading raises no alert
+# update() returns an event (a dict) only when the state changes
+class TempAlertStateMachine:
+    def __init__(self, target_temp, positive_allowance, negative_allowance, hysteresis=0.0, minimum_dwell=0):
+        self.HIGHEST_ALLOWED_TEMP = target_temp + positive_allowance
+        self.LOWEST_ALLOWED_TEMP = target_temp - negative_allowance
+        self.HYSTERESIS = hysteresis
+        self.MINIMUM_DWELL = minimum_dwell
+        self.state = RunningTempStats.WITHIN
+        self.state_since = None
+        self.transitions = 0
+        self.__pending_state = None
+        self.__pending_since = None
+        # the temp furthest outside the range (or the last temp, for errors) in the current state
+        self.__peak_temp = None
+
+    # takes the given reading (temp is ignored for an error reading) and returns the
+    # event for the state change it causes, if any
+    def update(self, temp, timestamp, is_error=False):
+        if self.state_since == None:
+            self.state_since = timestamp
+
+        candidate_state = self.__get_candidate_state(temp, is_error)
+
+        if candidate_state == self.state:
+            self.__pending_state = None
+            self.__update_peak_temp(temp, is_error)
+            return None
+
+        if candidate_state != self.__pending_state:
+            self.__pending_state = candidate_state
+            self.__pending_since = timestamp
+
+        if timestamp - self.__pending_since < self.MINIMUM_DWELL:
+            return None
+
+        event = {
+            "timestamp": timestamp,
+            "from_state": self.state,
+            "to_state": candidate_state,
+            "temp": None if is_error else temp,
+            "allowed_temp_range": "{}-{}".format(self.LOWEST_ALLOWED_TEMP, self.HIGHEST_ALLOWED_TEMP),
+            # how long the state that ended lasted, and its worst temp
+            "previous_state_seconds": round(self.__pending_since - self.state_since, 3),
+            "previous_peak_temp": self.__peak_temp
+        }
+
+        self.state = candidate_state
+        self.state_since = self.__pending_since
+        self.transitions += 1
+        self.__pending_state = None
+        self.__peak_temp = None
+        self.__update_peak_temp(temp, is_error)
+        return event
+
+    # moves the allowed range, e.g. as a schedule changes the target temp. the state
+    # is kept, and follows the new range from the next reading
+    def set_range(self, target_temp, positive_allowance, negative_allowance):
+        self.HIGHEST_ALLOWED_TEMP = target_temp + positive_allowance
+        self.LOWEST_ALLOWED_TEMP = target_temp - negative_allowance
+
+    # the state the reading points to, with the hysteresis band applied
+    def __get_candidate_state(self, temp, is_error):
+        if is_error:
+            return RunningTempStats.ERROR
+        if self.state == RunningTempStats.ABOVE and temp > self.HIGHEST_ALLOWED_TEMP - self.HYSTERESIS:
+            return RunningTempStats.ABOVE
+        if self.state == RunningTempStats.BELOW and temp < self.LOWEST_ALLOWED_TEMP + self.HYSTERESIS:
+            return RunningTempStats.BELOW
+        if temp > self.HIGHEST_ALLOWED_TEMP:
+            return RunningTempStats.ABOVE
+        if temp < self.LOWEST_ALLOWED_TEMP:
+            return RunningTempStats.BELOW
+
+        return RunningTempStats.WITHIN
+
+    # the current alert state as a json serializable dict, for checkpoints. a state
+    # change that was still waiting out its minimum dwell is not kept
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "state_since": self.state_since,
+            "transitions": self.transitions,
+            "peak_temp": self.__peak_temp
+        }
+
+    # takes back the alert state from a dict made by to_dict()
+    def restore(self, state):
+        self.state = state["state"]
+        self.state_since = state["state_since"]
+        self.transitions = state["transitions"]
+        self.__peak_temp = state["peak_temp"]
+        self.__pending_state = None
+        self.__pending_since = None
+
+    def __update_peak_temp(self, temp, is_error):
+        if is_error or self.state == RunningTempStats.WITHIN:
+            return
+
+        if self.__peak_temp == None or (temp > self.__peak_temp if self.state == RunningTempStats.ABOVE else temp < self.__peak_temp):
+            self.__peak_temp = temp
@@ -0,0 +1,87 @@
+# control laws for holding a vessel at its target temp. both are fed the latest temp
+# (in degrees F) and the time (in seconds) every control period, and return a demand
+# from -1 (full cooling) through 0 (idle) to 1 (full heating), which the relays of a
+# ControlChannel turn into on and off times
+
+# pid control on the error (target - temp), with:
+# - anti-windup: the integral is clamped to the output range, and stops growing while
+#   the output is saturated in the direction the error pushes it, so a long stall
+#   (e.g. the glycol chiller off) does not wind up hours of overshoot
+# - the derivative taken on the measurement rather than the error, so a changed
+#   target does not kick the output, and low pass filtered over derivative_filter
+#   seconds, as a ds18b20 only reports in 1/16 C steps
+class TempPidControl:
+    MINIMUM_OUTPUT = -1.0
+    MAXIMUM_OUTPUT = 1.0
+
+    # kp is per degree F, ki per degree F second and kd per degree F per second
+    def __init__(self, kp, ki=0.0, kd=0.0, derivative_filter=60):
+        self.KP = kp
+        self.KI = ki
+        self.KD = kd
+        self.DERIVATIVE_FILTER = derivative_filter
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.output = 0.0
+        self.__previous_temp = None
+        self.__previous_time = None
+
+    def update(self, temp, target_temp, now):
+        error = target_temp - temp
+        elapsed = now - self.__previous_time if self.__previous_time != None else 0.0
+
+        if elapsed > 0:
+            # filtered rate of change of the temp, in degrees F per second
+            rate = (temp - self.__previous_temp) / elapsed
+            smoothing = elapsed / (self.DERIVATIVE_FILTER + elapsed)
+            self.derivative += smoothing * (rate - self.derivative)
+
+        proportional = self.KP * error
+        derivative = -self.KD * self.derivative
+        integral = self.__clamp(self.integral + self.KI * error * elapsed)
+        output = proportional + integral + derivative
+
+        # only take the new integral if it does not push an already saturated output further
+        if (output > self.MAXIMUM_OUTPUT and error > 0) or (output < self.MINIMUM_OUTPUT and error < 0):
+            output = proportional + self.integral + derivative
+        else:
+            self.integral = integral
+
+        self.output = self.__clamp(output)
+        self.__previous_temp = temp
+        self.__previous_time = now
+        return self.output
+
+    # forgets the integral and the derivative, e.g. after the probe was lost for a while
+    def reset(self):
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.output = 0.0
+        self.__previous_temp = None
+        self.__previous_time = None
+
+    def __clamp(self, value):
+        return min(self.MAXIMUM_OUTPUT, max(self.MINIMUM_OUTPUT, value))
+
+
+# bang-bang control with a deadband: heats once the temp falls deadband degrees
+# below the target and cools once it rises deadband degrees above, and in both cases
+# keeps going until the temp is back at the target, like a fermentation chamber
+# thermostat. the demand is only ever -1, 0 or 1
+class TempDeadbandControl:
+    def __init__(self, deadband=0.5):
+        self.DEADBAND = deadband
+        self.output = 0.0
+
+    def update(self, temp, target_temp, now):
+        if temp < target_temp - self.DEADBAND:
+            self.output = 1.0
+        elif temp > target_temp + self.DEADBAND:
+            self.output = -1.0
+        elif (self.output > 0 and temp >= target_temp) or (self.output < 0 and temp <= target_temp):
+            self.output = 0.0
+
+        return self.output
+
+    def reset(self):
+        self.output = 0.0
@@ -0,0 +1,75 @@
+import bisect
+
+# a fermentation schedule for one sensor: a list of steps, each holding a target temp
+# (with its allowances) for a number of days, optionally after ramping to it from the
+# step before, e.g. 50 F for 5 days, a free rise to 60 F over 2 days held for 3, then
+# a crash to 34 F over 12 hours held until the end
+# each step is a dict of target_temp, positive_allowance, negative_allowance, days (None
+# holds the last step forever) and ramp_days, as validated by TempSensorConfig
+# the steps are turned into piecewise linear segments once, when the schedule is made,
+# so get_range_at() is a check of the segment the last lookup landed in (the next poll
+# nearly always lands in the same one), or a binary search of the segment starts
+# start is in epoch seconds. a schedule without one starts when it is first used
+# (see TempSensor.set_schedule), and then carries on across reloads and resumed runs
+class TempSchedule:
+    SECONDS_PER_DAY = 86400
+
+    def __init__(self, steps, start=None):
+        self.STEPS = steps
+        self.HAS_FIXED_START = start != None
+        self.start = start
+        # per segment: its start and end (in seconds from the start of the schedule), the
+        # target at its start, the target's change per second, its allowances and step
+        self.__segment_starts = []
+        self.__segment_ends = []
+        self.__start_temps = []
+        self.__slopes = []
+        self.__allowances = []
+        self.__step_indexes = []
+        self.__build_segments()
+        self.__latest_index = 0
+
+    def __build_segments(self):
+        offset = 0.0
+        previous_target_temp = None
+
+        for step_index, step in enumerate(self.STEPS):
+            allowances = (step["positive_allowance"], step["negative_allowance"])
+            ramp_seconds = step.get("ramp_days", 0) * self.SECONDS_PER_DAY
+
+            # the first step has nothing to ramp from
+            if ramp_seconds > 0 and previous_target_temp != None:
+                self.__add_segment(offset, offset + ramp_seconds, previous_target_temp, (step["target_temp"] - previous_target_temp) / ramp_seconds, allowances, step_index)
+                offset += ramp_seconds
+
+            hold_seconds = step["days"] * self.SECONDS_PER_DAY if step.get("days") != None else float("inf")
+            self.__add_segment(offset, offset + hold_seconds, step["target_temp"], 0.0, allowances, step_index)
+            offset += hold_seconds
+            previous_target_temp = step["target_temp"]
+
+        # the last target holds once the schedule is over
+        self.__segment_ends[-1] = float("inf")
+
+    def __add_segment(self, start, end, start_temp, slope, allowances, step_index):
+        self.__segment_starts.append(start)
+        self.__segment_ends.append(end)
+        self.__start_temps.append(start_temp)
+        self.__slopes.append(slope)
+        self.__allowances.append(allowances)
+        self.__step_indexes.append(step_index)
+
+    # returns (target temp, positive allowance, negative allowance, step index) at the
+    # given epoch timestamp. before the start, the first step's target applies
+    def get_range_at(self, timestamp):
+        offset = timestamp - self.start
+        # read once, as the control loop looks targets up from its own thread
+        index = self.__latest_index
+
+        if not self.__segment_starts[index] <= offset < self.__segment_ends[index]:
+            index = max(0, bisect.bisect_right(self.__segment_starts, offset) - 1)
+            self.__latest_index = index
+
+        target_temp = self.__start_temps[index] + self.__slopes[index] * max(0.0, offset - self.__segment_starts[index])
+        positive_allowance, negative_allowance = self.__allowances[index]
+
+        return round(target_temp, 2), positive_allowance, negative_allowance, self.__step_indexes[index]
@@ -0,0 +1,148 @@
+import math
+from array import array
+
+# class to keep constant-size running aggregates over every reading of a sensor:
+# counts and time spent per temp status, highest/lowest temps and a Welford
+# running mean/variance, so nothing grows with the length of a fermentation
+class RunningTempStats:
+    ABOVE = "ABOVE"
+    WITHIN = "WITHIN"
+    BELOW = "BELOW"
+    ERROR = "ERROR"
+    STATUSES = (ABOVE, WITHIN, BELOW, ERROR)
+
+    __slots__ = (
+        "count", "status_counts", "status_seconds", "highest_temp", "lowest_temp",
+        "temp_count", "mean_temp", "__sum_of_squared_differences",
+        "__last_status", "__last_timestamp"
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.status_counts = dict.fromkeys(self.STATUSES, 0)
+        self.status_seconds = dict.fromkeys(self.STATUSES, 0.0)
+        self.highest_temp = None
+        self.lowest_temp = None
+        self.temp_count = 0
+        self.mean_temp = None
+        self.__sum_of_squared_differences = 0.0
+        self.__last_status = None
+        self.__last_timestamp = None
+
+    # adds a single reading, with its temp status (one of STATUSES) and the time
+    # (in seconds) it was taken at
+    # error readings are counted, but are left out of highest/lowest/mean/variance
+    def add(self, temp, status, timestamp):
+        self.count += 1
+        self.status_counts[status] += 1
+
+        # the previous reading's status is credited with the time until this one
+        if self.__last_timestamp != None and timestamp > self.__last_timestamp:
+            self.status_seconds[self.__last_status] += timestamp - self.__last_timestamp
+
+        self.__last_status = status
+        self.__last_timestamp = timestamp
+
+        if status != self.ERROR:
+            self.__update_temp_aggregates(temp)
+
+    def __update_temp_aggregates(self, temp):
+        if self.highest_temp == None or self.highest_temp < temp:
+            self.highest_temp = temp
+
+        if self.lowest_temp == None or self.lowest_temp > temp:
+            self.lowest_temp = temp
+
+        # Welford's online algorithm
+        self.temp_count += 1
+        if self.mean_temp == None:
+            self.mean_temp = 0.0
+        delta = temp - self.mean_temp
+        self.mean_temp += delta / self.temp_count
+        self.__sum_of_squared_differences += delta * (temp - self.mean_temp)
+
+    def get_variance(self):
+        if self.temp_count < 2:
+            return None
+
+        return self.__sum_of_squared_differences / (self.temp_count - 1)
+
+    def get_standard_deviation(self):
+        variance = self.get_variance()
+        return math.sqrt(variance) if variance != None else None
+
+    # percentage of readings with the given status, rounded to two decimal places
+    def get_percentage(self, status):
+        if self.count == 0:
+            return None
+
+        return round(self.status_counts[status] / self.count * 100, 2)
+
+    # percentage of elapsed time spent in the given status, rounded to two decimal places
+    def get_time_weighted_percentage(self, status):
+        total_seconds = sum(self.status_seconds.values())
+        if total_seconds == 0:
+            return None
+
+        return round(self.status_seconds[status] / total_seconds * 100, 2)
+
+    # the full state of the aggregates as a json serializable dict, for checkpoints
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "status_counts": dict(self.status_counts),
+            "status_seconds": dict(self.status_seconds),
+            "highest_temp": self.highest_temp,
+            "lowest_temp": self.lowest_temp,
+            "temp_count": self.temp_count,
+            "mean_temp": self.mean_temp,
+            "sum_of_squared_differences": self.__sum_of_squared_differences,
+            "last_status": self.__last_status,
+            "last_timestamp": self.__last_timestamp
+        }
+
+    # rebuilds the aggregates from a dict made by to_dict()
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.count = state["count"]
+        stats.status_counts.update(state["status_counts"])
+        stats.status_seconds.update(state["status_seconds"])
+        stats.highest_temp = state["highest_temp"]
+        stats.lowest_temp = state["lowest_temp"]
+        stats.temp_count = state["temp_count"]
+        stats.mean_temp = state["mean_temp"]
+        stats.__sum_of_squared_differences = state["sum_of_squared_differences"]
+        stats.__last_status = state["last_status"]
+        stats.__last_timestamp = state["last_timestamp"]
+        return stats
+
+
+# fixed-capacity ring buffer of a sensor's most recent readings, backed by
+# preallocated arrays so memory stays flat no matter how long the sensor runs
+class TempDataRingBuffer:
+    def __init__(self, capacity):
+        self.CAPACITY = capacity
+        self.__timestamps = array('d', bytes(8 * capacity))
+        self.__temps = array('d', bytes(8 * capacity))
+        self.__next_index = 0
+        self.__size = 0
+
+    def append(self, temp_data):
+        self.__timestamps[self.__next_index] = temp_data.TIMESTAMP
+        self.__temps[self.__next_index] = temp_data.TEMP_IN_FAHRENHEIT
+        self.__next_index = (self.__next_index + 1) % self.CAPACITY
+        self.__size = min(self.__size + 1, self.CAPACITY)
+
+    def __len__(self):
+        return self.__size
+
+    # iterates over the buffered readings from oldest to newest
+    def __iter__(self):
+        # imported here to avoid a circular import with models.temp_sensor
+        from models.temp_sensor import TempData
+
+        start = (self.__next_index - self.__size) % self.CAPACITY
+        for offset in range(self.__size):
+            index = (start + offset) % self.CAPACITY
+            yield TempData(self.__timestamps[index], self.__temps[index])
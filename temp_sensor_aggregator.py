@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import traceback
+from controllers.temp_sensor_aggregator_controller import AggregatorController
+
+# collects the readings streamed from every logger in the brewery (each run with
+# "export_address" set in its config file) into one sqlite database
+#
+# run with:
+# > python3 temp_sensor_aggregator.py --port 7711 --database ferm_temp_aggregate.db
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Collect fermentation temperatures streamed from many loggers.")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=7711, help="port to listen on")
+    parser.add_argument("--database", default="ferm_temp_aggregate.db", help="sqlite database to store readings in")
+    return parser.parse_args()
+
+# run the aggregator
+def run():
+    arguments = get_arguments()
+    aggregator = AggregatorController(arguments.host, arguments.port, arguments.database)
+
+    try:
+        asyncio.run(aggregator.serve_forever())
+
+    # if Crtl+C is pressed on the keyboard, kill the program
+    except KeyboardInterrupt:
+        print("\n!!!!!!!!!!\n-> Keyboard interrupt has been triggered.\n-> Exiting program.\n!!!!!!!!!!\n")
+
+    # if an unexpected error is detected, kill the program
+    except Exception as e:
+        print("\n!!!!!!!!!!\n-> A(n) {} error has occurred.\n-> Exiting program.\n!!!!!!!!!!\n".format(e.__class__.__name__))
+        traceback.print_exc()
+
+    finally:
+        aggregator.close()
+
+# run the program on the main thread
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,92 @@
+import os
+import time
+import argparse
+from controllers.temp_sensor_analytics_controller import AnalyticsController
+from helpers.temp_sensor_timestamps import format_timestamp
+from helpers.temp_sensor_segments import find_segments
+
+# prints how each sensor did over one or many finished logs (csv, json or archives):
+# time in and out of the allowed temp range, fastest ramps and every excursion
+# out of the range (see AnalyticsController)
+#
+# run with:
+# > python3 temp_sensor_analyze.py logs/csv/*.csv --window 60 --minimum-excursion 10
+# > python3 temp_sensor_analyze.py logs/csv --from "2018-12-17 00:00" --to "2018-12-24 00:00"
+#   (a log directory is read through its segment manifest, so only the segments
+#   overlapping --from and --to are opened)
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Analyze finished fermentation temperature logs.")
+    parser.add_argument("logs", nargs="+", help="csv, json or archived logs (or log directories) to analyze together")
+    parser.add_argument("--window", type=float, default=60, help="minutes of readings behind each rolling mean and ramp rate")
+    parser.add_argument("--minimum-excursion", type=float, default=0, help="minutes an excursion must last to be listed")
+    parser.add_argument("--from", dest="start", type=get_epoch_time, help="only read the segments of a log directory with readings after this local time (YYYY-MM-DD HH:MM)")
+    parser.add_argument("--to", dest="end", type=get_epoch_time, help="only read the segments of a log directory with readings before this local time (YYYY-MM-DD HH:MM)")
+    return parser.parse_args()
+
+def get_epoch_time(local_time):
+    try:
+        return time.mktime(time.strptime(local_time, "%Y-%m-%d %H:%M"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("must look like YYYY-MM-DD HH:MM, not {}".format(local_time))
+
+# expands each log directory into the segments between start and end
+def get_logs(logs, start, end):
+    filepaths = []
+
+    for log in logs:
+        if os.path.isdir(log):
+            filepaths.extend(find_segments(log, start=start, end=end))
+        else:
+            filepaths.append(log)
+
+    return filepaths
+
+def format_percentage(fraction):
+    return "{:.2f}%".format(fraction * 100) if fraction != None else "-"
+
+# analyze the logs
+def run():
+    arguments = get_arguments()
+    analytics = AnalyticsController(get_logs(arguments.logs, arguments.start, arguments.end))
+
+    for sensor_id in analytics.get_sensor_ids():
+        summary = analytics.get_summary(sensor_id, arguments.window * 60)
+        print("=" * 10)
+        print("NAME: {}\nID: {}\nREADINGS: {} ({} to {})\nHIGHEST TEMP (F): {}\nLOWEST TEMP (F): {}\nMEAN TEMP (F): {}\nSTANDARD DEVIATION (F): {}\nFASTEST RISE (F/HOUR): {}\nFASTEST FALL (F/HOUR): {}".format(
+            summary["name"],
+            sensor_id,
+            summary["readings"],
+            format_timestamp(summary["first"]),
+            format_timestamp(summary["last"]),
+            summary["highest_temp"],
+            summary["lowest_temp"],
+            round(summary["mean_temp"], 2) if summary["mean_temp"] != None else None,
+            round(summary["standard_deviation"], 2) if summary["standard_deviation"] != None else None,
+            round(summary["fastest_rise"], 2) if summary["fastest_rise"] != None else None,
+            round(summary["fastest_fall"], 2) if summary["fastest_fall"] != None else None
+        ))
+
+        print("-" * 5)
+        for status, fraction in summary["status_fractions"].items():
+            print("% OF READINGS {}: {}, % OF TIME {}: {}".format(
+                status, format_percentage(fraction), status, format_percentage(summary["time_weighted_fractions"][status])
+            ))
+
+        excursions = analytics.get_excursions(sensor_id, arguments.minimum_excursion * 60)
+        print("-" * 5)
+        print("EXCURSIONS: {}".format(len(excursions)))
+        for excursion in excursions:
+            print("{} from {} for {} minutes, peaking at {} ({} outside the range)".format(
+                excursion["status"],
+                format_timestamp(excursion["start"]),
+                round(excursion["duration"] / 60),
+                excursion["peak_temp"],
+                excursion["peak_deviation"]
+            ))
+    print("=" * 10)
+
+# run the program on the main thread
+if __name__ == "__main__":
+    run()
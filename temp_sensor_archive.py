@@ -0,0 +1,64 @@
+import os
+import argparse
+from controllers.temp_sensor_archive_controller import ArchiveController, ArchiveReader
+from helpers.temp_sensor_timestamps import format_timestamp
+
+# converts finished csv and json logs into compact, columnar archives in logs/archive
+# (see ArchiveController), leaving the logs themselves untouched
+#
+# run with:
+# > python3 temp_sensor_archive.py                                   (archives every log in logs/json and logs/csv)
+# > python3 temp_sensor_archive.py logs/csv/ferm_temp_data_log_Dec-17-2018_04-32-56.csv
+# > python3 temp_sensor_archive.py --show logs/archive/ferm_temp_data_log_Dec-17-2018_04-32-56.csv.fta
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Archive finished fermentation temperature logs.")
+    parser.add_argument("logs", nargs="*", help="csv or json logs to archive (defaults to every log in logs/)")
+    parser.add_argument("--show", metavar="ARCHIVE", help="print the sensors and readings held by an archive")
+    return parser.parse_args()
+
+# prints the sensors of an archive, with their first and last readings
+def show(filepath):
+    reader = ArchiveReader(filepath)
+
+    try:
+        print("-> {} (archived from {})".format(filepath, reader.SOURCE))
+        for sensor in reader.get_sensors():
+            print("\n-> {} ({}): {} readings, target {}, allowed range {}".format(
+                sensor["name"], sensor["id"], sensor["reading_count"], sensor["target_temp"], sensor["allowed_temp_range"]
+            ))
+            if sensor["reading_count"] > 0:
+                for index in (0, -1):
+                    timestamp, temp = reader.get_reading(sensor["id"], index)
+                    print("   {}: {}".format(format_timestamp(timestamp), temp if temp != None else "error"))
+    finally:
+        reader.close()
+
+# archive the logs
+def run():
+    arguments = get_arguments()
+
+    if arguments.show != None:
+        show(arguments.show)
+        return
+
+    controller = ArchiveController()
+    filepaths = arguments.logs if len(arguments.logs) > 0 else controller.get_logs()
+
+    for filepath in filepaths:
+        try:
+            archive_filepath = controller.archive_log(filepath)
+        except Exception as e:
+            print("!!! -> Could not archive {}: {}".format(filepath, e))
+            continue
+
+        log_size = os.path.getsize(filepath)
+        archive_size = os.path.getsize(archive_filepath)
+        print("-> {} ({} bytes) -> {} ({} bytes, {:.1f}x smaller)".format(
+            filepath, log_size, archive_filepath, archive_size, log_size / max(archive_size, 1)
+        ))
+
+# run the program on the main thread
+if __name__ == "__main__":
+    run()
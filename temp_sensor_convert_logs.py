@@ -0,0 +1,129 @@
+import os
+import csv
+import json
+import argparse
+from helpers.temp_sensor_timestamps import get_epoch_timestamps
+
+# rewrites csv and json logs written with formatted timestamps (e.g. Mon, Dec 17, 2018 04:43:02 PM)
+# to hold seconds since the epoch instead, as the logger writes them now. each log's
+# timestamps are converted in one go with get_epoch_timestamps(), and the original
+# log is kept next to it with a .orig extension
+#
+# run with:
+# > python3 temp_sensor_convert_logs.py                           (converts every log in logs/json and logs/csv)
+# > python3 temp_sensor_convert_logs.py logs/csv/ferm_temp_data_log_Dec-17-2018_04-32-56.csv
+
+LOGS_DIRECTORY = "logs"
+SOURCE_DIRECTORIES = ("json", "csv")
+ORIGINAL_EXTENSION = ".orig"
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Convert the timestamps of older logs to seconds since the epoch.")
+    parser.add_argument("logs", nargs="*", help="csv or json logs to convert (defaults to every log in logs/)")
+    return parser.parse_args()
+
+# returns every csv and json log in the logs directory
+def get_logs():
+    filepaths = []
+
+    for directory in SOURCE_DIRECTORIES:
+        directory = os.path.join(LOGS_DIRECTORY, directory)
+        if os.path.isdir(directory):
+            filepaths.extend(
+                os.path.join(directory, filename) for filename in sorted(os.listdir(directory))
+                if os.path.splitext(filename)[1] in (".csv", ".json", ".jsonl")
+            )
+
+    return filepaths
+
+def convert_csv_log(filepath):
+    with open(filepath, 'r', newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+
+    if len(rows) < 2:
+        return rows, 0
+
+    column = rows[0].index("Timestamp")
+    timestamps = get_epoch_timestamps([row[column] for row in rows[1:]])
+    for row, timestamp in zip(rows[1:], timestamps):
+        row[column] = float(timestamp)
+
+    return rows, len(rows) - 1
+
+def convert_json_lines_log(filepath):
+    with open(filepath, 'r') as json_lines_file:
+        records = []
+        for line in json_lines_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # a partially written last line (e.g. after a power cut) is dropped
+                continue
+
+    readings = [record for record in records if "Timestamp" in record]
+    timestamps = get_epoch_timestamps([reading["Timestamp"] for reading in readings])
+    for reading, timestamp in zip(readings, timestamps):
+        reading["Timestamp"] = float(timestamp)
+
+    return records, len(readings)
+
+def convert_json_log(filepath):
+    with open(filepath, 'r') as json_file:
+        data = json.load(json_file)
+
+    readings = [
+        temp_data for sensor_dict in data
+        for temp_data in sensor_dict["Sensor Data"]["Recorded Temp Data"]
+    ]
+    timestamps = get_epoch_timestamps([temp_data["Timestamp"] for temp_data in readings])
+    for temp_data, timestamp in zip(readings, timestamps):
+        temp_data["Timestamp"] = float(timestamp)
+
+    return data, len(readings)
+
+# converts the given log, writing the converted log through a temporary file and
+# keeping the original. returns the number of timestamps converted
+def convert_log(filepath):
+    extension = os.path.splitext(filepath)[1]
+    temp_filepath = filepath + ".tmp"
+    # converting twice would replace the original with an already converted log
+    if os.path.exists(filepath + ORIGINAL_EXTENSION):
+        raise ValueError("it has already been converted")
+
+    if extension == ".csv":
+        rows, count = convert_csv_log(filepath)
+        with open(temp_filepath, 'w', newline='') as csv_file:
+            csv.writer(csv_file).writerows(rows)
+    elif extension == ".jsonl":
+        records, count = convert_json_lines_log(filepath)
+        with open(temp_filepath, 'w') as json_lines_file:
+            json_lines_file.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+    elif extension == ".json":
+        data, count = convert_json_log(filepath)
+        with open(temp_filepath, 'w') as json_file:
+            json.dump(data, json_file, indent=4, sort_keys=True)
+    else:
+        raise ValueError("Cannot convert {}: not a csv or json log".format(filepath))
+
+    os.replace(filepath, filepath + ORIGINAL_EXTENSION)
+    os.replace(temp_filepath, filepath)
+    return count
+
+# convert the logs
+def run():
+    arguments = get_arguments()
+    filepaths = arguments.logs if len(arguments.logs) > 0 else get_logs()
+
+    for filepath in filepaths:
+        try:
+            count = convert_log(filepath)
+        except Exception as e:
+            print("!!! -> Could not convert {}: {}".format(filepath, e))
+            continue
+
+        print("-> Converted {} timestamps in {} (the original is kept as {}).".format(count, filepath, filepath + ORIGINAL_EXTENSION))
+
+# run the program on the main thread
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+import os
+import glob
+import argparse
+from controllers.temp_sensor_json_controller import JsonController
+from controllers.temp_sensor_matplotlib import Plotter
+from helpers.temp_sensor_segments import SegmentManifest, COMPRESSED_EXTENSION
+
+# shows a live graph of a running (or finished) json lines log in a window: the
+# readings the logger appends are added to the lines every --interval seconds, and the
+# graph follows the log onto each segment it rolls over to. it runs as a process of its
+# own, so the logger never has to draw a gui (e.g. on a desktop with the logs shared,
+# or on a pi with a display)
+#
+# run with:
+# > python3 temp_sensor_graph.py                 (the latest log in logs/json)
+# > python3 temp_sensor_graph.py logs/json/ferm_temp_data_log_Dec-17-2018_04-32-56.jsonl --interval 30
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Graph a fermentation temperature log live.")
+    parser.add_argument("log", nargs="?", help="json lines log to graph (defaults to the latest one in logs/json)")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between updates of the graph")
+    return parser.parse_args()
+
+# the most recently written json lines log
+def get_latest_log():
+    filepaths = glob.glob(os.path.join(JsonController.LOGS_DIRECTORY, JsonController.JSON_DIRECTORY, "*.jsonl"))
+    if len(filepaths) == 0:
+        return None
+
+    return max(filepaths, key=os.path.getmtime)
+
+# the filepath of a log as it was written, whether it has been compressed since or not
+def get_uncompressed_filepath(filepath):
+    return filepath[:-len(COMPRESSED_EXTENSION)] if filepath.endswith(COMPRESSED_EXTENSION) else filepath
+
+# the filepaths of every segment of the log's run, in order, from the segment manifest
+# (or just the log itself, for a log from before segments)
+def get_run_filepaths(filepath):
+    directory, filename = os.path.split(filepath)
+    manifest = SegmentManifest(directory)
+    segment = manifest.get_segment(filename) or manifest.get_segment(filename + COMPRESSED_EXTENSION)
+    if segment == None:
+        return [filepath]
+
+    return [os.path.join(directory, run_segment["filename"]) for run_segment in manifest.get_run(segment["run"])]
+
+# graph the log
+def run():
+    arguments = get_arguments()
+    filepath = arguments.log if arguments.log != None else get_latest_log()
+    if filepath == None:
+        print("!!! -> No json lines log found in {}.".format(os.path.join(JsonController.LOGS_DIRECTORY, JsonController.JSON_DIRECTORY)))
+        return
+
+    filepath = get_uncompressed_filepath(filepath)
+    run_filepaths = get_run_filepaths(filepath)
+    uncompressed_run_filepaths = [get_uncompressed_filepath(run_filepath) for run_filepath in run_filepaths]
+    index = uncompressed_run_filepaths.index(filepath) if filepath in uncompressed_run_filepaths else len(run_filepaths) - 1
+    # the segments of the run before the given one are read whole, once
+    plotter = Plotter(filepath, finished_files_to_read=run_filepaths[:index])
+
+    # once the segment being read is finished, reads the rest of it, and carries on
+    # with the run's latest segment (after any others it rolled over to in between)
+    def follow_log():
+        run_filepaths = get_run_filepaths(plotter.file_to_read)
+        uncompressed_run_filepaths = [get_uncompressed_filepath(run_filepath) for run_filepath in run_filepaths]
+        if plotter.file_to_read not in uncompressed_run_filepaths:
+            return
+
+        index = uncompressed_run_filepaths.index(plotter.file_to_read)
+        if index == len(run_filepaths) - 1:
+            return
+
+        plotter.update()
+        plotter.set_file_to_read(uncompressed_run_filepaths[-1], run_filepaths[index + 1:-1])
+
+    print("-> Graphing {}, updated every {} seconds until the window is closed.".format(filepath, arguments.interval))
+    plotter.animate(arguments.interval, follow_log)
+
+# run the program on the main thread
+if __name__ == "__main__":
+    run()
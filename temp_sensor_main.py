@@ -1,9 +1,17 @@
+import os
+import argparse
 import traceback
-import time
 from controllers.temp_sensor_controller import TempSensorController as Controller
-import RPi.GPIO as GPIO
+from controllers.temp_sensor_alert_controller import FileAlertSink, WebhookAlertSink
+from helpers.temp_sensor_config import TempSensorConfig
+from helpers.temp_sensor_scheduler import PollScheduler
+from helpers.temp_sensor_gpio import GPIO
+from helpers.temp_sensor_exceptions import InvalidConfigException
+from helpers.temp_sensor_logging import OUTPUT_MODES, VERBOSE, get_logger
 GPIO.setmode(GPIO.BOARD)
 
+LOGGER = get_logger("main")
+
 # !!! NOTE !!!
 # Are you having trouble running this script, though when last it was run all was working?
 # Make sure your command line is > python3 {name of this script}.py
@@ -19,6 +27,10 @@ LED_PIN_SETS = [
     {"red": 36, "green": 38, "blue": 40}
 ]
 
+# how often (in seconds) to render the graph to a png file without a GUI
+# leave as None to show the graph in a window on exit instead
+PNG_RENDER_INTERVAL = None
+
 # sets the polling rate between temp recordings
 def set_polling_rate():
     while True:
@@ -34,25 +46,149 @@ def set_polling_rate():
             print("-> Polling minutes accepted.\n-> Monitoring temperatures every {} minutes starting now.\n----------\n".format(requested_time))
             return round(requested_time * 60, 2)
 
+# the config file's modification time and size, to tell when it has been edited
+def get_config_file_stamp(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+# applies the sensors' target temps and schedules from the config file to the running
+# controller if the file has been edited since config_file_stamp, and returns the
+# file's new stamp. an invalid edit is reported and the running settings are kept
+def reload_config(controller, filepath, config_file_stamp):
+    new_config_file_stamp = get_config_file_stamp(filepath)
+
+    if new_config_file_stamp == None or new_config_file_stamp == config_file_stamp:
+        return config_file_stamp
+
+    try:
+        config = TempSensorConfig(filepath)
+    except InvalidConfigException as e:
+        print("!!! -> The edited config file was not applied, keeping the current targets: {}".format(e))
+        return new_config_file_stamp
+
+    print("-> The config file was edited. Applying its target temps and schedules.")
+    controller.update_sensor_targets(config.SENSORS)
+    return new_config_file_stamp
+
+# polls the sensors due on the tick the scheduler just fired, which is the body of
+# the main loop (as timed by benchmarks/temp_sensor_console_benchmark.py)
+def poll_sensors(controller, scheduler, due_sensor_ids):
+    controller.METRICS_CONTROLLER.set_scheduler_metrics(scheduler.get_metrics())
+    LOGGER.debug("\n-> Polling sensors...", extra={"raw": True})
+    controller.get_temps(due_sensor_ids)
+
+# reads the command line arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Track fermentation temperatures from ds18b20 probes.")
+    parser.add_argument(
+        "--config",
+        help="json config file to start from without any prompts (see ferm_temp_tracker.example.json)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="carry on with the logs and aggregates of the last run (e.g. after a power cut), from its checkpoint"
+    )
+    parser.add_argument(
+        "--profile",
+        type=int,
+        default=0,
+        metavar="POLLS",
+        help="profile the first POLLS polls with cProfile and tracemalloc, written to logs/metrics"
+    )
+    parser.add_argument(
+        "--console-output",
+        choices=OUTPUT_MODES,
+        help="verbose (every sensor's readings each poll), summary (one line per poll) or quiet (only warnings and errors). overrides the config file"
+    )
+    return parser.parse_args()
+
 # run the main program
 def run():
+    controller = None
+
     try:
+        arguments = get_arguments()
         print("----------\n-> Program running.\n-> Searching for temp sensors...\n----------")
 
-        # instantiate controller obj (which also detects all available sensors)
-        controller = Controller(LED_PIN_SETS)
+        if arguments.config != None:
+            # read every setting from the config file, so nothing needs to be typed in
+            config_file_stamp = get_config_file_stamp(arguments.config)
+            config = TempSensorConfig(arguments.config)
+            controller = Controller(
+                LED_PIN_SETS,
+                polling_mode=config.POLLING_MODE,
+                sensor_deadline=config.SENSOR_DEADLINE,
+                history_capacity=config.HISTORY_CAPACITY,
+                png_render_interval=config.PNG_RENDER_INTERVAL,
+                csv_flush_policy=config.CSV_FLUSH_POLICY,
+                csv_flush_interval=config.CSV_FLUSH_INTERVAL,
+                sensor_configs=config.SENSORS,
+                sqlite=config.SQLITE,
+                w1_devices_directory=config.W1_DEVICES_DIRECTORY,
+                export_address=config.EXPORT_ADDRESS,
+                node_name=config.NODE_NAME,
+                alert_hysteresis=config.ALERT_HYSTERESIS,
+                alert_minimum_dwell=config.ALERT_MINIMUM_DWELL,
+                alert_sinks=[FileAlertSink()] + ([WebhookAlertSink(config.ALERT_WEBHOOK_URL)] if config.ALERT_WEBHOOK_URL != None else []),
+                control_period=config.CONTROL_PERIOD,
+                device_rescan_interval=config.DEVICE_RESCAN_INTERVAL,
+                http_address=config.HTTP_ADDRESS,
+                bulk_conversion=config.BULK_CONVERSION,
+                metrics_format=config.METRICS_FORMAT,
+                slow_poll_threshold=config.SLOW_POLL_THRESHOLD,
+                profile_polls=arguments.profile,
+                console_output=arguments.console_output or config.CONSOLE_OUTPUT,
+                repeated_message_interval=config.REPEATED_MESSAGE_INTERVAL,
+                segment_size=config.SEGMENT_SIZE,
+                segment_interval=config.SEGMENT_INTERVAL,
+                compress_segments=config.COMPRESS_SEGMENTS,
+                resume=arguments.resume
+            )
+            polling_rate = round(config.POLLING_RATE * 60, 2)
+            print("-> Monitoring temperatures every {} minutes starting now.\n----------\n".format(config.POLLING_RATE))
+        else:
+            # instantiate controller obj (which also detects all available sensors)
+            controller = Controller(LED_PIN_SETS, png_render_interval=PNG_RENDER_INTERVAL, resume=arguments.resume, profile_polls=arguments.profile, console_output=arguments.console_output or VERBOSE)
+
+            # ask the user how long they would like the wait to be between recording temperatures
+            polling_rate = set_polling_rate()
 
-        # ask the user how long they would like the wait to be between recording temperatures
-        polling_rate = set_polling_rate()
+        # polls fire on fixed, wall clock aligned ticks instead of sleeping a fixed
+        # time after each poll, so slow polls do not push every later reading back
+        scheduler = PollScheduler(polling_rate, controller.get_sensor_polling_rates())
 
         while True:
-            print("\n-> Polling sensors...")
-            controller.get_temps()
-            time.sleep(polling_rate)
+            overruns = scheduler.overruns
+            due_sensor_ids = scheduler.wait_for_next_tick()
+
+            if scheduler.overruns > overruns:
+                metrics = scheduler.get_metrics()
+                LOGGER.warning("Polling fell behind schedule: %s overruns, %s skipped polls so far.", metrics["overruns"], metrics["skipped_ticks"])
+
+            # target temps and schedules can be edited in the config file mid-run
+            if arguments.config != None:
+                config_file_stamp = reload_config(controller, arguments.config, config_file_stamp)
+
+            # ticks fire on the greatest common divisor of the polling rates, so some
+            # have no sensor due (e.g. every other tick with rates of 60 and 90 seconds)
+            if len(due_sensor_ids) == 0:
+                continue
+
+            poll_sensors(controller, scheduler, due_sensor_ids)
         
     # if Crtl+C is pressed on the keyboard, kill the program
     except KeyboardInterrupt:
-        controller.JSON_CONTROLLER.PLOTTER.animate()
+        if controller != None:
+            # close the log files first so nothing buffered is lost while the graph is open
+            controller.close()
+            # build the nested json document from the json lines log before graphing it
+            controller.JSON_CONTROLLER.compact()
+            controller.JSON_CONTROLLER.graph()
         print("\n!!!!!!!!!!\n-> Keyboard interrupt has been triggered.\n-> Exiting program.\n!!!!!!!!!!\n")
         traceback.print_exc()
         GPIO.cleanup()
@@ -63,6 +199,8 @@ def run():
     except Exception as e:
         print("\n!!!!!!!!!!\n-> A(n) {} error has occurred.\n-> Exiting program.\n!!!!!!!!!!\n".format(e.__class__.__name__))
         traceback.print_exc()
+        if controller != None:
+            controller.close()
         GPIO.cleanup()
         # kills the program
         exit()